@@ -1,13 +1,20 @@
 from ._cql import CqlAgent, CqlAgentConfig
+from ._factored_cql import FactoredCqlAgent, FactoredCqlAgentConfig
 from ._iql import IqlAgent, IqlAgentConfig
-from ._base import DQN, BaseAgent, BaseAgentConfig
+from ._iql_group import IqlAgentGroup
+from ._base import DQN, GroupDQN, BaseAgent, BaseAgentConfig, ObsCollator
 
 __all__ = [
     "DQN",
+    "GroupDQN",
     "BaseAgent",
     "BaseAgentConfig",
+    "ObsCollator",
     "CqlAgent",
+    "FactoredCqlAgent",
     "IqlAgent",
+    "IqlAgentGroup",
     "CqlAgentConfig",
+    "FactoredCqlAgentConfig",
     "IqlAgentConfig",
 ]
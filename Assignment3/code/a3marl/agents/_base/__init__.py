@@ -1,12 +1,26 @@
-from ._network import DQN
-from ._memory import Transition, ReplayMemory
+from ._network import DQN, GroupDQN
+from ._memory import (
+    Transition,
+    TransitionBatch,
+    ReplayMemory,
+    CompactReplayMemory,
+    PrioritizedReplayMemory,
+)
+from ._sum_tree import SumTree
+from ._collate import ObsCollator
 from ._agent import BaseAgent
 from ._config import BaseAgentConfig
 
 __all__ = [
     "DQN",
+    "GroupDQN",
     "Transition",
+    "TransitionBatch",
     "ReplayMemory",
+    "CompactReplayMemory",
+    "PrioritizedReplayMemory",
+    "SumTree",
+    "ObsCollator",
     "BaseAgent",
     "BaseAgentConfig",
 ]
@@ -1,11 +1,25 @@
+import contextlib
+import functools
 from abc import ABC, abstractmethod
 
 import torch
+import torch.nn.functional as F
 from torch import nn
 
 from ._config import BaseAgentConfig
-from ._memory import ReplayMemory
-from ._network import DQN
+from ._memory import (
+    COMPACT_OBS_DTYPES,
+    ReplayMemory,
+    CompactReplayMemory,
+    PrioritizedReplayMemory,
+    TransitionBatch,
+)
+from ._network import DQN, GroupDQN, paired_forward
+
+
+def _net_tensors(net: nn.Module) -> list[torch.Tensor]:
+    # parameters and buffers, in the same order for networks of the same layout
+    return [*net.parameters(), *net.buffers()]
 
 
 class BaseAgent(ABC):
@@ -16,30 +30,90 @@ class BaseAgent(ABC):
         self.config: BaseAgentConfig = config
         self.config.validate()
         self.act_sampler: callable = act_sampler  # action sampler function
-        self.device = device or torch.device(
-            "cuda"
-            if torch.cuda.is_available()
-            else "mps" if torch.backends.mps.is_available() else "cpu"
+        self.device = torch.device(
+            device
+            or (
+                "cuda"
+                if torch.cuda.is_available()
+                else "mps" if torch.backends.mps.is_available() else "cpu"
+            )
         )
 
         # DQN
-        self.replay_memory: ReplayMemory = ReplayMemory(capacity=self.config.mem_size)
+        self.replay_memory: ReplayMemory = self._build_replay_memory()
         self.eps: float = self.config.eps_start
 
-        self.policy_net: DQN = DQN(
-            config.obs_dim, config.act_dim, config.hidden_dims
-        ).to(self.device)
-        self.target_net: DQN = DQN(
-            config.obs_dim, config.act_dim, config.hidden_dims
-        ).to(self.device)
+        self.policy_net: DQN = self._build_network().to(self.device)
+        self.target_net: DQN = self._build_network().to(self.device)
         self.target_net.load_state_dict(self.policy_net.state_dict())
         self.target_net.eval()
 
         # opt & loss criterion
         self.opt: torch.optim.Optimizer = torch.optim.AdamW(
-            self.policy_net.parameters(), lr=self.config.lr, amsgrad=True
+            self.policy_net.parameters(),
+            lr=self.config.lr,
+            amsgrad=True,
+            fused=self.config.fused_opt or None,
         )
         self.criterion = nn.SmoothL1Loss()
+        # sum of the losses since the last pop_mean_loss, kept on the device
+        self._loss_sum: torch.Tensor | None = None
+        self._n_losses: int = 0
+        # |TD error| per batch row of the last loss, with prioritized replay
+        self._td_errors: torch.Tensor | None = None
+
+        # training forwards, see _train_q_values
+        self._policy_forward: callable = self.policy_net
+        self._target_forward: callable = self.target_net
+        self._paired_forward: callable | None = None
+        if self.config.paired_forward and all(
+            isinstance(net, (DQN, GroupDQN))
+            for net in (self.policy_net, self.target_net)
+        ):
+            self._paired_forward = functools.partial(
+                paired_forward, self.policy_net, self.target_net
+            )
+        # forwards, targets and loss compiled as one graph, the nets stay plain
+        # modules (state_dict keys are unchanged)
+        self._loss_fn: callable = (
+            torch.compile(self._td_loss) if self.config.compile_train else self._td_loss
+        )
+
+    def _build_network(self) -> nn.Module:
+        return DQN(self.config.obs_dim, self.config.act_dim, self.config.hidden_dims)
+
+    def _build_replay_memory(
+        self, obs_dim: int = None, act_width: int = 1, n_agents: int = 1
+    ) -> ReplayMemory:
+        obs_dim = obs_dim or self.config.obs_dim
+        if self.config.mem_obs_dtype in COMPACT_OBS_DTYPES:
+            return CompactReplayMemory(
+                capacity=self.config.mem_size,
+                obs_dim=obs_dim,
+                act_width=act_width,
+                device=self.device,
+                n_agents=n_agents,
+                obs_dtype=COMPACT_OBS_DTYPES[self.config.mem_obs_dtype],
+            )
+        if self.config.prioritized_replay:
+            return PrioritizedReplayMemory(
+                capacity=self.config.mem_size,
+                obs_dim=obs_dim,
+                act_width=act_width,
+                device=self.device,
+                n_agents=n_agents,
+                alpha=self.config.per_alpha,
+                beta=self.config.per_beta,
+                beta_steps=self.config.per_beta_steps,
+                eps=self.config.per_eps,
+            )
+        return ReplayMemory(
+            capacity=self.config.mem_size,
+            obs_dim=obs_dim,
+            act_width=act_width,
+            device=self.device,
+            n_agents=n_agents,
+        )
 
     def select_action(self, state: torch.Tensor, **kwargs):
         return self._select_action_eps(state, dqn=self.policy_net, **kwargs)
@@ -51,15 +125,135 @@ class BaseAgent(ABC):
     def _select_action_eps(self, state, dqn, eps=-1, **kwargs):
         pass
 
+    def train(self, n_updates: int = 1) -> int:
+        """
+        n_updates minibatch updates back to back, their batches sampled with one
+        replay gather. output: number of updates done (0 while the memory is short)
+        """
+        if n_updates < 1 or len(self.replay_memory) < self.config.batch_size:
+            return 0
+        batches = self.replay_memory.sample_many(n_updates, self.config.batch_size)
+        td_errors = []
+        for batch in batches:
+            self._optimize(self._loss_fn(batch))
+            if batch.index is not None:
+                td_errors.append(self._td_errors)
+        if td_errors:
+            # one priority update for all minibatches of the call
+            self.replay_memory.update_priorities(
+                torch.cat([batch.index for batch in batches]), torch.cat(td_errors)
+            )
+        return n_updates
+
     @abstractmethod
-    def train(self) -> None:
+    def _td_loss(self, batch: TransitionBatch) -> torch.Tensor:
         pass
 
+    def _td_criterion(
+        self,
+        q_values: torch.Tensor,
+        expected_q_values: torch.Tensor,
+        batch: TransitionBatch,
+        row_dim: int = 0,
+    ) -> torch.Tensor:
+        """
+        criterion of the TD loss; with prioritized replay the elementwise loss is
+        weighted by the batch importance-sampling weights along row_dim (the batch
+        dimension) and the |TD error| per row is kept for the priority update
+        """
+        if batch.weight is None:
+            return self.criterion(q_values, expected_q_values)
+        weight_shape = [1] * q_values.dim()
+        weight_shape[row_dim] = -1
+        other_dims = [dim for dim in range(q_values.dim()) if dim != row_dim]
+        self._td_errors = (expected_q_values - q_values).detach().abs().mean(other_dims)
+        return (
+            F.smooth_l1_loss(q_values, expected_q_values, reduction="none")
+            * batch.weight.reshape(weight_shape)
+        ).mean()
+
+    def _autocast(self) -> contextlib.AbstractContextManager:
+        if self.config.autocast_dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(
+            self.device.type, dtype=getattr(torch, self.config.autocast_dtype)
+        )
+
+    def _train_q_values(
+        self, state_batch: torch.Tensor, next_state_batch: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Q(s_t) of the policy net (with grad) and Q(s_{t+1}) of the target net
+        (without), in float32 whatever the execution config.
+        """
+        with self._autocast():
+            if self._paired_forward is not None:
+                q_values, next_q_values = self._paired_forward(
+                    state_batch, next_state_batch
+                )
+            else:
+                q_values = self._policy_forward(state_batch)
+                with torch.no_grad():
+                    next_q_values = self._target_forward(next_state_batch)
+        return q_values.float(), next_q_values.float()
+
+    def _optimize(self, loss: torch.Tensor) -> None:
+        self._record_loss(loss)
+        self.opt.zero_grad()
+        loss.backward()
+        nn.utils.clip_grad_value_(
+            self.policy_net.parameters(),
+            self.config.grad_clip_value,
+            foreach=self.config.fused_opt or None,
+        )
+        self.opt.step()
+
+    def _record_loss(self, loss: torch.Tensor) -> None:
+        loss = loss.detach()
+        self._loss_sum = loss if self._loss_sum is None else self._loss_sum + loss
+        self._n_losses += 1
+
+    def pop_mean_loss(self) -> float:
+        """Mean training loss since the last call (nan without updates)"""
+        if self._n_losses == 0:
+            return float("nan")
+        mean_loss = self._loss_sum.item() / self._n_losses
+        self._loss_sum, self._n_losses = None, 0
+        return mean_loss
+
     def memorize(self, *args) -> None:
         self.replay_memory.push(*args)
 
     def update_target_network(self) -> None:
-        self.target_net.load_state_dict(self.policy_net.state_dict())
+        # in place, one multi-tensor copy instead of a state_dict round trip
+        with torch.no_grad():
+            torch._foreach_copy_(
+                _net_tensors(self.target_net), _net_tensors(self.policy_net)
+            )
+
+    def soft_update_target_network(self, tau: float) -> None:
+        """Polyak update target <- target + tau * (policy - target), fused in place"""
+        with torch.no_grad():
+            torch._foreach_lerp_(
+                list(self.target_net.parameters()),
+                list(self.policy_net.parameters()),
+                tau,
+            )
 
     def update_eps(self) -> None:
         self.eps = max(self.config.eps_min, self.eps * self.config.eps_decay)
+
+    def state_dict(self) -> dict[str, object]:
+        """Networks, optimizer and eps, the replay memory has its own state_dict"""
+        return {
+            "policy_net": self.policy_net.state_dict(),
+            "target_net": self.target_net.state_dict(),
+            "opt": self.opt.state_dict(),
+            "eps": self.eps,
+        }
+
+    def load_state_dict(self, state: dict[str, object]) -> None:
+        self.policy_net.load_state_dict(state["policy_net"])
+        self.target_net.load_state_dict(state["target_net"])
+        self.opt.load_state_dict(state["opt"])
+        self.eps = state["eps"]
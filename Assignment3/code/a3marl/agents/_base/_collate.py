@@ -0,0 +1,111 @@
+import numpy as np
+import torch
+
+
+class ObsCollator:
+    """
+    Collates the per-agent observations of a ParallelEnv step into one preallocated
+    host buffer (pinned for cuda devices) and moves it to the device with a single
+    copy. Agents that are done or missing from the step are zeroed with one
+    vectorized multiply. Agents are laid out in obs_dims order.
+
+    Host buffers are reused round-robin (n_buffers), a buffer is only rewritten once
+    its previous asynchronous copy has finished.
+    """
+
+    def __init__(
+        self,
+        obs_dims: dict[str, int],
+        device: torch.device | str = "cpu",
+        pin_memory: bool | None = None,
+        n_buffers: int = 2,
+    ) -> None:
+        self.agent_keys: list[str] = list(obs_dims)
+        self.obs_dims: list[int] = list(obs_dims.values())
+        self.device = torch.device(device)
+        self.pin_memory: bool = (
+            self.device.type == "cuda" if pin_memory is None else pin_memory
+        )
+        self.joint_obs_dim: int = sum(self.obs_dims)
+
+        offsets = np.cumsum([0] + self.obs_dims)
+        # agent_key => (start, end) columns of the joint observation
+        self._slices: dict[str, tuple[int, int]] = {
+            agent_key: (int(offsets[i]), int(offsets[i + 1]))
+            for i, agent_key in enumerate(self.agent_keys)
+        }
+        self._agent_index: dict[str, int] = {
+            agent_key: i for i, agent_key in enumerate(self.agent_keys)
+        }
+        # agent of each joint column, expands the per-agent mask
+        self._column_agent: np.ndarray = np.repeat(
+            np.arange(len(self.agent_keys)), self.obs_dims
+        )
+        self._alive: np.ndarray = np.ones(len(self.agent_keys), dtype=np.float32)
+
+        self._host: list[torch.Tensor] = [
+            torch.zeros(self.joint_obs_dim, pin_memory=self.pin_memory)
+            for _ in range(n_buffers)
+        ]
+        self._events: list[torch.cuda.Event | None] = [None] * n_buffers
+        self._next: int = 0
+
+    def _next_host_buffer(self) -> tuple[int, torch.Tensor]:
+        i = self._next
+        self._next = (i + 1) % len(self._host)
+        if self._events[i] is not None:
+            self._events[i].synchronize()
+            self._events[i] = None
+        return i, self._host[i]
+
+    def _to_device(self, i: int, host: torch.Tensor) -> torch.Tensor:
+        out = torch.empty(host.shape, device=self.device)
+        out.copy_(host, non_blocking=self.pin_memory)
+        if self.pin_memory and self.device.type == "cuda":
+            self._events[i] = torch.cuda.Event()
+            self._events[i].record()
+        return out
+
+    def collate(
+        self,
+        observations: dict[str, np.ndarray],
+        done_agents: dict[str, bool] | None = None,
+    ) -> torch.Tensor:
+        """
+        input: agent_key => observation, agents missing here are zeroed as well
+        output shape: 1 x joint_obs_dim on the device
+        """
+        i, host = self._next_host_buffer()
+        host_np = host.numpy()
+        alive = self._alive
+        alive.fill(0.0)
+        for agent_key, observation in observations.items():
+            if agent_key in self._slices:
+                start, end = self._slices[agent_key]
+                host_np[start:end] = np.asarray(observation).reshape(-1)
+                alive[self._agent_index[agent_key]] = 1.0
+        if done_agents:
+            for agent_key, done in done_agents.items():
+                if done and agent_key in self._agent_index:
+                    alive[self._agent_index[agent_key]] = 0.0
+        if not alive.all():
+            host_np *= alive[self._column_agent]
+        return self._to_device(i, host).reshape(1, -1)
+
+    def split(self, joint_obs: torch.Tensor) -> dict[str, torch.Tensor]:
+        """1 x joint_obs_dim => agent_key => 1 x obs_dim views"""
+        return {
+            agent_key: joint_obs[:, start:end]
+            for agent_key, (start, end) in self._slices.items()
+        }
+
+    def collate_values(self, values: dict[str, float]) -> torch.Tensor:
+        """
+        One scalar per agent (rewards, actions), missing agents are 0.
+        output shape: n_agents, float32 on the device
+        """
+        host = np.zeros(len(self.agent_keys), dtype=np.float32)
+        for agent_key, value in values.items():
+            if agent_key in self._agent_index and value is not None:
+                host[self._agent_index[agent_key]] = value
+        return torch.from_numpy(host).to(self.device)
@@ -20,10 +20,45 @@ class BaseAgentConfig:
     eps_min: float = 0.01
     # replay memory
     mem_size: int = 10_000
+    # "int8" / "uint8": store integer-valued observations compactly (None: float32),
+    # uint8 for non-negative ones only; pushing an unrepresentable one raises
+    mem_obs_dtype: str | None = None
+    # prioritized replay (float32 storage only): priority exponent alpha,
+    # importance-sampling exponent beta annealed to 1 over per_beta_steps minibatches
+    prioritized_replay: bool = False
+    per_alpha: float = 0.6
+    per_beta: float = 0.4
+    per_beta_steps: int = 100_000
+    per_eps: float = 1e-6
+    # execution (defaults: eager float32)
+    # torch.compile the TD loss of train() (forwards, targets and loss)
+    compile_train: bool = False
+    # "bfloat16" / "float16": autocast the training forwards, the loss stays float32
+    autocast_dtype: str | None = None
+    # fused optimizer step and foreach gradient clipping
+    fused_opt: bool = False
+    # policy and target forwards of train() in one batched matmul per layer
+    # (DQN / GroupDQN networks), pays off where bmm is cheap (GPUs) but not on cpus
+    paired_forward: bool = False
 
     def validate(self) -> None:
         assert self.obs_dim is not None, "obs_dim must be set"
         assert self.act_dim is not None, "act_dim must be set"
+        assert self.mem_obs_dtype in (
+            None,
+            "float32",
+            "int8",
+            "uint8",
+        ), f"unsupported mem_obs_dtype: {self.mem_obs_dtype}"
+        assert not self.prioritized_replay or self.mem_obs_dtype in (
+            None,
+            "float32",
+        ), "prioritized_replay requires float32 replay storage"
+        assert self.autocast_dtype in (
+            None,
+            "bfloat16",
+            "float16",
+        ), f"unsupported autocast_dtype: {self.autocast_dtype}"
 
     def to_dict(self) -> dict:
         return asdict(self)
@@ -1,27 +1,566 @@
 import random
 
-from collections import namedtuple, deque
+from collections import namedtuple
+
+import numpy as np
+import torch
+
+from ._sum_tree import SumTree
+
+# compact storage dtypes for integer-valued observations
+COMPACT_OBS_DTYPES: dict[str, torch.dtype] = {
+    "int8": torch.int8,
+    "uint8": torch.uint8,
+}
+# rows copied at a time when loading saved buffers
+_LOAD_CHUNK_ROWS: int = 65_536
 
 # state: 1 x obs_dim
 # action: 1 x 1
 # reward: 1 x 1
 Transition = namedtuple("Transition", ("state", "action", "next_state", "reward"))
 
+# state / next_state: BS x obs_dim
+# action: BS x act_width
+# reward: BS x n_agents (1 for a single agent)
+# done: BS (bool), or BS x n_agents for a group; next_state rows of fully done
+# transitions are zeros
+# weight: BS importance-sampling weights, index: BS memory slots (prioritized
+# replay only, else None)
+TransitionBatch = namedtuple(
+    "TransitionBatch",
+    ("state", "action", "next_state", "reward", "done", "weight", "index"),
+    defaults=(None, None),
+)
+
+
+def _split_batch(
+    batch: TransitionBatch, n_batches: int, batch_size: int
+) -> list[TransitionBatch]:
+    # (n_batches * BS) x ... => n_batches batches of BS x ..., views
+    if n_batches == 1:
+        return [batch]
+    return [
+        TransitionBatch(*fields)
+        for fields in zip(
+            *(
+                [None] * n_batches if field is None else field.split(batch_size)
+                for field in batch
+            )
+        )
+    ]
+
 
 class ReplayMemory:
-    def __init__(self, capacity: int = 10_000) -> None:
-        self.memory: deque[Transition] = deque([], maxlen=capacity)
+    """
+    Ring buffer of transitions in preallocated contiguous tensors.
+    A `None` next_state (final transition) is stored as done=True.
+    With n_agents > 1, each row is a joint step of an agent group with one reward
+    and one done flag per agent.
+    """
+
+    # saved by state_dict
+    _buffer_names: tuple[str, ...] = (
+        "states",
+        "actions",
+        "next_states",
+        "rewards",
+        "dones",
+    )
+    _meta_names: tuple[str, ...] = ("_pos", "_size")
+    # buffers that change at any slot (not only where transitions are written),
+    # saved in full by incremental checkpoints
+    _dense_buffer_names: tuple[str, ...] = ()
+    # slots past _pos written along with the last transition
+    _tail_rows: int = 0
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        obs_dim: int = 1,
+        act_width: int = 1,
+        device: torch.device | str = "cpu",
+        n_agents: int = 1,
+    ) -> None:
+        self.capacity: int = capacity
+        self.device = torch.device(device)
+        self.n_agents: int = n_agents
+
+        self.states = torch.zeros(capacity, obs_dim, device=self.device)
+        self.actions = torch.zeros(
+            capacity, act_width, dtype=torch.long, device=self.device
+        )
+        self.next_states = torch.zeros(capacity, obs_dim, device=self.device)
+        self.rewards = torch.zeros(capacity, n_agents, device=self.device)
+        self.dones = torch.zeros(
+            capacity, n_agents, dtype=torch.bool, device=self.device
+        )
+
+        self._pos: int = 0  # next slot to write
+        self._size: int = 0
+        self._n_writes: int = 0  # slot advances so far, see written_slots
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffer, fixed at construction"""
+        return sum(
+            t.element_size() * t.nelement()
+            for t in (
+                self.states,
+                self.actions,
+                self.next_states,
+                self.rewards,
+                self.dones,
+            )
+        )
+
+    def push(self, state, action, next_state, reward, done=None) -> None:
+        """Save a transition, done defaults to `next_state is None`"""
+        pos = self._pos
+        self.states[pos] = torch.as_tensor(state).reshape(-1)
+        self.actions[pos] = torch.as_tensor(action).reshape(-1)
+        self.rewards[pos] = torch.as_tensor(reward).reshape(-1)
+        if next_state is None:
+            self.next_states[pos] = 0
+        else:
+            self.next_states[pos] = torch.as_tensor(next_state).reshape(-1)
+        self.dones[pos] = torch.as_tensor(
+            next_state is None if done is None else done
+        ).reshape(-1)
+
+        self._pos = (pos + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self._n_writes += 1
+
+    def extend(self, states, actions, next_states, rewards, dones) -> None:
+        """
+        Save a batch of transitions, next_states rows of done transitions are ignored.
+        input shapes: K x obs_dim, K x act_width, K x obs_dim, K x n_agents, K x n_agents
+        """
+        n_rows = len(states)
+        if n_rows == 0:
+            return
+        if n_rows > self.capacity:
+            states, actions, next_states, rewards, dones = (
+                t[-self.capacity :]
+                for t in (states, actions, next_states, rewards, dones)
+            )
+            n_rows = self.capacity
+        indices = (
+            torch.arange(self._pos, self._pos + n_rows, device=self.device)
+            % self.capacity
+        )
+        dones = torch.as_tensor(dones, device=self.device).reshape(n_rows, -1)
+        self.states[indices] = torch.as_tensor(states, device=self.device)
+        self.actions[indices] = torch.as_tensor(actions, device=self.device)
+        self.next_states[indices] = torch.as_tensor(
+            next_states, device=self.device
+        ).masked_fill(dones.all(1, keepdim=True), 0.0)
+        self.rewards[indices] = torch.as_tensor(rewards, device=self.device)
+        self.dones[indices] = dones
 
-    def push(self, *args) -> None:
-        """Save a transition"""
-        self.memory.append(Transition(*args))
+        self._pos = (self._pos + n_rows) % self.capacity
+        self._size = min(self._size + n_rows, self.capacity)
+        self._n_writes += n_rows
 
-    def sample(self, batch_size: int) -> list[Transition]:
-        if len(self.memory) < batch_size:
+    def sample(self, batch_size: int) -> TransitionBatch:
+        return self.sample_many(1, batch_size)[0]
+
+    def sample_many(self, n_batches: int, batch_size: int) -> list[TransitionBatch]:
+        """
+        n_batches independent minibatches, each drawn without replacement, with a
+        single gather over the buffers for all of them.
+        """
+        if self._size < batch_size:
             raise ValueError(
-                f"Not enough {len(self.memory)} samples for batch size: {batch_size}"
+                f"Not enough {self._size} samples for batch size: {batch_size}"
             )
-        return random.sample(self.memory, batch_size)
+        indices = torch.tensor(
+            [i for _ in range(n_batches) for i in self._sample_indices(batch_size)],
+            device=self.device,
+        )
+        return _split_batch(self._gather(indices), n_batches, batch_size)
+
+    def _sample_indices(self, batch_size: int) -> list[int]:
+        # uniform sampling without replacement, as random.sample over a deque
+        return random.sample(range(self._size), batch_size)
+
+    def _gather(self, indices: torch.Tensor) -> TransitionBatch:
+        return TransitionBatch(
+            state=self.states[indices],
+            action=self.actions[indices],
+            next_state=self.next_states[indices],
+            reward=self.rewards[indices],
+            done=self._batch_done(indices),
+        )
+
+    def _batch_done(self, indices: torch.Tensor) -> torch.Tensor:
+        done = self.dones[indices]  # BS x n_agents
+        return done.squeeze(1) if self.n_agents == 1 else done
+
+    def _n_written_rows(self) -> int:
+        # slots are written from 0 upwards, rows past this are still zeros
+        return self._size
+
+    def state_dict(self) -> dict[str, object]:
+        """
+        Written rows of the buffers (views, not copies) and the ring position.
+        output: {"buffers": name => n_rows x ..., "meta": {...}}
+        """
+        n_rows = self._n_written_rows()
+        return {
+            "buffers": {
+                name: getattr(self, name)[:n_rows] for name in self._buffer_names
+            },
+            "meta": {name: getattr(self, name) for name in self._meta_names},
+        }
+
+    def written_slots(self, since: int | None) -> np.ndarray | None:
+        """
+        Slots written since the memory had made `since` writes (see n_writes), for
+        incremental snapshots. output: slot indices, None if all rows may differ
+        """
+        if since is None:
+            return None
+        n_new = self._n_writes - since
+        if n_new < 0 or n_new + self._tail_rows >= self.capacity:
+            return None
+        return (self._pos - n_new + np.arange(n_new + self._tail_rows)) % self.capacity
+
+    @property
+    def n_writes(self) -> int:
+        return self._n_writes
+
+    def buffer_rows(self, name: str, slots: np.ndarray) -> torch.Tensor:
+        """Copy of the given rows of a saved buffer"""
+        return getattr(self, name)[torch.from_numpy(slots).to(self.device)]
+
+    def state_dict_since(self, since: int | None) -> dict[str, object]:
+        """
+        Snapshot (cpu copies) for incremental checkpoints: the rows written since the
+        memory had made `since` writes, all written rows if None or too long ago.
+        Dense buffers are copied in full.
+        output: {"buffers": name => rows, "slots": K slot indices of the rows, None
+            for rows 0..n_rows, "dense": buffers of rows 0..n_rows, "n_rows",
+            "capacity", "n_writes", "meta"}
+        """
+        slots = self.written_slots(since)
+        n_rows = self._n_written_rows()
+        if slots is None:
+            buffers = self.state_dict()["buffers"]
+        else:
+            buffers = {
+                name: (
+                    getattr(self, name)[:n_rows]
+                    if name in self._dense_buffer_names
+                    else self.buffer_rows(name, slots)
+                )
+                for name in self.state_dict_buffer_names()
+            }
+        return {
+            "buffers": {
+                name: rows.detach().to("cpu", copy=True)
+                for name, rows in buffers.items()
+            },
+            "slots": None if slots is None else torch.from_numpy(slots),
+            "dense": self._dense_buffer_names,
+            "n_rows": n_rows,
+            "capacity": self.capacity,
+            "n_writes": self._n_writes,
+            "meta": {name: getattr(self, name) for name in self._meta_names},
+        }
+
+    def state_dict_buffer_names(self) -> tuple[str, ...]:
+        """Buffers of state_dict"""
+        return self._buffer_names
+
+    def load_state_dict(self, state: dict[str, object]) -> None:
+        """Buffers may be any array-likes, e.g. memory-mapped arrays"""
+        for name, rows in state["buffers"].items():
+            buffer = getattr(self, name)
+            assert len(rows) <= len(buffer), f"{name}: {len(rows)} rows > capacity"
+            # chunk-wise, so memory-mapped rows are never fully loaded at once
+            for start in range(0, len(rows), _LOAD_CHUNK_ROWS):
+                chunk = rows[start : start + _LOAD_CHUNK_ROWS]
+                buffer[start : start + len(chunk)] = torch.as_tensor(
+                    chunk, dtype=buffer.dtype
+                ).to(self.device)
+        for name, value in state["meta"].items():
+            setattr(self, name, value)
 
     def __len__(self) -> int:
-        return len(self.memory)
+        return self._size
+
+
+class CompactReplayMemory(ReplayMemory):
+    """
+    Replay memory for integer-valued observations (e.g. int8 grids), stored in a
+    small dtype and cast to float32 only in sampled batches.
+    Consecutive transitions share frames: the next_state of slot i is the state of
+    slot i + 1, so each observation of a trajectory is stored once.
+    A slot that only keeps the last next_state of a trajectory is not sampled.
+    """
+
+    _buffer_names: tuple[str, ...] = ("frames", "actions", "rewards", "dones")
+    _meta_names: tuple[str, ...] = ("_pos", "_filled", "_size", "_next_pending")
+    # frames[_pos] may hold the pending next_state
+    _tail_rows: int = 1
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        obs_dim: int = 1,
+        act_width: int = 1,
+        device: torch.device | str = "cpu",
+        n_agents: int = 1,
+        obs_dtype: torch.dtype = torch.int8,
+    ) -> None:
+        self.capacity: int = capacity
+        self.device = torch.device(device)
+        self.n_agents: int = n_agents
+        self.obs_dtype: torch.dtype = obs_dtype
+
+        self.frames = torch.zeros(
+            capacity, obs_dim, dtype=obs_dtype, device=self.device
+        )
+        self.actions = torch.zeros(
+            capacity, act_width, dtype=torch.long, device=self.device
+        )
+        self.rewards = torch.zeros(capacity, n_agents, device=self.device)
+        self.dones = torch.zeros(
+            capacity, n_agents, dtype=torch.bool, device=self.device
+        )
+        # slots holding a full transition (host side, checked while sampling)
+        self.valid: list[bool] = [False] * capacity
+
+        self._pos: int = 0  # next slot to write
+        self._filled: int = 0  # number of slots written at least once
+        self._size: int = 0  # number of valid slots
+        # whether frames[_pos] holds the next_state of the last transition
+        self._next_pending: bool = False
+        self._n_writes: int = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffer, fixed at construction"""
+        return sum(
+            t.element_size() * t.nelement()
+            for t in (self.frames, self.actions, self.rewards, self.dones)
+        )
+
+    def _n_written_rows(self) -> int:
+        # the frame after the last written slot may hold a pending next_state
+        return min(self._filled + 1, self.capacity)
+
+    def state_dict(self) -> dict[str, object]:
+        state = super().state_dict()
+        state["buffers"]["valid"] = torch.tensor(
+            self.valid[: self._n_written_rows()], dtype=torch.bool
+        )
+        return state
+
+    def state_dict_buffer_names(self) -> tuple[str, ...]:
+        return self._buffer_names + ("valid",)
+
+    def buffer_rows(self, name: str, slots: np.ndarray) -> torch.Tensor:
+        if name == "valid":
+            return torch.tensor([self.valid[i] for i in slots.tolist()])
+        return super().buffer_rows(name, slots)
+
+    def load_state_dict(self, state: dict[str, object]) -> None:
+        buffers = dict(state["buffers"])
+        valid = np.asarray(buffers.pop("valid")).tolist()
+        super().load_state_dict({**state, "buffers": buffers})
+        self.valid[: len(valid)] = valid
+
+    def _set_valid(self, pos: int, valid: bool) -> None:
+        if self.valid[pos] != valid:
+            self._size += 1 if valid else -1
+            self.valid[pos] = valid
+
+    def _to_frame(self, obs) -> torch.Tensor:
+        # the cast must round-trip: uint8 would wrap -1 to 255, floats would truncate
+        obs = torch.as_tensor(obs, device=self.device).reshape(-1)
+        frame = obs.to(self.obs_dtype)
+        if not torch.equal(frame.to(obs.dtype), obs):
+            raise ValueError(
+                f"Observation not representable as {self.obs_dtype} "
+                f"(min: {obs.min().item()}, max: {obs.max().item()}), compact replay "
+                "needs integer-valued observations in its dtype range"
+            )
+        return frame
+
+    def push(self, state, action, next_state, reward, done=None) -> None:
+        """Save a transition, done defaults to `next_state is None`"""
+        # both frames first, a rejected observation leaves the memory unchanged
+        state = self._to_frame(state)
+        next_frame = None if next_state is None else self._to_frame(next_state)
+        pos = self._pos
+        if self._next_pending and not torch.equal(self.frames[pos], state):
+            # a new trajectory: keep the pending frame and skip its slot
+            pos = (pos + 1) % self.capacity
+            self._filled = min(self._filled + 1, self.capacity)
+            self._n_writes += 1
+        nxt = (pos + 1) % self.capacity
+
+        self.frames[pos] = state
+        self.actions[pos] = torch.as_tensor(action).reshape(-1)
+        self.rewards[pos] = torch.as_tensor(reward).reshape(-1)
+        self.dones[pos] = torch.as_tensor(
+            next_state is None if done is None else done
+        ).reshape(-1)
+        self._set_valid(pos, True)
+        # the next frame belongs to this transition, the slot is not sampleable
+        # until a following transition continues from it
+        self._set_valid(nxt, False)
+        if next_frame is not None:
+            self.frames[nxt] = next_frame
+        self._next_pending = next_frame is not None
+
+        self._pos = nxt
+        self._filled = min(self._filled + 1, self.capacity)
+        self._n_writes += 1
+
+    def extend(self, states, actions, next_states, rewards, dones) -> None:
+        # frames are shared row by row, see push
+        for state, action, next_state, reward, done in zip(
+            states, actions, next_states, rewards, dones
+        ):
+            done = torch.as_tensor(done).reshape(-1)
+            self.push(state, action, None if done.all() else next_state, reward, done)
+
+    def _sample_indices(self, batch_size: int) -> list[int]:
+        # uniform over valid slots without replacement: distinct draws, then top up
+        # the rejected ones
+        seen = set(random.sample(range(self._filled), batch_size))
+        picked = [i for i in seen if self.valid[i]]
+        while len(picked) < batch_size:
+            i = random.randrange(self._filled)
+            if i not in seen:
+                seen.add(i)
+                if self.valid[i]:
+                    picked.append(i)
+        return picked
+
+    def _gather(self, indices: torch.Tensor) -> TransitionBatch:
+        # no next frame is stored after a fully done transition
+        all_done = self.dones[indices].all(1, keepdim=True)
+        next_indices = (indices + 1) % self.capacity
+        return TransitionBatch(
+            state=self.frames[indices].float(),
+            action=self.actions[indices],
+            next_state=self.frames[next_indices].float().masked_fill_(all_done, 0.0),
+            reward=self.rewards[indices],
+            done=self._batch_done(indices),
+        )
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """
+    Proportional prioritized replay (PER): slot i is sampled with probability
+    p_i^alpha / sum_k p_k^alpha, p_i = |TD error| + eps, new transitions get the
+    largest priority seen so far. p^alpha is kept in a SumTree; each minibatch is
+    drawn stratified (one prefix sum per equal segment of the total), so it may
+    repeat slots. Batches carry importance-sampling weights (N * P(i))^-beta,
+    normalized by their maximum per minibatch, with beta annealed linearly to 1
+    over beta_steps sampled minibatches.
+    """
+
+    _buffer_names: tuple[str, ...] = ReplayMemory._buffer_names + ("priorities",)
+    _dense_buffer_names: tuple[str, ...] = ("priorities",)
+    _meta_names: tuple[str, ...] = ReplayMemory._meta_names + (
+        "_max_priority",
+        "_n_sampled",
+    )
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        obs_dim: int = 1,
+        act_width: int = 1,
+        device: torch.device | str = "cpu",
+        n_agents: int = 1,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        beta_steps: int = 100_000,
+        eps: float = 1e-6,
+    ) -> None:
+        super().__init__(capacity, obs_dim, act_width, device, n_agents)
+        self.alpha: float = alpha
+        self.beta_start: float = beta
+        self.beta_steps: int = beta_steps
+        self.eps: float = eps
+
+        self._tree: SumTree = SumTree(capacity)
+        self._max_priority: float = 1.0
+        self._n_sampled: int = 0  # minibatches sampled, for the beta schedule
+
+    @property
+    def priorities(self) -> torch.Tensor:
+        """p^alpha of every slot, a view of the sum tree leaves"""
+        return torch.from_numpy(self._tree.leaves)
+
+    @property
+    def beta(self) -> float:
+        progress = min(self._n_sampled / max(self.beta_steps, 1), 1.0)
+        return self.beta_start + (1.0 - self.beta_start) * progress
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self._tree.nbytes
+
+    def push(self, state, action, next_state, reward, done=None) -> None:
+        pos = self._pos
+        super().push(state, action, next_state, reward, done)
+        self._tree.set(pos, self._max_priority**self.alpha)
+
+    def extend(self, states, actions, next_states, rewards, dones) -> None:
+        pos, n_rows = self._pos, min(len(states), self.capacity)
+        super().extend(states, actions, next_states, rewards, dones)
+        self._tree.update(
+            np.arange(pos, pos + n_rows) % self.capacity,
+            np.full(n_rows, self._max_priority**self.alpha),
+        )
+
+    def sample_many(self, n_batches: int, batch_size: int) -> list[TransitionBatch]:
+        if self._size < batch_size:
+            raise ValueError(
+                f"Not enough {self._size} samples for batch size: {batch_size}"
+            )
+        total = self._tree.total
+        segment = total / batch_size
+        # one uniform draw per segment of each minibatch, all searched at once
+        prefix_sums = (
+            np.tile(np.arange(batch_size), n_batches)
+            + np.random.random(n_batches * batch_size)
+        ) * segment
+        indices = np.minimum(
+            self._tree.find(np.minimum(prefix_sums, np.nextafter(total, 0))),
+            self._size - 1,
+        )
+        probs = self._tree.get(indices) / total
+        weights = (self._size * probs).reshape(n_batches, batch_size) ** -self.beta
+        weights /= weights.max(axis=1, keepdims=True)
+        self._n_sampled += n_batches
+
+        indices_t = torch.from_numpy(indices).to(self.device)
+        batch = self._gather(indices_t)._replace(
+            weight=torch.from_numpy(weights.reshape(-1).astype(np.float32)).to(
+                self.device
+            ),
+            index=indices_t,
+        )
+        return _split_batch(batch, n_batches, batch_size)
+
+    def update_priorities(self, indices: torch.Tensor, td_errors: torch.Tensor) -> None:
+        """
+        New priorities |TD error| + eps of sampled slots, one call for any number of
+        minibatches. input shapes: K, K
+        """
+        priorities = td_errors.detach().abs().float().cpu().numpy() + self.eps
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+        self._tree.update(indices.cpu().numpy(), priorities**self.alpha)
+
+    def load_state_dict(self, state: dict[str, object]) -> None:
+        super().load_state_dict(state)
+        self._tree.rebuild()
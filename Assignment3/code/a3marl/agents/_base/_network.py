@@ -38,3 +38,92 @@ class DQN(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         res = self.network(x)
         return res
+
+
+class GroupDQN(nn.Module):
+    """
+    n_agents independent DQN-shaped MLPs, evaluated together with batched matmuls.
+    input shape: n_agents x BS x obs_dim
+    output shape: n_agents x BS x act_dim
+    """
+
+    def __init__(
+        self, n_agents: int, n_obs: int, n_act: int, hidden_dims: list[int]
+    ) -> None:
+        super(GroupDQN, self).__init__()
+        self.n_agents: int = n_agents
+        self.obs_dim: int = n_obs
+        self.act_dim: int = n_act
+        self.hidden_dims: list[int] = hidden_dims
+
+        # model: layer i maps n_agents x BS x dims[i] to n_agents x BS x dims[i + 1]
+        dims = [self.obs_dim, *self.hidden_dims, self.act_dim]
+        self.weights: nn.ParameterList = nn.ParameterList(
+            [
+                nn.Parameter(torch.empty(n_agents, in_dim, out_dim))
+                for in_dim, out_dim in zip(dims[:-1], dims[1:])
+            ]
+        )
+        self.biases: nn.ParameterList = nn.ParameterList(
+            [nn.Parameter(torch.empty(n_agents, 1, out_dim)) for out_dim in dims[1:]]
+        )
+        self._reset_parameters()
+
+    def _reset_parameters(self) -> None:
+        # same initialization as one DQN per agent, weight[k].T is an nn.Linear weight
+        with torch.no_grad():
+            for weight, bias in zip(self.weights, self.biases):
+                for agent_weight in weight:
+                    nn.init.kaiming_normal_(agent_weight.T, nonlinearity="relu")
+                nn.init.zeros_(bias)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        n_layers = len(self.weights)
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = torch.baddbmm(bias, x, weight)
+            if i < n_layers - 1:
+                x = torch.relu(x)
+        return x
+
+
+def _layer_params(net: nn.Module) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    """(weight: k x in x out, bias: k x 1 x out) per layer, k = 1 for a DQN"""
+    if isinstance(net, GroupDQN):
+        return list(zip(net.weights, net.biases))
+    return [
+        (layer.weight.T.unsqueeze(0), layer.bias.reshape(1, 1, -1))
+        for layer in net.network
+        if isinstance(layer, nn.Linear)
+    ]
+
+
+def paired_forward(
+    policy_net: nn.Module,
+    target_net: nn.Module,
+    x: torch.Tensor,
+    x_target: torch.Tensor,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    policy_net(x) and target_net(x_target) of two DQNs (or GroupDQNs) of the same
+    shape in one batched matmul per layer; the target output has no grad.
+    input shape: BS x obs_dim twice (n_agents x BS x obs_dim for GroupDQN)
+    output shape: BS x act_dim twice (n_agents x BS x act_dim for GroupDQN)
+    """
+    single = x.dim() == 2
+    if single:
+        x, x_target = x.unsqueeze(0), x_target.unsqueeze(0)
+    k = x.shape[0]
+    h = torch.cat([x, x_target])  # 2k x BS x obs_dim
+    layers = list(zip(_layer_params(policy_net), _layer_params(target_net)))
+    for i, ((weight, bias), (target_weight, target_bias)) in enumerate(layers):
+        h = torch.baddbmm(
+            torch.cat([bias, target_bias.detach()]),
+            h,
+            torch.cat([weight, target_weight.detach()]),
+        )
+        if i < len(layers) - 1:
+            h = torch.relu(h)
+    q_values, target_q_values = h[:k], h[k:].detach()
+    if single:
+        return q_values[0], target_q_values[0]
+    return q_values, target_q_values
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class SumTree:
+    """
+    Binary sum tree over `capacity` leaves in one flat array: the root is node 1,
+    node i has children 2i and 2i + 1, leaves start at n_leaves (a power of two).
+    Updates and prefix-sum searches take numpy index arrays and walk the tree one
+    level at a time for all of them, O(log N) vectorized steps per call.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        self.n_leaves: int = 1 << max(capacity - 1, 0).bit_length()
+        self.depth: int = self.n_leaves.bit_length() - 1
+        self.tree: np.ndarray = np.zeros(2 * self.n_leaves)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    @property
+    def leaves(self) -> np.ndarray:
+        """Writable view of the leaf values, call rebuild after writing to it"""
+        return self.tree[self.n_leaves : self.n_leaves + self.capacity]
+
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        return self.tree[np.asarray(indices) + self.n_leaves]
+
+    def set(self, index: int, value: float) -> None:
+        """Single leaf update, cheaper than `update` for one index"""
+        node = index + self.n_leaves
+        tree = self.tree
+        tree[node] = value
+        node //= 2
+        while node >= 1:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    def update(self, indices: np.ndarray, values: np.ndarray) -> None:
+        """Set leaves, the last value wins for repeated indices"""
+        nodes = np.asarray(indices, dtype=np.int64) + self.n_leaves
+        if len(nodes) == 0:
+            return
+        self.tree[nodes] = values
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def rebuild(self) -> None:
+        """Recompute all inner nodes from the leaves"""
+        for level in range(self.depth - 1, -1, -1):
+            start = 1 << level
+            children = self.tree[2 * start : 4 * start]
+            self.tree[start : 2 * start] = children[0::2] + children[1::2]
+
+    def find(self, prefix_sums: np.ndarray) -> np.ndarray:
+        """
+        Leaf index of each prefix sum in [0, total): the first leaf whose cumulative
+        value exceeds it. Zero-valued subtrees are never entered.
+        """
+        values = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sums = self.tree[left]
+            go_right = (values >= left_sums) & (self.tree[left + 1] > 0)
+            values = np.where(go_right, values - left_sums, values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.n_leaves
+
+    @property
+    def nbytes(self) -> int:
+        return self.tree.nbytes
@@ -5,7 +5,13 @@ import numpy as np
 import torch
 import torch.nn as nn
 
-from ._base import Transition, BaseAgent, BaseAgentConfig
+from ._base import (
+    BaseAgent,
+    BaseAgentConfig,
+    ObsCollator,
+    ReplayMemory,
+    TransitionBatch,
+)
 
 
 @dataclass
@@ -34,6 +40,43 @@ class CqlAgent(BaseAgent):
         super().__init__(sid, config, act_sampler, device)
         self.config: CqlAgentConfig = config
 
+        # mixed radix of the joint action, the last agent is the least significant
+        act_dims = list(self.config.act_dims.values())
+        self._act_dims_t: torch.Tensor = torch.tensor(act_dims, device=self.device)
+        self._act_strides_t: torch.Tensor = torch.tensor(
+            [math.prod(act_dims[i + 1 :]) for i in range(len(act_dims))],
+            device=self.device,
+        )
+        # joint observations: one host buffer and device copy per call
+        self._obs_collator: ObsCollator = ObsCollator(self.config.obs_dims, self.device)
+
+    def _build_replay_memory(self) -> ReplayMemory:
+        # one action entry per agent, -1 for done agents
+        return super()._build_replay_memory(act_width=self.n_agents())
+
+    def actions_to_row(
+        self,
+        actions: dict[str, int | None],
+        next_dones: dict[str, bool] | None = None,
+    ) -> list[int]:
+        """
+        Replay memory layout of a joint action: one entry per agent, -1 if done.
+        next_dones (agents done after the step) is unused here, see FactoredCqlAgent
+        """
+        return [
+            -1 if actions[agent_key] is None else actions[agent_key]
+            for agent_key in self.agent_keys()
+        ]
+
+    def memorize(
+        self,
+        state,
+        actions: dict[str, int | None],
+        *args,
+        next_dones: dict[str, bool] | None = None,
+    ) -> None:
+        super().memorize(state, self.actions_to_row(actions, next_dones), *args)
+
     def agent_keys(self) -> list[str]:
         return list(self.config.act_dims.keys())
 
@@ -43,21 +86,14 @@ class CqlAgent(BaseAgent):
     def get_masked_joint_obs(
         self, observations: torch.Tensor | dict, done_agents: dict[str, bool] = None
     ) -> torch.Tensor:
+        """
+        Joint observation in obs_dims order, done (or missing) agents are zeros.
+        output shape: 1 x joint_obs_dim
+        """
         if isinstance(observations, torch.Tensor):
             # transformation already finished
             return observations
-        return torch.concat(
-            [
-                (
-                    torch.zeros(self.config.obs_dims[cur_agent], device=self.device)
-                    if cur_done
-                    else torch.tensor(
-                        observations[cur_agent], dtype=torch.float32, device=self.device
-                    )
-                )
-                for cur_agent, cur_done in done_agents.items()
-            ]
-        ).reshape(1, -1)
+        return self._obs_collator.collate(observations, done_agents)
 
     def decode_joint_action(self, joint_action: int) -> dict[str, int | None]:
         """
@@ -90,6 +126,27 @@ class CqlAgent(BaseAgent):
             multiplier *= act_dim
         return res
 
+    def decode_joint_actions(self, joint_actions: torch.Tensor) -> torch.Tensor:
+        """
+        Batched decode_joint_action on the device.
+        input shape: BS
+        output shape: BS x n_agents
+        """
+        return (joint_actions.unsqueeze(1) // self._act_strides_t) % self._act_dims_t
+
+    def encode_joint_actions(self, actions: torch.Tensor) -> torch.Tensor:
+        """
+        Batched encode_joint_action on the device, -1 marks a done agent.
+        Done agents get a random action in [0, act_dim - 1), as in encode_joint_action.
+        input shape: BS x n_agents
+        output shape: BS x 1
+        """
+        random_actions = (
+            torch.rand(actions.shape, device=actions.device) * (self._act_dims_t - 1)
+        ).long()
+        actions = torch.where(actions < 0, random_actions, actions)
+        return (actions * self._act_strides_t).sum(dim=1, keepdim=True)
+
     def get_masked_actions(
         self, joint_action: int, done_agents=None
     ) -> dict[str, int | None]:
@@ -126,45 +183,31 @@ class CqlAgent(BaseAgent):
 
         with torch.no_grad():
             q_values: torch.Tensor = dqn(state)
-            joint_act = q_values.argmax(dim=1).item()
-        return self.get_masked_actions(joint_act, done_agents)
-
-    def train(self) -> None:
-        if len(self.replay_memory) < self.config.batch_size:
-            return
+            agent_actions = self.decode_joint_actions(q_values.argmax(dim=1))
+        actions = dict(zip(self.agent_keys(), agent_actions.reshape(-1).tolist()))
+        if done_agents:
+            actions = {
+                agent: None if done_agents[agent] else actions[agent]
+                for agent in self.agent_keys()
+            }
+        return actions
 
-        # sample a batch of transitions
-        transitions = self.replay_memory.sample(self.config.batch_size)
-        # batch of transitions => 1 transition with batch-array values
-        batch = Transition(*zip(*transitions))
+    def _td_loss(self, batch: TransitionBatch) -> torch.Tensor:
+        # batch: sampled transitions, already collated as batch tensors
 
         # Q(s_t)
-        state_batch = torch.cat(batch.state)  # BS x obs_dim
-        action_batch = torch.tensor(
-            [[self.encode_joint_action(cur_actions)] for cur_actions in batch.action],
-            device=self.device,
-            dtype=torch.long,
-        )  # BS x 1
-        q_values_batch: torch.Tensor = self.policy_net(state_batch)  # BS x act_dim
+        state_batch = batch.state  # BS x obs_dim
+        action_batch = self.encode_joint_actions(batch.action)  # BS x 1
+        # Q(s_{t+1}) of the target net comes along, BS x act_dim each
+        q_values_batch, next_q_values_batch = self._train_q_values(
+            state_batch, batch.next_state
+        )
         state_action_q_values = q_values_batch.gather(1, action_batch)  # BS x 1
 
         # max_a Q(s_{t+1}, a)
-        non_final_mask = torch.tensor(
-            tuple(map(lambda s: s is not None, batch.next_state)),
-            device=self.device,
-            dtype=torch.bool,
-        )  # BS' x 1(bool)
-        non_final_nxt_states = torch.cat(
-            [s for s in batch.next_state if s is not None]
-        )  # BS' x obs_dim
-        reward_batch = torch.cat(batch.reward)  # BS x 1
-        next_state_best_q_values = torch.zeros(
-            self.config.batch_size, device=self.device
-        )  # BS
-        with torch.no_grad():
-            next_state_best_q_values[non_final_mask] = (
-                self.target_net(non_final_nxt_states).max(1).values
-            )
+        reward_batch = batch.reward  # BS x 1
+        next_state_best_q_values = next_q_values_batch.max(1).values
+        next_state_best_q_values.masked_fill_(batch.done, 0.0)  # BS
         # V(s_{t+1})
         expected_state_action_q_values = reward_batch + (
             self.config.gamma
@@ -172,12 +215,8 @@ class CqlAgent(BaseAgent):
         )  # BS x 1
 
         # loss
-        loss = self.criterion(state_action_q_values, expected_state_action_q_values)
-
-        # optimize
-        self.opt.zero_grad()
-        loss.backward()
-        nn.utils.clip_grad_value_(
-            self.policy_net.parameters(), self.config.grad_clip_value
+        loss = self._td_criterion(
+            state_action_q_values, expected_state_action_q_values, batch
         )
-        self.opt.step()
+
+        return loss
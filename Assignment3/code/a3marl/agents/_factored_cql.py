@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from ._base import GroupDQN, ReplayMemory, TransitionBatch
+from ._cql import CqlAgent, CqlAgentConfig
+
+
+@dataclass
+class FactoredCqlAgentConfig(CqlAgentConfig):
+    # "vdn": Q_tot = sum_i Q_i, "qmix": monotonic mixing conditioned on the joint obs
+    mixer: str = "vdn"
+    mixer_embed_dim: int = 32
+
+    def validate(self) -> None:
+        super().validate()
+        assert self.mixer in ("vdn", "qmix"), f"unsupported mixer: {self.mixer}"
+        assert (
+            len(set(self.obs_dims.values())) == 1
+            and len(set(self.act_dims.values())) == 1
+        ), "FactoredCqlAgent requires agents with the same obs/act dims"
+
+    def infer_joint_space(self) -> "FactoredCqlAgentConfig":
+        # joint obs for the mixer, per-agent action space for the utility heads
+        self.obs_dim = sum(self.obs_dims.values())
+        self.act_dim = next(iter(self.act_dims.values()))
+        return self
+
+
+class VdnMixer(nn.Module):
+    def forward(self, agent_qs: torch.Tensor, joint_obs: torch.Tensor) -> torch.Tensor:
+        """
+        input shape: BS x n_agents, BS x joint_obs_dim
+        output shape: BS x 1
+        """
+        return agent_qs.sum(dim=1, keepdim=True)
+
+
+class QMixer(nn.Module):
+    """Monotonic mixing network, weights generated from the joint obs (QMIX)"""
+
+    def __init__(self, n_agents: int, joint_obs_dim: int, embed_dim: int) -> None:
+        super(QMixer, self).__init__()
+        self.n_agents: int = n_agents
+        self.embed_dim: int = embed_dim
+
+        self.hyper_w1: nn.Linear = nn.Linear(joint_obs_dim, n_agents * embed_dim)
+        self.hyper_b1: nn.Linear = nn.Linear(joint_obs_dim, embed_dim)
+        self.hyper_w2: nn.Linear = nn.Linear(joint_obs_dim, embed_dim)
+        self.hyper_b2: nn.Sequential = nn.Sequential(
+            nn.Linear(joint_obs_dim, embed_dim), nn.ReLU(), nn.Linear(embed_dim, 1)
+        )
+
+    def forward(self, agent_qs: torch.Tensor, joint_obs: torch.Tensor) -> torch.Tensor:
+        """
+        input shape: BS x n_agents, BS x joint_obs_dim
+        output shape: BS x 1
+        """
+        # abs() keeps dQ_tot/dQ_i >= 0, so per-agent argmax is the joint argmax
+        w1 = self.hyper_w1(joint_obs).abs().view(-1, self.n_agents, self.embed_dim)
+        b1 = self.hyper_b1(joint_obs).unsqueeze(1)
+        hidden = F.elu(torch.bmm(agent_qs.unsqueeze(1), w1) + b1)  # BS x 1 x embed
+        w2 = self.hyper_w2(joint_obs).abs().unsqueeze(2)  # BS x embed x 1
+        b2 = self.hyper_b2(joint_obs)  # BS x 1
+        return torch.bmm(hidden, w2).squeeze(1) + b2
+
+
+class FactoredQNet(nn.Module):
+    """Per-agent utilities Q_i(o_i, a_i) stacked in a GroupDQN, plus a mixer"""
+
+    def __init__(self, config: FactoredCqlAgentConfig) -> None:
+        super(FactoredQNet, self).__init__()
+        n_agents = len(config.obs_dims)
+        self.n_agents: int = n_agents
+        self.utilities: GroupDQN = GroupDQN(
+            n_agents,
+            next(iter(config.obs_dims.values())),
+            config.act_dim,
+            config.hidden_dims,
+        )
+        self.mixer: nn.Module = (
+            QMixer(n_agents, config.obs_dim, config.mixer_embed_dim)
+            if config.mixer == "qmix"
+            else VdnMixer()
+        )
+
+    def agent_q_values(self, joint_obs: torch.Tensor) -> torch.Tensor:
+        """
+        input shape: BS x joint_obs_dim
+        output shape: n_agents x BS x act_dim
+        """
+        batch_size = joint_obs.shape[0]
+        return self.utilities(
+            joint_obs.reshape(batch_size, self.n_agents, -1).transpose(0, 1)
+        )
+
+    def forward(self, joint_obs: torch.Tensor) -> torch.Tensor:
+        return self.agent_q_values(joint_obs)
+
+
+class FactoredCqlAgent(CqlAgent):
+    """
+    Centralized learner with value decomposition: Q_tot is mixed from per-agent
+    utilities, so network size and action selection grow linearly with n_agents.
+    Drop-in for CqlAgent in the CQL trainer.
+    """
+
+    def __init__(
+        self,
+        sid: str,
+        config: FactoredCqlAgentConfig,
+        act_sampler: callable,
+        device=None,
+    ) -> None:
+        super().__init__(sid, config, act_sampler, device)
+        self.config: FactoredCqlAgentConfig = config
+
+    def _build_network(self) -> nn.Module:
+        return FactoredQNet(self.config)
+
+    def _build_replay_memory(self) -> ReplayMemory:
+        # per agent: the action (-1 for done agents), then 1 if done after the step
+        return super(CqlAgent, self)._build_replay_memory(act_width=2 * self.n_agents())
+
+    def actions_to_row(
+        self,
+        actions: dict[str, int | None],
+        next_dones: dict[str, bool] | None = None,
+    ) -> list[int]:
+        """The CqlAgent row followed by the next-step done flag of every agent"""
+        assert next_dones is not None, "FactoredCqlAgent memorizes next-step dones"
+        return super().actions_to_row(actions) + [
+            int(next_dones[agent_key]) for agent_key in self.agent_keys()
+        ]
+
+    def _select_action_eps(
+        self,
+        state: torch.Tensor,
+        dqn: FactoredQNet,
+        eps: float = -1,
+        done_agents: dict[str, bool] = None,
+    ) -> dict[str, int | None]:
+        """
+        input shape: 1 x joint_obs_dim
+        [NOTE] output: dict[str, int | None]
+        """
+        if eps == -1:
+            eps = self.eps
+        if np.random.random() < eps:
+            return self.act_sampler()
+
+        with torch.no_grad():
+            # monotonic mixing: the greedy joint action is the per-agent argmax
+            agent_actions = dqn.agent_q_values(state).argmax(dim=2).reshape(-1)
+        actions = dict(zip(self.agent_keys(), agent_actions.tolist()))
+        if done_agents:
+            actions = {
+                agent_key: None if done_agents[agent_key] else action
+                for agent_key, action in actions.items()
+            }
+        return actions
+
+    def _td_loss(self, batch: TransitionBatch) -> torch.Tensor:
+        # BS x n_agents each, -1 marks done agents, 1 agents done at s_{t+1}
+        action_batch, next_done_batch = batch.action.split(self.n_agents(), dim=1)
+        acting_mask = action_batch >= 0
+        next_acting_mask = next_done_batch == 0
+
+        # the mixers are not DQN-shaped: no paired forward (compile_train still
+        # compiles this whole loss)
+        with self._autocast():
+            # Q_tot(s_t, a): done agents contribute no utility
+            agent_q_values = self.policy_net.agent_q_values(batch.state)
+            chosen_q_values = (
+                agent_q_values.gather(2, action_batch.clamp(min=0).T.unsqueeze(2))
+                .squeeze(2)
+                .T
+            ) * acting_mask  # BS x n_agents
+            state_action_q_values = self.policy_net.mixer(
+                chosen_q_values, batch.state
+            ).float()
+
+            # max_a Q_tot(s_{t+1}, a) = mix of per-agent max utilities, agents done
+            # at s_{t+1} contribute no utility (as in Q_tot(s_t, a))
+            with torch.no_grad():
+                next_agent_best_q_values = (
+                    self.target_net.agent_q_values(batch.next_state).max(2).values.T
+                ) * next_acting_mask  # BS x n_agents
+                next_state_best_q_values = (
+                    self.target_net.mixer(next_agent_best_q_values, batch.next_state)
+                    .float()
+                    .masked_fill(batch.done.unsqueeze(1), 0.0)
+                )
+        # V(s_{t+1})
+        expected_state_action_q_values = (
+            batch.reward + self.config.gamma * next_state_best_q_values
+        )  # BS x 1
+
+        # loss
+        loss = self._td_criterion(
+            state_action_q_values, expected_state_action_q_values, batch
+        )
+
+        return loss
@@ -1,10 +1,9 @@
 from dataclasses import dataclass
 
 import torch
-from torch import nn
 import numpy as np
 
-from ._base import Transition, BaseAgentConfig, BaseAgent, DQN
+from ._base import BaseAgentConfig, BaseAgent, DQN, TransitionBatch
 
 
 @dataclass
@@ -38,31 +37,16 @@ class IqlAgent(BaseAgent):
             sel_res = q_values.argmax(dim=1).reshape(1, 1)
         return sel_res
 
-    def train(self) -> None:
-        if len(self.replay_memory) < self.config.batch_size:
-            return
+    def _td_loss(self, batch: TransitionBatch) -> torch.Tensor:
+        # batch: sampled transitions, already collated as batch tensors
+        state_batch = batch.state  # BS x obs_dim
+        action_batch = batch.action  # BS x 1
+        reward_batch = batch.reward  # BS x 1
 
-        # sample a batch of transitions
-        transitions = self.replay_memory.sample(self.config.batch_size)
-        # batch of transitions => 1 transition with batch-array values
-        batch = Transition(*zip(*transitions))
-
-        # mask of non-final states
-        non_final_mask = torch.tensor(
-            tuple(map(lambda s: s is not None, batch.next_state)),
-            device=self.device,
-            dtype=torch.bool,
-        )  # BS' x 1(bool)
-        non_final_nxt_states = torch.cat(
-            [s for s in batch.next_state if s is not None]
-        )  # BS' x obs_dim
-
-        state_batch = torch.cat(batch.state)  # BS x obs_dim
-        action_batch = torch.cat(batch.action)  # BS x 1
-        reward_batch = torch.cat(batch.reward)  # BS x 1
-
-        # Q(s_t)
-        q_values_batch: torch.Tensor = self.policy_net(state_batch)  # BS x act_dim
+        # Q(s_t) and Q(s_{t+1}): BS x act_dim each
+        q_values_batch, next_q_values_batch = self._train_q_values(
+            state_batch, batch.next_state
+        )
         # select the q values of the corresponding actions to get Q(s_t, a)
         # torch.gather: pick values from q_values_batch and place them at dim=1 (second dimension)
         # values are the q values indexed by action_batch, for example, if action=1 in batch=0,
@@ -70,15 +54,10 @@ class IqlAgent(BaseAgent):
         state_action_q_values = q_values_batch.gather(1, action_batch)  # BS x 1
 
         # max_a Q(s_{t+1}, a)
-        next_state_best_q_values = torch.zeros(
-            self.config.batch_size, device=self.device
-        )  # BS
-        with torch.no_grad():
-            # BS' x obs_dim ==target_net==> BS' x act_dim ==max(1).values==> BS'
-            # use the mask to fill the BS' values into their positions
-            next_state_best_q_values[non_final_mask] = (
-                self.target_net(non_final_nxt_states).max(1).values
-            )
+        # BS x act_dim ==max(1).values==> BS
+        # final states have no successor, so their values are zeroed by the done mask
+        next_state_best_q_values = next_q_values_batch.max(1).values
+        next_state_best_q_values.masked_fill_(batch.done, 0.0)  # BS
         # V(s_{t+1})
         expected_state_action_q_values = reward_batch + (
             self.config.gamma
@@ -86,12 +65,8 @@ class IqlAgent(BaseAgent):
         )  # BS x 1
 
         # loss
-        loss = self.criterion(state_action_q_values, expected_state_action_q_values)
-
-        # optimize
-        self.opt.zero_grad()
-        loss.backward()
-        nn.utils.clip_grad_value_(
-            self.policy_net.parameters(), self.config.grad_clip_value
+        loss = self._td_criterion(
+            state_action_q_values, expected_state_action_q_values, batch
         )
-        self.opt.step()
+
+        return loss
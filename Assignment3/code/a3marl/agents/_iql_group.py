@@ -0,0 +1,103 @@
+import torch
+from torch import nn
+
+from ._base import BaseAgent, GroupDQN, ReplayMemory, TransitionBatch
+from ._iql import IqlAgentConfig
+
+
+class IqlAgentGroup(BaseAgent):
+    """
+    Independent Q-learners of agents sharing obs_dim/act_dim, trained as one batch.
+    Each agent keeps its own network (stacked in a GroupDQN); action selection and
+    TD updates of all agents run in one call.
+    Exploration draws actions uniformly from range(act_dim).
+    """
+
+    def __init__(
+        self,
+        sid: str,
+        config: IqlAgentConfig,
+        agent_keys: list[str],
+        act_sampler: callable = None,
+        device=None,
+    ) -> None:
+        self._agent_keys: list[str] = list(agent_keys)
+        super().__init__(sid, config, act_sampler, device)
+        self.config: IqlAgentConfig = config
+
+    def agent_keys(self) -> list[str]:
+        return self._agent_keys
+
+    def n_agents(self) -> int:
+        return len(self._agent_keys)
+
+    def _build_network(self) -> nn.Module:
+        return GroupDQN(
+            self.n_agents(),
+            self.config.obs_dim,
+            self.config.act_dim,
+            self.config.hidden_dims,
+        )
+
+    def _build_replay_memory(self, **kwargs) -> ReplayMemory:
+        # one row per joint step: n_agents x obs_dim states, one action per agent
+        return super()._build_replay_memory(
+            obs_dim=self.n_agents() * self.config.obs_dim,
+            act_width=self.n_agents(),
+            n_agents=self.n_agents(),
+        )
+
+    def _select_action_eps(
+        self, state: torch.Tensor, dqn: GroupDQN, eps: float = -1, **kwargs
+    ) -> torch.Tensor:
+        """
+        input shape: n_agents x obs_dim
+        output shape: n_agents x 1
+        """
+        if eps == -1:
+            eps = self.eps
+        n_agents = self.n_agents()
+        with torch.no_grad():
+            q_values: torch.Tensor = dqn(state.unsqueeze(1))  # n_agents x 1 x act_dim
+            sel_res = q_values.argmax(dim=2)  # n_agents x 1
+        explore = torch.rand(n_agents, 1, device=self.device) < eps
+        if explore.any():
+            sample_res = torch.randint(
+                0, self.config.act_dim, (n_agents, 1), device=self.device
+            )
+            sel_res = torch.where(explore, sample_res, sel_res)
+        return sel_res
+
+    def _td_loss(self, batch: TransitionBatch) -> torch.Tensor:
+        batch_size = self.config.batch_size
+        n_agents = self.n_agents()
+        # BS x (n_agents * obs_dim) => n_agents x BS x obs_dim
+        state_batch = batch.state.reshape(batch_size, n_agents, -1).transpose(0, 1)
+        next_state_batch = batch.next_state.reshape(batch_size, n_agents, -1).transpose(
+            0, 1
+        )
+        action_batch = batch.action.T.unsqueeze(2)  # n_agents x BS x 1
+        reward_batch = batch.reward.T.unsqueeze(2)  # n_agents x BS x 1
+        done_batch = batch.done.reshape(batch_size, n_agents).T  # n_agents x BS
+
+        # Q(s_t) and Q(s_{t+1}): n_agents x BS x act_dim each
+        q_values_batch, next_q_values_batch = self._train_q_values(
+            state_batch, next_state_batch
+        )
+        # Q(s_t, a)
+        state_action_q_values = q_values_batch.gather(2, action_batch)
+
+        # max_a Q(s_{t+1}, a)
+        next_state_best_q_values = next_q_values_batch.max(2).values
+        next_state_best_q_values.masked_fill_(done_batch, 0.0)  # n_agents x BS
+        # V(s_{t+1})
+        expected_state_action_q_values = reward_batch + (
+            self.config.gamma * next_state_best_q_values.unsqueeze(2)
+        )  # n_agents x BS x 1
+
+        # sum of the per-agent mean losses, so each agent gets its own gradient
+        loss = n_agents * self._td_criterion(
+            state_action_q_values, expected_state_action_q_values, batch, row_dim=1
+        )
+
+        return loss
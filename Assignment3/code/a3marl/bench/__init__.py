@@ -0,0 +1,22 @@
+from ._suite import (
+    SUITES,
+    bench_env,
+    bench_replay_sample,
+    bench_train,
+    bench_trainer,
+    run_suite,
+)
+from ._compare import compare_results, format_comparison, load_results, save_results
+
+__all__ = [
+    "SUITES",
+    "bench_env",
+    "bench_replay_sample",
+    "bench_train",
+    "bench_trainer",
+    "run_suite",
+    "compare_results",
+    "format_comparison",
+    "load_results",
+    "save_results",
+]
@@ -0,0 +1,42 @@
+"""
+Usage:
+    python -m a3marl.bench --out bench.json
+    python -m a3marl.bench --quick --suite env --suite replay --baseline bench.json
+Exits with 1 if any benchmark regressed against the baseline.
+"""
+
+import argparse
+import json
+import sys
+
+from . import SUITES, compare_results, format_comparison, load_results, run_suite
+from ._compare import save_results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m a3marl.bench")
+    parser.add_argument("--suite", action="append", choices=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results json to this path")
+    parser.add_argument("--baseline", help="results json to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run_suite(args.suite, quick=args.quick, seed=args.seed)
+    if args.out:
+        save_results(results, args.out)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        rows = compare_results(results, load_results(args.baseline), args.tolerance)
+        print(format_comparison(rows), file=sys.stderr)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import json
+
+
+def save_results(results: dict[str, object], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path: str) -> dict[str, object]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(
+    current: dict[str, object], baseline: dict[str, object], tolerance: float = 0.2
+) -> list[dict[str, object]]:
+    """
+    Compare benchmarks present in both runs.
+    A benchmark regresses when it is worse than the baseline by more than tolerance
+    (relative), e.g. 0.2 => 20% fewer steps/s or 20% more latency.
+    """
+    rows = []
+    baseline_results = baseline["results"]
+    for name, cur in current["results"].items():
+        if name not in baseline_results:
+            continue
+        base_value = baseline_results[name]["value"]
+        ratio = cur["value"] / base_value if base_value else float("inf")
+        # > 1 means faster than the baseline
+        speedup = ratio if cur["higher_is_better"] else 1 / ratio
+        rows.append(
+            {
+                "name": name,
+                "unit": cur["unit"],
+                "baseline": base_value,
+                "current": cur["value"],
+                "speedup": speedup,
+                "regression": speedup < 1 - tolerance,
+            }
+        )
+    return rows
+
+
+def format_comparison(rows: list[dict[str, object]]) -> str:
+    lines = [f"{'benchmark':<44} {'baseline':>12} {'current':>12} {'speedup':>8}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['name']:<44} {row['baseline']:>12.2f} {row['current']:>12.2f} "
+            f"{row['speedup']:>7.2f}x{flag}"
+        )
+    return "\n".join(lines)
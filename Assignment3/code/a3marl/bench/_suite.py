@@ -0,0 +1,410 @@
+import contextlib
+import io
+import platform
+import random
+import time
+
+import numpy as np
+import torch
+
+from a3marl.agents import CqlAgent, CqlAgentConfig, IqlAgent, IqlAgentConfig
+from a3marl.agents._base import (
+    CompactReplayMemory,
+    PrioritizedReplayMemory,
+    ReplayMemory,
+)
+from a3marl.envs import foraging
+from a3marl.envs.utils import EnvConfig
+
+# (x_size, y_size, n_foragers, n_crops, obs_radius)
+ENV_GRID: list[tuple[int, int, int, int, int]] = [
+    (10, 8, 3, 10, 3),
+    (20, 16, 6, 30, 3),
+    (20, 16, 6, 30, 5),
+    (40, 32, 12, 100, 3),
+]
+QUICK_ENV_GRID: list[tuple[int, int, int, int, int]] = ENV_GRID[:2]
+
+# training execution modes of bench_train, name => agent config overrides
+TRAIN_EXEC_MODES: dict[str, dict[str, object]] = {
+    "fused_opt": dict(fused_opt=True),
+    "compile_train": dict(compile_train=True),
+    "fused+compile": dict(fused_opt=True, compile_train=True),
+    "bf16": dict(autocast_dtype="bfloat16"),
+    "paired": dict(paired_forward=True),
+}
+QUICK_TRAIN_EXEC_MODES: tuple[str, ...] = ("fused_opt",)
+
+# name => {"value", "unit", "higher_is_better", "params"}
+BenchResults = dict[str, dict[str, object]]
+
+
+def seed_everything(seed: int) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def _best_time(fn: callable, repeats: int) -> float:
+    """
+    Best wall-clock seconds of fn() over repeats, after one warm-up call.
+    The minimum is the least sensitive to other load on the machine.
+    """
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _result(value: float, unit: str, higher_is_better: bool, **params) -> dict:
+    return {
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "params": params,
+    }
+
+
+def bench_env(
+    grid: list[tuple[int, int, int, int, int]],
+    n_cycles: int = 500,
+    repeats: int = 5,
+    seed: int = 0,
+) -> BenchResults:
+    """
+    RawEnv reset (rejection sampling and layout bank) / step cycles (default and
+    fast_step, whose params tell if the numba kernel ran) / observe calls per
+    second, and ready-to-step envs per second: built anew vs recycled from an EnvPool
+    """
+    results = {}
+    for x_size, y_size, n_foragers, n_crops, obs_radius in grid:
+        tag = f"x{x_size}y{y_size}_f{n_foragers}_c{n_crops}_r{obs_radius}"
+        params = dict(
+            x_size=x_size,
+            y_size=y_size,
+            n_foragers=n_foragers,
+            n_crops=n_crops,
+            obs_radius=obs_radius,
+        )
+        raw_env = foraging.RawEnv(**params, max_cycles=100)
+        fast_env = foraging.RawEnv(**params, max_cycles=100, fast_step=True)
+        # same layouts drawn from a pre-generated bank
+        bank_env = foraging.RawEnv(
+            **params,
+            max_cycles=100,
+            scenarios=foraging.LayoutBank.generate(
+                1000, x_size, y_size, n_foragers, n_crops, seed=seed
+            ),
+        )
+        actions = np.random.default_rng(seed).integers(
+            0, 5, size=(n_cycles, n_foragers)
+        )
+
+        def _reset() -> None:
+            raw_env.reset(seed=seed)
+
+        def _step(env: foraging.RawEnv) -> None:
+            env.reset(seed=seed)
+            for cycle_actions in actions.tolist():
+                if not env.agents:
+                    env.reset()
+                for action in cycle_actions:
+                    env.step(action)
+
+        def _observe() -> None:
+            for agent in raw_env.possible_agents * 100:
+                raw_env.observe(agent)
+
+        n_resets = 100
+        reset_time = _best_time(lambda: [_reset() for _ in range(n_resets)], repeats)
+        results[f"env.reset[{tag}]"] = _result(
+            n_resets / reset_time, "resets/s", True, **params
+        )
+        bank_env.reset(seed=seed)
+        results[f"env.reset_bank[{tag}]"] = _result(
+            n_resets
+            / _best_time(lambda: [bank_env.reset() for _ in range(n_resets)], repeats),
+            "resets/s",
+            True,
+            **params,
+        )
+        results[f"env.step[{tag}]"] = _result(
+            n_cycles / _best_time(lambda: _step(raw_env), repeats),
+            "cycles/s",
+            True,
+            **params,
+        )
+        results[f"env.step_fast[{tag}]"] = _result(
+            n_cycles / _best_time(lambda: _step(fast_env), repeats),
+            "cycles/s",
+            True,
+            **params,
+            cycle_kernel=fast_env.fast_step,
+        )
+        raw_env.reset(seed=seed)
+        results[f"env.observe[{tag}]"] = _result(
+            100 * n_foragers / _best_time(_observe, repeats), "obs/s", True, **params
+        )
+
+        env_config = EnvConfig(
+            name_abbr=tag,
+            env_creator=foraging.native_parallel_env,
+            env_kwargs=dict(**params, max_cycles=100),
+        )
+
+        def _construct() -> None:
+            env_config.get_env(render_mode=None).reset(seed=seed)
+
+        def _acquire() -> None:
+            env, _, _ = env_config.pool.clone(seed, render_mode=None)
+            env_config.pool.release(env)
+
+        n_envs = 20
+        for name, fn in (("construct", _construct), ("acquire", _acquire)):
+            results[f"env.{name}[{tag}]"] = _result(
+                n_envs / _best_time(lambda: [fn() for _ in range(n_envs)], repeats),
+                "envs/s",
+                True,
+                **params,
+            )
+        env_config.pool.close()
+    return results
+
+
+def _fill_memory(memory: ReplayMemory, obs_dim: int, act_width: int, act_dim: int):
+    # small integer observations, as the foraging grids
+    for _ in range(memory.capacity):
+        memory.push(
+            torch.randint(-1, 5, (obs_dim,)),
+            torch.randint(0, act_dim, (act_width,)),
+            torch.randint(-1, 5, (obs_dim,)),
+            torch.randn(memory.n_agents),
+        )
+
+
+def bench_replay_sample(
+    capacity: int = 10_000,
+    obs_dim: int = 98,
+    batch_size: int = 128,
+    n_samples: int = 200,
+    repeats: int = 5,
+) -> BenchResults:
+    """ReplayMemory.sample latency, float32 and int8 storage, and prioritized"""
+    results = {}
+    for name, memory in (
+        ("float32", ReplayMemory(capacity, obs_dim)),
+        ("int8", CompactReplayMemory(capacity, obs_dim, obs_dtype=torch.int8)),
+        ("prioritized", PrioritizedReplayMemory(capacity, obs_dim)),
+    ):
+        _fill_memory(memory, obs_dim, 1, 5)
+        latency = (
+            _best_time(
+                lambda: [memory.sample(batch_size) for _ in range(n_samples)], repeats
+            )
+            / n_samples
+        )
+        results[f"replay.sample[{name}]"] = _result(
+            latency * 1e6,
+            "us",
+            False,
+            capacity=capacity,
+            obs_dim=obs_dim,
+            batch_size=batch_size,
+        )
+    return results
+
+
+def bench_train(
+    obs_dim: int = 98,
+    n_agents: int = 3,
+    batch_size: int = 128,
+    n_updates: int = 50,
+    repeats: int = 5,
+    exec_modes: tuple[str, ...] = tuple(TRAIN_EXEC_MODES),
+    burst: int = 4,
+) -> BenchResults:
+    """
+    IqlAgent.train / CqlAgent.train updates per second on the cpu, eager and
+    IqlAgent.train for each of exec_modes (train.iql[<mode>]), and with `burst`
+    updates per train call sampled at once (train.iql[burst<n>])
+    """
+    common = dict(hidden_dims=[100, 50, 25], batch_size=batch_size, mem_size=2_000)
+    iql_agent = IqlAgent(
+        "bench_iql",
+        IqlAgentConfig(obs_dim=obs_dim, act_dim=5, **common),
+        act_sampler=None,
+        device="cpu",
+    )
+    agent_keys = [f"agent_{i}" for i in range(n_agents)]
+    cql_agent = CqlAgent(
+        "bench_cql",
+        CqlAgentConfig(
+            obs_dims={key: obs_dim for key in agent_keys},
+            act_dims={key: 5 for key in agent_keys},
+            **common,
+        ).infer_joint_space(),
+        act_sampler=None,
+        device="cpu",
+    )
+    _fill_memory(iql_agent.replay_memory, obs_dim, 1, 5)
+    _fill_memory(cql_agent.replay_memory, n_agents * obs_dim, n_agents, 5)
+    runs = [("iql", iql_agent), ("cql", cql_agent)]
+    for mode in exec_modes:
+        agent = IqlAgent(
+            f"bench_iql_{mode}",
+            IqlAgentConfig(
+                obs_dim=obs_dim, act_dim=5, **common, **TRAIN_EXEC_MODES[mode]
+            ),
+            act_sampler=None,
+            device="cpu",
+        )
+        _fill_memory(agent.replay_memory, obs_dim, 1, 5)
+        runs.append((f"iql[{mode}]", agent))
+
+    results = {}
+    for name, agent in runs:
+        train_time = _best_time(
+            lambda: [agent.train() for _ in range(n_updates)], repeats
+        )
+        results[f"train.{name}"] = _result(
+            n_updates / train_time,
+            "updates/s",
+            True,
+            obs_dim=obs_dim,
+            n_agents=n_agents if name == "cql" else 1,
+            batch_size=batch_size,
+        )
+    n_calls = max(n_updates // burst, 1)
+    train_time = _best_time(
+        lambda: [iql_agent.train(burst) for _ in range(n_calls)], repeats
+    )
+    results[f"train.iql[burst{burst}]"] = _result(
+        n_calls * burst / train_time,
+        "updates/s",
+        True,
+        obs_dim=obs_dim,
+        n_agents=1,
+        batch_size=batch_size,
+        burst=burst,
+    )
+    return results
+
+
+def bench_trainer(num_episodes: int = 3, seed: int = 0) -> BenchResults:
+    """End-to-end IQL / CQL trainer episodes per minute on a small foraging map"""
+    from a3marl.trainer import cql_trainer, iql_trainer
+
+    env_config = EnvConfig(
+        name_abbr="bench",
+        env_creator=foraging.parallel_env,
+        env_kwargs=dict(
+            n_foragers=3,
+            forager_levels=[1, 2, 3],
+            n_crops=8,
+            crop_levels=[1, 1, 2, 2, 3, 3, 4, 4],
+            max_cycles=50,
+        ),
+    )
+    params = dict(num_episodes=num_episodes, **env_config.env_kwargs)
+    common = dict(hidden_dims=[100, 50, 25], batch_size=32, mem_size=1_000)
+
+    results = {}
+    for name in ("iql", "cql"):
+        seed_everything(seed)
+        env = env_config.get_env(render_mode=None)
+        states, _ = env.reset(seed=seed)
+        if name == "iql":
+            cur_agents = {
+                agent_key: IqlAgent(
+                    agent_key,
+                    IqlAgentConfig(obs_dim=state.size, act_dim=5, **common),
+                    act_sampler=env.action_space(agent_key).sample,
+                    device="cpu",
+                )
+                for agent_key, state in states.items()
+            }
+
+            def _run() -> None:
+                iql_trainer(env, env_config, cur_agents, num_episodes=num_episodes)
+
+        else:
+            act_dims = {agent_key: 5 for agent_key in states}
+            central_agent = CqlAgent(
+                "central",
+                CqlAgentConfig(
+                    obs_dims={key: state.size for key, state in states.items()},
+                    act_dims=act_dims,
+                    **common,
+                ).infer_joint_space(),
+                act_sampler=lambda: {
+                    key: int(env.action_space(key).sample()) for key in act_dims
+                },
+                device="cpu",
+            )
+
+            def _run() -> None:
+                cql_trainer(env, env_config, central_agent, num_episodes=num_episodes)
+
+        # trainers report every episode, keep the benchmark output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            _run()
+            elapsed = time.perf_counter() - start
+        results[f"trainer.{name}"] = _result(
+            num_episodes * 60 / elapsed, "episodes/min", True, **params
+        )
+    return results
+
+
+# suite name => (full run, quick run), seed => BenchResults; replay and train draw
+# from the global random streams, seeded by run_suite
+SUITES: dict[str, tuple[callable, callable]] = {
+    "env": (
+        lambda seed: bench_env(ENV_GRID, seed=seed),
+        lambda seed: bench_env(QUICK_ENV_GRID, 200, 3, seed=seed),
+    ),
+    "replay": (
+        lambda seed: bench_replay_sample(),
+        lambda seed: bench_replay_sample(n_samples=50),
+    ),
+    "train": (
+        lambda seed: bench_train(),
+        lambda seed: bench_train(
+            n_updates=20, repeats=3, exec_modes=QUICK_TRAIN_EXEC_MODES
+        ),
+    ),
+    "trainer": (
+        lambda seed: bench_trainer(seed=seed),
+        lambda seed: bench_trainer(num_episodes=2, seed=seed),
+    ),
+}
+
+
+def run_suite(
+    suites: list[str] | None = None, quick: bool = False, seed: int = 0
+) -> dict[str, object]:
+    """
+    Run the selected suites (all by default) single-threaded on the cpu.
+    output: {"meta": {...}, "results": BenchResults}
+    """
+    torch.set_num_threads(1)
+    results: BenchResults = {}
+    for name in suites or list(SUITES):
+        seed_everything(seed)
+        results.update(SUITES[name][int(quick)](seed))
+    return {
+        "meta": {
+            "seed": seed,
+            "quick": quick,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
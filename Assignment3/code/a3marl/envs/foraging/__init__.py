@@ -1,7 +1,17 @@
 from .raw_env import env, parallel_env, RawEnv
+from .parallel_raw_env import native_parallel_env, ParallelRawEnv
+from .vector_env import VectorForagingEnv
+from .scenario import Layout, LayoutBank, CurriculumStage, Curriculum
 
 __all__ = [
     "env",
     "parallel_env",
     "RawEnv",
+    "native_parallel_env",
+    "ParallelRawEnv",
+    "VectorForagingEnv",
+    "Layout",
+    "LayoutBank",
+    "CurriculumStage",
+    "Curriculum",
 ]
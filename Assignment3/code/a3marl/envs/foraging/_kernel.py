@@ -0,0 +1,88 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional, without it fast_step runs the default RawEnv step
+    numba = None
+
+
+def _cycle_kernel(
+    actions: np.ndarray,
+    action_deltas: np.ndarray,
+    agent_pos: np.ndarray,
+    agent_levels: np.ndarray,
+    crop_pos: np.ndarray,
+    crop_levels: np.ndarray,
+    crop_removed: np.ndarray,
+    obs_type: np.ndarray,
+    obs_radius: int,
+    crop_type: int,
+    reward_idx: int,
+    rewards: np.ndarray,
+    moved: np.ndarray,
+    harvested: np.ndarray,
+) -> tuple[int, int]:
+    """
+    One foraging cycle on flat arrays, same order of operations as
+    `RawEnv._resolve_cycle`. Updates agent_pos / crop_removed in place and writes
+    the rewards, moved agent ids and harvested crop ids.
+    output: (number of moved agents, number of harvested crops)
+    """
+    n_agents = agent_pos.shape[0]
+    x_size = obs_type.shape[0] - 2 * obs_radius
+    y_size = obs_type.shape[1] - 2 * obs_radius
+
+    # moves are blocked by the map bounds and live crops only
+    n_moved = 0
+    for i in range(n_agents):
+        rewards[i] = -0.1
+        if actions[i] == 0:
+            continue
+        new_x = agent_pos[i, 0] + action_deltas[actions[i], 0]
+        new_y = agent_pos[i, 1] + action_deltas[actions[i], 1]
+        if 0 <= new_x < x_size and 0 <= new_y < y_size:
+            if obs_type[new_x + obs_radius, new_y + obs_radius] != crop_type:
+                agent_pos[i, 0] = new_x
+                agent_pos[i, 1] = new_y
+                moved[n_moved] = i
+                n_moved += 1
+
+    # crops are resolved in index order, rewards are added in the same order
+    n_harvested = 0
+    for c in range(crop_pos.shape[0]):
+        if crop_removed[c]:
+            continue
+        level_sum = 0
+        for i in range(n_agents):
+            if (
+                abs(agent_pos[i, 0] - crop_pos[c, 0])
+                + abs(agent_pos[i, 1] - crop_pos[c, 1])
+                == 1
+            ):
+                level_sum += agent_levels[i]
+        if not (level_sum >= crop_levels[c] >= 0):
+            continue
+        crop_removed[c] = True
+        harvested[n_harvested] = c
+        n_harvested += 1
+        total_crop_reward = 6.0 if reward_idx == 0 else 2.0 * crop_levels[c]
+        for i in range(n_agents):
+            if (
+                abs(agent_pos[i, 0] - crop_pos[c, 0])
+                + abs(agent_pos[i, 1] - crop_pos[c, 1])
+                == 1
+            ):
+                # 0 / 0 is nan, as with numpy scalars
+                ratio = agent_levels[i] / level_sum if level_sum != 0 else np.nan
+                rewards[i] += total_crop_reward * ratio
+        if reward_idx == 1:
+            for i in range(n_agents):
+                rewards[i] += 0.5
+    return n_moved, n_harvested
+
+
+cycle_kernel = (
+    numba.njit(cache=True, error_model="numpy")(_cycle_kernel)
+    if numba is not None
+    else None
+)
@@ -0,0 +1,109 @@
+import numpy as np
+from gymnasium.spaces import Discrete, Box
+from gymnasium.utils import EzPickle
+from pettingzoo import ParallelEnv
+
+from .raw_env import RawEnv
+
+
+def native_parallel_env(**kwargs) -> "ParallelRawEnv":
+    return ParallelRawEnv(**kwargs)
+
+
+class ParallelRawEnv(ParallelEnv, EzPickle):
+    """
+    Foraging as a native ParallelEnv: the joint action is applied in one cycle and
+    all observations are gathered from the shared grid at once, instead of n AEC
+    steps through `parallel_wrapper_fn`.
+
+    With the same seed and actions, states, observations, terminations and
+    truncations match `parallel_env` step by step.
+
+    Rewards: `parallel_env` sums `RawEnv.rewards` after every AEC sub-step, so the
+    reward of the i-th forager is i * (its previous cycle reward) + (this cycle
+    reward), and the last cycle reward (with the +10 completion bonus) is dropped
+    at the end of an episode. This env returns the per-cycle rewards instead;
+    `legacy_rewards=True` reproduces the wrapper's sums exactly.
+    """
+
+    metadata = RawEnv.metadata
+
+    def __init__(self, legacy_rewards: bool = False, **kwargs) -> None:
+        EzPickle.__init__(self, legacy_rewards=legacy_rewards, **kwargs)
+        self.legacy_rewards: bool = legacy_rewards
+        self.raw_env: RawEnv = RawEnv(**kwargs)
+        self.possible_agents = self.raw_env.possible_agents
+        self.render_mode = self.raw_env.render_mode
+
+    @property
+    def agents(self) -> list[str]:
+        return self.raw_env.agents
+
+    def observation_space(self, agent) -> Box:
+        return self.raw_env.observation_space(agent)
+
+    def action_space(self, agent) -> Discrete:
+        return self.raw_env.action_space(agent)
+
+    def _observe_agents(self) -> dict:
+        if not self.raw_env.agents:
+            return {}
+        return dict(zip(self.raw_env.agents, self.raw_env.observe_all()))
+
+    def reset(self, seed=None, options=None) -> tuple[dict, dict]:
+        self.raw_env.reset(seed=seed, options=options)
+        return self._observe_agents(), dict(**self.raw_env.infos)
+
+    def step(self, actions: dict[str, int]) -> tuple[dict, dict, dict, dict, dict]:
+        raw_env = self.raw_env
+        if not raw_env.agents:
+            return (
+                {},
+                {},
+                dict(**raw_env.terminations),
+                dict(**raw_env.truncations),
+                dict(**raw_env.infos),
+            )
+        agents = raw_env.agents
+        prev_rewards = [raw_env.rewards[agent] for agent in agents]
+        raw_env._actions_this_turn = {agent: actions[agent] for agent in agents}
+        raw_env._run_cycle()
+        for agent in raw_env.possible_agents:
+            raw_env._cumulative_rewards[agent] = raw_env.rewards[agent]
+
+        if self.legacy_rewards:
+            rewards = self._legacy_rewards(agents, prev_rewards)
+        else:
+            rewards = {agent: raw_env.rewards[agent] for agent in agents}
+        if raw_env.render_mode == "human":
+            raw_env.render()
+        return (
+            self._observe_agents(),
+            rewards,
+            dict(**raw_env.terminations),
+            dict(**raw_env.truncations),
+            dict(**raw_env.infos),
+        )
+
+    def _legacy_rewards(
+        self, agents: list[str], prev_rewards: list[float]
+    ) -> dict[str, float]:
+        """Rewards as summed by `parallel_env`, in the same float order"""
+        rewards = {}
+        n_agents = len(agents)
+        for sub_step in range(n_agents - 1):
+            # before its own sub-step, an agent still holds its previous reward
+            for i, agent in enumerate(agents):
+                rewards[agent] = rewards.get(agent, 0) + (
+                    prev_rewards[i] if i > sub_step else 0.0
+                )
+        # the last sub-step ends the cycle, nothing is added once the episode ends
+        for agent in self.raw_env.agents:
+            rewards[agent] = rewards.get(agent, 0) + self.raw_env.rewards[agent]
+        return rewards
+
+    def render(self) -> np.ndarray | None:
+        return self.raw_env.render()
+
+    def close(self) -> None:
+        self.raw_env.close()
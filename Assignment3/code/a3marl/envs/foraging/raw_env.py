@@ -3,13 +3,16 @@ import functools
 import numpy as np
 from gymnasium.spaces import Discrete, Box
 from gymnasium.utils import EzPickle
+from numpy.lib.stride_tricks import sliding_window_view
 from pettingzoo import AECEnv
 from pettingzoo.utils import AgentSelector, wrappers
 from pettingzoo.utils.conversions import parallel_wrapper_fn
 
 from pettingzoo.utils.env import ObsType
 
+from ._kernel import cycle_kernel
 from .render import ForagingRenderer
+from .scenario import Curriculum, Layout, LayoutBank
 
 
 def env(**kwargs):
@@ -28,6 +31,12 @@ ACTION_MAP: dict[int, tuple[int, int]] = {
     3: (0, -1),  # Left
     4: (0, 1),  # Right
 }
+# 4-neighborhood of a cell, a crop is adjacent to foragers in these cells
+NEIGHBOR_DELTAS: tuple[tuple[int, int], ...] = tuple(ACTION_MAP[i] for i in range(1, 5))
+# action id => (dx, dy), indexed by an action array directly
+ACTION_DELTAS: np.ndarray = np.array(
+    [ACTION_MAP[i] for i in range(len(ACTION_MAP))], dtype=np.int64
+)
 
 AGENT_TYPE: int = 1
 OTHER_AGENT_TYPE: int = 2
@@ -37,7 +46,7 @@ PADDING_TYPE: int = -1
 
 class RawEnv(AECEnv, EzPickle):
     metadata = {
-        "render_modes": ["human"],
+        "render_modes": ["human", "rgb_array"],
         "name": "foraging",
         "is_parallelizable": True,
         "render_fps": 10,
@@ -55,7 +64,17 @@ class RawEnv(AECEnv, EzPickle):
         max_cycles: int = 100,
         reward_idx: int = 0,
         render_mode: str | None = None,
+        fast_step: bool = False,
+        render_backend: str = "pygame",
+        scenarios: LayoutBank | Curriculum | str | None = None,
     ) -> None:
+        """
+        scenarios: a LayoutBank (or the path of a saved one) or Curriculum to draw
+            start layouts from; grid size, crop count and levels then come from the
+            layouts, drawn with a per-env generator seeded by reset(seed). A seeded
+            reset restarts a curriculum, reset(options={"stage": k}) moves on to the
+            first reset of stage k
+        """
         EzPickle.__init__(self)
 
         if forager_levels is not None and n_foragers != len(forager_levels):
@@ -77,8 +96,13 @@ class RawEnv(AECEnv, EzPickle):
 
         self.max_cycles = max_cycles
         self.render_mode = render_mode
+        # "numpy" draws rgb frames straight into an array, see ForagingRenderer
+        self.render_backend = render_backend
 
         self.reward_idx = reward_idx
+        # resolve each cycle on flat arrays with the numba kernel, same observable
+        # behavior as the default per-agent loops (which run without numba)
+        self.fast_step = fast_step and cycle_kernel is not None
 
         self.possible_agents = [f"forager_{i}" for i in range(n_foragers)]
         self.agent_name_mapping = {
@@ -91,10 +115,36 @@ class RawEnv(AECEnv, EzPickle):
         self.crop_levels: list[int] = []
         self.crop_removed: list[bool] = []  # True if harvested
 
+        # padded type/level grid (2 x (x_size + 2r) x (y_size + 2r)), updated in place
+        self._obs_grid: np.ndarray | None = None
+        # index of the top forager on each cell, -1 if empty (x_size x y_size)
+        self._agent_grid: np.ndarray | None = None
+        # index of the live crop on each cell, -1 if none (x_size x y_size)
+        self._crop_grid: np.ndarray | None = None
+        # live crops of level 0, harvested without any adjacent forager
+        self._zero_level_crops: list[int] = []
+        # flat copies of the state above for the fast step path
+        self._agent_pos_arr: np.ndarray | None = None  # n_foragers x 2
+        self._agent_level_arr: np.ndarray | None = None  # n_foragers
+        self._crop_pos_arr: np.ndarray | None = None  # n_crops x 2
+        self._crop_level_arr: np.ndarray | None = None  # n_crops
+        self._crop_removed_arr: np.ndarray | None = None  # n_crops
+
         self._agent_selector: AgentSelector = AgentSelector(self.possible_agents)
         self._actions_this_turn: dict[str, int] = {}
         self.current_step: int = 0
 
+        if isinstance(scenarios, str):
+            scenarios = LayoutBank.load(scenarios)
+        assert (
+            scenarios is None or scenarios.n_foragers == n_foragers
+        ), f"scenarios are for {scenarios.n_foragers} foragers"
+        self.scenarios: LayoutBank | Curriculum | None = scenarios
+        # draws layouts, independent of the global numpy state
+        self._scenario_rng: np.random.Generator = np.random.default_rng()
+        # resets since the last seeded one, picks the curriculum stage
+        self._n_resets: int = 0
+
     @functools.lru_cache(maxsize=None)
     def observation_space(self, agent) -> Box:
         local_dim = 2 * self.obs_radius + 1
@@ -106,7 +156,14 @@ class RawEnv(AECEnv, EzPickle):
 
     def reset(self, seed=None, options=None) -> ObsType:
         if seed is not None:
-            np.random.seed(seed)
+            if self.scenarios is None:
+                np.random.seed(seed)
+            else:
+                self._scenario_rng = np.random.default_rng(seed)
+            self._n_resets = 0
+        if options is not None and "stage" in options:
+            assert isinstance(self.scenarios, Curriculum), "stages need a Curriculum"
+            self._n_resets = self.scenarios.stage_start(options["stage"])
 
         self.agents = self.possible_agents[:]
         self._agent_selector.reinit(self.agents)
@@ -121,6 +178,14 @@ class RawEnv(AECEnv, EzPickle):
         self._actions_this_turn.clear()
         self.current_step = 0
 
+        if self.scenarios is not None:
+            self._apply_layout(self.scenarios.draw(self._scenario_rng, self._n_resets))
+            self._n_resets += 1
+            self._build_obs_grid()
+            if self.fast_step:
+                self._build_flat_state()
+            return self.observe(self.agents[0])
+
         occupied_cells = set()
 
         def _get_random_level(num: int, max_level: int = 4) -> list[int]:
@@ -165,8 +230,24 @@ class RawEnv(AECEnv, EzPickle):
             self.crop_positions.append(pos)
             occupied_cells.add(pos)
         self.crop_levels = c_levels
+        self._build_obs_grid()
+        if self.fast_step:
+            self._build_flat_state()
         return self.observe(self.agents[0])
 
+    def _apply_layout(self, layout: Layout) -> None:
+        self.x_size, self.y_size = layout.x_size, layout.y_size
+        self.n_crops = len(layout.crop_levels)
+        self.agent_positions = dict(
+            zip(self.possible_agents, map(tuple, layout.agent_positions.tolist()))
+        )
+        self.agent_levels = dict(
+            zip(self.possible_agents, layout.agent_levels.tolist())
+        )
+        self.crop_positions = list(map(tuple, layout.crop_positions.tolist()))
+        self.crop_levels = layout.crop_levels.tolist()
+        self.crop_removed = [False] * self.n_crops
+
     def close(self) -> None:
         if self._renderer is not None:
             self._renderer.close()
@@ -196,73 +277,65 @@ class RawEnv(AECEnv, EzPickle):
     #
     #     return np.stack([obs_type_grid, obs_level_grid], axis=0).astype(np.int8)
 
-    def observe(self, a_id: str) -> ObsType:
-        g_obs_type = np.zeros((self.x_size, self.y_size), dtype=np.int8)
-        g_obs_level = np.zeros((self.x_size, self.y_size), dtype=np.int8)
+    def _build_obs_grid(self) -> None:
+        r = self.obs_radius
+        self._obs_grid = np.full(
+            (2, self.x_size + 2 * r, self.y_size + 2 * r), PADDING_TYPE, dtype=np.int8
+        )
+        self._obs_grid[:, r : r + self.x_size, r : r + self.y_size] = 0
+        self._agent_grid = np.full((self.x_size, self.y_size), -1, dtype=np.int32)
+        self._crop_grid = np.full((self.x_size, self.y_size), -1, dtype=np.int32)
 
         for i, crop_pos in enumerate(self.crop_positions):
             if not self.crop_removed[i]:
-                x, y = crop_pos
-                if 0 <= x < self.x_size and 0 <= y < self.y_size:
-                    g_obs_type[x, y] = CROP_TYPE
-                    g_obs_level[x, y] = self.crop_levels[i]
-
-        for other_a_id, pos in self.agent_positions.items():
-            x, y = pos
-            level = self.agent_levels[other_a_id]
-
-            if 0 <= x < self.x_size and 0 <= y < self.y_size:
-                if other_a_id == a_id:
-                    g_obs_type[x, y] = AGENT_TYPE
-                else:
-                    g_obs_type[x, y] = OTHER_AGENT_TYPE
-                g_obs_level[x, y] = level
-
-        a_x, a_y = self.agent_positions[a_id]
-
-        g_xmin = a_x - self.obs_radius
-        g_xmax = a_x + self.obs_radius + 1
-        g_ymin = a_y - self.obs_radius
-        g_ymax = a_y + self.obs_radius + 1
-
-        g_xmin_actual = max(0, g_xmin)
-        g_xmax_actual = min(self.x_size, g_xmax)
-        g_ymin_actual = max(0, g_ymin)
-        g_ymax_actual = min(self.y_size, g_ymax)
-
-        extracted_type_patch = g_obs_type[
-            g_xmin_actual:g_xmax_actual, g_ymin_actual:g_ymax_actual
-        ]
-        extracted_level_patch = g_obs_level[
-            g_xmin_actual:g_xmax_actual, g_ymin_actual:g_ymax_actual
+                self._set_grid_cell(crop_pos, CROP_TYPE, self.crop_levels[i])
+                self._crop_grid[crop_pos] = i
+        self._zero_level_crops = [
+            i
+            for i, crop_level in enumerate(self.crop_levels)
+            if crop_level == 0 and not self.crop_removed[i]
         ]
+        self._paint_agents()
 
-        pad_x_before = max(0, -g_xmin)
-        pad_x_after = max(0, g_xmax - self.x_size)
-        pad_y_before = max(0, -g_ymin)
-        pad_y_after = max(0, g_ymax - self.y_size)
+    def _set_grid_cell(self, pos: tuple[int, int], cell_type: int, level: int) -> None:
+        x, y = pos
+        self._obs_grid[0, x + self.obs_radius, y + self.obs_radius] = cell_type
+        self._obs_grid[1, x + self.obs_radius, y + self.obs_radius] = level
 
-        local_obs_type = np.pad(
-            extracted_type_patch,
-            ((pad_x_before, pad_x_after), (pad_y_before, pad_y_after)),
-            mode="constant",
-            constant_values=PADDING_TYPE,
-        )
-
-        local_obs_level = np.pad(
-            extracted_level_patch,
-            ((pad_x_before, pad_x_after), (pad_y_before, pad_y_after)),
-            mode="constant",
-            constant_values=PADDING_TYPE,
-        )
+    def _paint_agents(self) -> None:
+        # paint in index order, so the last forager on a shared cell stays on top
+        for i, (a_id, pos) in enumerate(self.agent_positions.items()):
+            self._set_grid_cell(pos, OTHER_AGENT_TYPE, self.agent_levels[a_id])
+            self._agent_grid[pos] = i
 
-        return np.stack([local_obs_type, local_obs_level], axis=0).astype(np.int8)
+    def observe(self, a_id: str) -> ObsType:
+        # window [x - r, x + r] of the map is [x, x + 2r] of the padded grid
+        a_x, a_y = self.agent_positions[a_id]
+        local_dim = 2 * self.obs_radius + 1
+        local_obs = self._obs_grid[
+            :, a_x : a_x + local_dim, a_y : a_y + local_dim
+        ].copy()
+        if self._agent_grid[a_x, a_y] == self.agent_name_mapping[a_id]:
+            local_obs[0, self.obs_radius, self.obs_radius] = AGENT_TYPE
+        return local_obs
+
+    def observe_all(self) -> np.ndarray:
+        """
+        Observations of all foragers, gathered from the grid at once.
+        output shape: n_foragers x 2 x local_dim x local_dim
+        """
+        local_dim = 2 * self.obs_radius + 1
+        pos_x, pos_y = np.array(list(self.agent_positions.values())).T
+        windows = sliding_window_view(
+            self._obs_grid, (local_dim, local_dim), axis=(1, 2)
+        )  # 2 x x_size x y_size x local_dim x local_dim
+        local_obs = np.ascontiguousarray(windows[:, pos_x, pos_y].swapaxes(0, 1))
+        is_top = self._agent_grid[pos_x, pos_y] == np.arange(len(pos_x))
+        local_obs[is_top, 0, self.obs_radius, self.obs_radius] = AGENT_TYPE
+        return local_obs
 
     def _move_all_agents(self) -> None:
-        active_crop_locations = set()
-        for i, pos in enumerate(self.crop_positions):
-            if not self.crop_removed[i]:
-                active_crop_locations.add(tuple(pos))
+        left_cells: list[tuple[int, int]] = []
         for a_id in self.agents:
             if self._is_invalid_agent(a_id):
                 continue
@@ -276,121 +349,211 @@ class RawEnv(AECEnv, EzPickle):
             new_x, new_y = x + dx, y + dy
 
             if 0 <= new_x < self.x_size and 0 <= new_y < self.y_size:
-                if (new_x, new_y) not in active_crop_locations:
+                if self._crop_grid[new_x, new_y] < 0:
                     self.agent_positions[a_id] = (new_x, new_y)
+                    left_cells.append((x, y))
+
+        if left_cells:
+            # agents never stand on live crops, so a left cell becomes empty
+            for pos in left_cells:
+                self._set_grid_cell(pos, 0, 0)
+                self._agent_grid[pos] = -1
+            self._paint_agents()
 
     def _is_invalid_agent(self, a_id: str) -> bool:
         return self.terminations[a_id] or self.truncations[a_id]
 
-    def step(self, action: int) -> None:
+    def _resolve_cycle(self) -> dict[str, float]:
+        """Move all agents and harvest, output: per-cycle rewards"""
         agent = self.agent_selection
-        self.rewards[agent] = 0.0
-        if self._is_invalid_agent(agent):
-            self._was_dead_step(action)
-            self._actions_this_turn[agent] = 0
-            return
-        self._actions_this_turn[agent] = action
-        if self._agent_selector.is_last():
-            current_step_rewards = {
-                a_id: -0.1
-                for a_id in self.agents
-                if not (self._is_invalid_agent(agent))
-            }
-
-            self._move_all_agents()
-            for crop_idx in range(self.n_crops):
-                if self.crop_removed[crop_idx]:
-                    continue
-                crop_pos = self.crop_positions[crop_idx]
-                crop_level = self.crop_levels[crop_idx]
-
-                adj_agent_levels: list[int] = []
-                adj_a_ids: list[str] = []
-
-                for a_id in self.agents:
-                    if self._is_invalid_agent(agent):
-                        continue
-
-                    agent_pos = self.agent_positions[a_id]
-                    if (
-                        abs(agent_pos[0] - crop_pos[0])
-                        + abs(agent_pos[1] - crop_pos[1])
-                        == 1
-                    ):
-                        adj_agent_levels.append(self.agent_levels[a_id])
-                        adj_a_ids.append(a_id)
-                level_sum = np.sum(adj_agent_levels)
-                if level_sum >= crop_level >= 0:
-
-                    def reward0() -> float:
-                        return 6.0
-
-                    def reward1() -> float:
-                        return 2 * float(crop_level)
-
-                    self.crop_removed[crop_idx] = True
-                    total_crop_reward = reward0() if self.reward_idx == 0 else reward1()
-
-                    if adj_a_ids:
-                        for a_id in adj_a_ids:
-                            local_reward = total_crop_reward * (
-                                self.agent_levels[a_id] / level_sum
-                            )
+        current_step_rewards = {
+            a_id: -0.1 for a_id in self.agents if not (self._is_invalid_agent(agent))
+        }
+
+        self._move_all_agents()
+        # crop => adjacent foragers (in agent order), from the crop grid around each
+        adjacent_a_ids: dict[int, list[str]] = {}
+        for a_id in self.agents:
+            if self._is_invalid_agent(agent):
+                continue
+            x, y = self.agent_positions[a_id]
+            for dx, dy in NEIGHBOR_DELTAS:
+                if 0 <= x + dx < self.x_size and 0 <= y + dy < self.y_size:
+                    crop_idx = int(self._crop_grid[x + dx, y + dy])
+                    if crop_idx >= 0:
+                        adjacent_a_ids.setdefault(crop_idx, []).append(a_id)
+
+        # only these crops can be harvested, resolved in index order
+        for crop_idx in sorted(adjacent_a_ids.keys() | set(self._zero_level_crops)):
+            if self.crop_removed[crop_idx]:
+                continue
+            crop_pos = self.crop_positions[crop_idx]
+            crop_level = self.crop_levels[crop_idx]
+
+            adj_a_ids = adjacent_a_ids.get(crop_idx, [])
+            # numpy scalar: float64 rewards as before, and 0 / 0 (level 0 foragers) is nan
+            level_sum = np.int64(sum(self.agent_levels[a_id] for a_id in adj_a_ids))
+            if level_sum >= crop_level >= 0:
+
+                def reward0() -> float:
+                    return 6.0
+
+                def reward1() -> float:
+                    return 2 * float(crop_level)
+
+                self.crop_removed[crop_idx] = True
+                self._set_grid_cell(crop_pos, 0, 0)
+                self._crop_grid[crop_pos] = -1
+                total_crop_reward = reward0() if self.reward_idx == 0 else reward1()
+
+                if adj_a_ids:
+                    for a_id in adj_a_ids:
+                        local_reward = total_crop_reward * (
+                            self.agent_levels[a_id] / level_sum
+                        )
+                        current_step_rewards[a_id] = (
+                            current_step_rewards.get(a_id, 0.0) + local_reward
+                        )
+
+                if self.reward_idx == 1:
+                    for a_id in self.agents:
+                        if not (self.terminations[a_id] or self.truncations[a_id]):
                             current_step_rewards[a_id] = (
-                                current_step_rewards.get(a_id, 0.0) + local_reward
+                                current_step_rewards.get(a_id, 0.0) + 0.5
                             )
+        return current_step_rewards
+
+    def _build_flat_state(self) -> None:
+        self._agent_pos_arr = np.array(
+            list(self.agent_positions.values()), dtype=np.int64
+        ).reshape(-1, 2)
+        self._agent_level_arr = np.array(
+            list(self.agent_levels.values()), dtype=np.int64
+        )
+        self._crop_pos_arr = np.array(self.crop_positions, dtype=np.int64).reshape(
+            -1, 2
+        )
+        self._crop_level_arr = np.array(self.crop_levels, dtype=np.int64)
+        self._crop_removed_arr = np.array(self.crop_removed, dtype=bool)
+
+    def _resolve_cycle_fast(self) -> dict[str, float]:
+        """
+        Flat-array version of `_resolve_cycle` on the numba-compiled cycle kernel.
+        All foragers are alive within a cycle. output: per-cycle rewards
+        """
+        actions = np.array(
+            [self._actions_this_turn[a_id] for a_id in self.agents], dtype=np.int64
+        )
+        n_agents = len(actions)
+        rewards = np.empty(n_agents)
+        moved = np.empty(n_agents, dtype=np.int64)
+        harvested = np.empty(self.n_crops, dtype=np.int64)
+        n_moved, n_harvested = cycle_kernel(
+            actions,
+            ACTION_DELTAS,
+            self._agent_pos_arr,
+            self._agent_level_arr,
+            self._crop_pos_arr,
+            self._crop_level_arr,
+            self._crop_removed_arr,
+            self._obs_grid[0],
+            self.obs_radius,
+            CROP_TYPE,
+            self.reward_idx,
+            rewards,
+            moved,
+            harvested,
+        )
+        moved, harvested = moved[:n_moved], harvested[:n_harvested]
+
+        if moved.size:
+            for i in moved.tolist():
+                a_id = self.possible_agents[i]
+                left_cell = self.agent_positions[a_id]
+                self._set_grid_cell(left_cell, 0, 0)
+                self._agent_grid[left_cell] = -1
+                self.agent_positions[a_id] = tuple(self._agent_pos_arr[i].tolist())
+            self._paint_agents()
+        for crop_idx in harvested.tolist():
+            self.crop_removed[crop_idx] = True
+            self._set_grid_cell(self.crop_positions[crop_idx], 0, 0)
+            self._crop_grid[self.crop_positions[crop_idx]] = -1
+        return dict(zip(self.agents, rewards.tolist()))
+
+    def _run_cycle(self) -> None:
+        """Apply the joint action in `_actions_this_turn`, set rewards and dones"""
+        agent = self.agent_selection
+        if self.fast_step:
+            current_step_rewards = self._resolve_cycle_fast()
+        else:
+            current_step_rewards = self._resolve_cycle()
 
-                    if self.reward_idx == 1:
-                        for a_id in self.agents:
-                            if not (self.terminations[a_id] or self.truncations[a_id]):
-                                current_step_rewards[a_id] = (
-                                    current_step_rewards.get(a_id, 0.0) + 0.5
-                                )
-
-            for a_id in self.agents:
-                if not self._is_invalid_agent(agent):
-                    self.rewards[a_id] = current_step_rewards.get(a_id, 0.0)
+        for a_id in self.agents:
+            if not self._is_invalid_agent(agent):
+                self.rewards[a_id] = current_step_rewards.get(a_id, 0.0)
 
-            self.current_step += 1
-            all_crops_harvested = all(self.crop_removed)
+        self.current_step += 1
+        all_crops_harvested = all(self.crop_removed)
 
-            episode_is_over = False
-            if all_crops_harvested:
-                for a_id in self.agents:
-                    self.terminations[a_id] = True
-                    self.rewards[a_id] += 10.0
-                episode_is_over = True
+        episode_is_over = False
+        if all_crops_harvested:
+            for a_id in self.agents:
+                self.terminations[a_id] = True
+                self.rewards[a_id] += 10.0
+            episode_is_over = True
 
-            if not episode_is_over and self.current_step >= self.max_cycles:
-                for a_id in self.agents:
-                    if not self.terminations[a_id]:
-                        self.truncations[a_id] = True
-                episode_is_over = True
+        if not episode_is_over and self.current_step >= self.max_cycles:
+            for a_id in self.agents:
+                if not self.terminations[a_id]:
+                    self.truncations[a_id] = True
+            episode_is_over = True
 
-            if episode_is_over:
-                self.agents = []
+        if episode_is_over:
+            self.agents = []
 
-            self._actions_this_turn = {}
+        self._actions_this_turn = {}
 
-        for a_id in self.possible_agents:
-            self._cumulative_rewards[a_id] = self.rewards[a_id]
-            self.infos[a_id] = {}
+    def step(self, action: int) -> None:
+        agent = self.agent_selection
+        self.rewards[agent] = 0.0
+        if self._is_invalid_agent(agent):
+            self._was_dead_step(action)
+            self._actions_this_turn[agent] = 0
+            return
+        self._actions_this_turn[agent] = action
+        is_last = self._agent_selector.is_last()
+        if is_last:
+            self._run_cycle()
+
+        if is_last or not self.fast_step:
+            for a_id in self.possible_agents:
+                self._cumulative_rewards[a_id] = self.rewards[a_id]
+                self.infos[a_id] = {}
+        else:
+            # within a cycle only this agent's reward changed
+            self._cumulative_rewards[agent] = self.rewards[agent]
+            self.infos[agent] = {}
 
         self.agent_selection = self._agent_selector.next()
-        self.render()
+        # rgb frames are only drawn on an explicit render() call
+        if self.render_mode == "human":
+            self.render()
 
-    def render(self) -> None:
+    def render(self) -> np.ndarray | None:
+        """output: H x W x 3 uint8 frame with render_mode="rgb_array", else None"""
         if self.render_mode is None:
-            return
+            return None
 
-        if self.render_mode == "human":
+        if self.render_mode in self.metadata["render_modes"]:
             if self._renderer is None:
                 self._renderer = ForagingRenderer(
                     render_fps=self.metadata["render_fps"],
                     display_name=self.metadata["name"],
+                    render_mode=self.render_mode,
+                    backend=self.render_backend,
                 )
 
-            self._renderer.draw_frame(
+            return self._renderer.draw_frame(
                 xs=self.x_size,
                 ys=self.y_size,
                 agent_positions=list(self.agent_positions.values()),
@@ -400,5 +563,4 @@ class RawEnv(AECEnv, EzPickle):
                 crop_removed=self.crop_removed,
                 obs_radius=self.obs_radius,
             )
-
-        return
+        return None
@@ -1,3 +1,4 @@
+import numpy as np
 import pygame
 from pygame import Surface
 from pygame.font import Font
@@ -10,22 +11,55 @@ AGENT_COLOR = (45, 45, 45)
 CROP_COLOR = (220, 20, 60)
 OBS_FILL_COLOR = (119, 158, 203, 100)
 OBS_BORDER_COLOR = (70, 130, 180)
+OBS_BORDER_WIDTH = 2
 TEXT_DARK_COLOR = (50, 50, 50)
 TEXT_LIGHT_COLOR = (255, 255, 255)
 
+RENDER_MODES: tuple[str, ...] = ("human", "rgb_array")
+RENDER_BACKENDS: tuple[str, ...] = ("pygame", "numpy")
+
 
 def _calculate_cell_size(grid_x_size: int, grid_y_size: int) -> int:
     return min(WINDOW_SIZE[0] // grid_y_size, WINDOW_SIZE[1] // grid_x_size)
 
 
+def _clip_slice(start: int, stop: int, size: int) -> slice:
+    return slice(min(max(start, 0), size), min(max(stop, 0), size))
+
+
+def _fill_blend(color):
+    """Color (tuple or uint8 array) as seen under the observation window fill"""
+    alpha = OBS_FILL_COLOR[3] / 255
+    if isinstance(color, np.ndarray):
+        fill = np.array(OBS_FILL_COLOR[:3])
+        return (color + alpha * (fill - color)).astype(np.uint8)
+    return tuple(int(c + alpha * (f - c)) for c, f in zip(color, OBS_FILL_COLOR))
+
+
 class ForagingRenderer:
+    """
+    Draws foraging frames, either to a pygame window ("human", throttled to
+    render_fps) or offscreen ("rgb_array", no display needed), where `draw_frame`
+    returns the frame as an H x W x 3 uint8 array.
+
+    The grid background and the level glyphs are cached. The "numpy" backend
+    draws straight into the frame array instead of blitting pygame surfaces;
+    its crops are rasterized slightly differently from `pygame.draw.circle`.
+    """
+
     def __init__(
         self,
         render_fps: int = 5,
         display_name: str = "Foraging Environment",
+        render_mode: str = "human",
+        backend: str = "pygame",
     ) -> None:
+        assert render_mode in RENDER_MODES, f"unknown render_mode {render_mode}"
+        assert backend in RENDER_BACKENDS, f"unknown render backend {backend}"
         self.render_fps: int = render_fps
         self.display_name: str = display_name
+        self.render_mode: str = render_mode
+        self.backend: str = backend
 
         self.pygame_viewer: Surface | None = None
         self.pygame_font: Font | None = None
@@ -33,16 +67,70 @@ class ForagingRenderer:
         self.cell_size: float = 0
         self._is_initialized: bool = False
 
+        # (xs, ys) the background was drawn for
+        self._background_key: tuple[int, int] | None = None
+        self._background: Surface | None = None
+        self._background_arr: np.ndarray | None = None  # H x W x 3
+        # background under an observation window
+        self._filled_background_arr: np.ndarray | None = None
+        self._obs_overlay: Surface | None = None
+        # (text, color) => glyph surface / H x W alpha in [0, 1]
+        self._glyphs: dict[tuple[str, tuple[int, ...]], Surface] = {}
+        self._glyph_alphas: dict[tuple[str, tuple[int, ...]], np.ndarray] = {}
+        # radius => (2r + 1) x (2r + 1) disc mask
+        self._discs: dict[int, np.ndarray] = {}
+
     def _initialize_pygame(self) -> None:
         if self._is_initialized:
             return
-        pygame.init()
-        self.pygame_viewer = pygame.display.set_mode(WINDOW_SIZE)
-        pygame.display.set_caption(self.display_name)
+        if self.render_mode == "human":
+            pygame.init()
+            self.pygame_viewer = pygame.display.set_mode(WINDOW_SIZE)
+            pygame.display.set_caption(self.display_name)
+            self.pygame_clock = Clock()
+        else:
+            # fonts render without a display
+            pygame.font.init()
         self.pygame_font = Font(None, 24)
-        self.pygame_clock = Clock()
         self._is_initialized = True
 
+    def _glyph(self, text: str, color: tuple[int, ...]) -> Surface:
+        key = (text, color)
+        if key not in self._glyphs:
+            self._glyphs[key] = self.pygame_font.render(text, True, color)
+        return self._glyphs[key]
+
+    def _glyph_alpha(self, text: str, color: tuple[int, ...]) -> np.ndarray:
+        key = (text, color)
+        if key not in self._glyph_alphas:
+            alpha = pygame.surfarray.array_alpha(self._glyph(text, color))
+            self._glyph_alphas[key] = alpha.T[:, :, None] / 255.0
+        return self._glyph_alphas[key]
+
+    def _disc(self, radius: int) -> np.ndarray:
+        if radius not in self._discs:
+            d = np.arange(-radius, radius + 1)
+            self._discs[radius] = d[:, None] ** 2 + d[None, :] ** 2 <= radius**2
+        return self._discs[radius]
+
+    def _update_background(self, xs: int, ys: int) -> None:
+        if self._background_key == (xs, ys):
+            return
+        self.cell_size = _calculate_cell_size(xs, ys)
+        background = Surface(WINDOW_SIZE)
+        background.fill(BG_COLOR)
+        for x in range(0, WINDOW_SIZE[0], self.cell_size):
+            pygame.draw.line(background, GRID_COLOR, (x, 0), (x, WINDOW_SIZE[1]))
+        for y in range(0, WINDOW_SIZE[1], self.cell_size):
+            pygame.draw.line(background, GRID_COLOR, (0, y), (WINDOW_SIZE[0], y))
+        self._background = background
+        self._background_arr = np.ascontiguousarray(
+            pygame.surfarray.array3d(background).transpose(1, 0, 2)
+        )
+        self._filled_background_arr = _fill_blend(self._background_arr)
+        self._obs_overlay = Surface(WINDOW_SIZE, pygame.SRCALPHA)
+        self._background_key = (xs, ys)
+
     def draw_frame(
         self,
         xs: int,
@@ -53,19 +141,38 @@ class ForagingRenderer:
         crop_levels: list[int],
         crop_removed: list[bool],
         obs_radius: int,
-    ) -> None:
+    ) -> np.ndarray | None:
+        """output: H x W x 3 uint8 frame in "rgb_array" mode, else None"""
         if not self._is_initialized:
             self._initialize_pygame()
+        self._update_background(xs, ys)
 
-        self.cell_size = _calculate_cell_size(xs, ys)
+        args = (agent_positions, agent_levels, crop_positions, crop_levels)
+        if self.backend == "numpy":
+            frame = self._draw_numpy(*args, crop_removed, obs_radius)
+            if self.render_mode == "rgb_array":
+                return frame
+            canvas = pygame.surfarray.make_surface(frame.transpose(1, 0, 2))
+        else:
+            canvas = self._draw_pygame(*args, crop_removed, obs_radius)
+            if self.render_mode == "rgb_array":
+                return pygame.surfarray.array3d(canvas).transpose(1, 0, 2)
 
-        canvas = Surface(WINDOW_SIZE)
-        canvas.fill(BG_COLOR)
+        self.pygame_viewer.blit(canvas, (0, 0))
+        pygame.display.flip()
+        self.pygame_clock.tick(self.render_fps)
+        return None
 
-        for x in range(0, WINDOW_SIZE[0], self.cell_size):
-            pygame.draw.line(canvas, GRID_COLOR, (x, 0), (x, WINDOW_SIZE[1]))
-        for y in range(0, WINDOW_SIZE[1], self.cell_size):
-            pygame.draw.line(canvas, GRID_COLOR, (0, y), (WINDOW_SIZE[0], y))
+    def _draw_pygame(
+        self,
+        agent_positions: list[tuple[int, int]],
+        agent_levels: list[int],
+        crop_positions: list[tuple[int, int]],
+        crop_levels: list[int],
+        crop_removed: list[bool],
+        obs_radius: int,
+    ) -> Surface:
+        canvas = self._background.copy()
 
         for pos, level, removed in zip(crop_positions, crop_levels, crop_removed):
             if removed:
@@ -75,12 +182,12 @@ class ForagingRenderer:
             center_y = int((x + 0.5) * self.cell_size)
             radius = int(self.cell_size * 0.35)
             pygame.draw.circle(canvas, CROP_COLOR, (center_x, center_y), radius)
-            if self.pygame_font:
-                text_surf = self.pygame_font.render(str(level), True, TEXT_DARK_COLOR)
-                text_rect = text_surf.get_rect(center=(center_x, center_y))
-                canvas.blit(text_surf, text_rect)
+            text_surf = self._glyph(str(level), TEXT_DARK_COLOR)
+            text_rect = text_surf.get_rect(center=(center_x, center_y))
+            canvas.blit(text_surf, text_rect)
 
-        obs_overlay = Surface(WINDOW_SIZE, pygame.SRCALPHA)
+        obs_overlay = self._obs_overlay
+        obs_overlay.fill((0, 0, 0, 0))
         obs_rects = [
             pygame.Rect(
                 (pos[1] - obs_radius) * self.cell_size,
@@ -93,7 +200,9 @@ class ForagingRenderer:
         for rect in obs_rects:
             pygame.draw.rect(obs_overlay, OBS_FILL_COLOR, rect)
         for rect in obs_rects:
-            pygame.draw.rect(obs_overlay, OBS_BORDER_COLOR, rect, width=2)
+            pygame.draw.rect(
+                obs_overlay, OBS_BORDER_COLOR, rect, width=OBS_BORDER_WIDTH
+            )
         canvas.blit(obs_overlay, (0, 0))
 
         for pos, levels in zip(agent_positions, agent_levels):
@@ -108,17 +217,102 @@ class ForagingRenderer:
             agent_rect = pygame.Rect(rect_x, rect_y, square_size, square_size)
             pygame.draw.rect(canvas, color, agent_rect)
 
-            if self.pygame_font:
-                text_surf = self.pygame_font.render(str(levels), True, TEXT_LIGHT_COLOR)
-                text_rect = text_surf.get_rect(center=agent_rect.center)
-                canvas.blit(text_surf, text_rect)
+            text_surf = self._glyph(str(levels), TEXT_LIGHT_COLOR)
+            text_rect = text_surf.get_rect(center=agent_rect.center)
+            canvas.blit(text_surf, text_rect)
+        return canvas
 
-        self.pygame_viewer.blit(canvas, (0, 0))
-        pygame.display.flip()
-        self.pygame_clock.tick(self.render_fps)
+    def _blend_glyph(
+        self,
+        frame: np.ndarray,
+        text: str,
+        color: tuple[int, ...],
+        center: tuple[int, int],
+        draw_color: tuple[int, ...] | None = None,
+    ) -> None:
+        """Blend the glyph of (text, color), drawn in draw_color (default color)"""
+        alpha = self._glyph_alpha(text, color)
+        h, w = alpha.shape[:2]
+        # same placement as Rect(center=...): top-left = center - size // 2
+        top, left = center[1] - h // 2, center[0] - w // 2
+        rows = _clip_slice(top, top + h, frame.shape[0])
+        cols = _clip_slice(left, left + w, frame.shape[1])
+        alpha = alpha[
+            rows.start - top : rows.stop - top, cols.start - left : cols.stop - left
+        ]
+        region = frame[rows, cols]
+        region[:] = region + alpha * (np.array(draw_color or color) - region)
+
+    def _draw_numpy(
+        self,
+        agent_positions: list[tuple[int, int]],
+        agent_levels: list[int],
+        crop_positions: list[tuple[int, int]],
+        crop_levels: list[int],
+        crop_removed: list[bool],
+        obs_radius: int,
+    ) -> np.ndarray:
+        cell = self.cell_size
+        height, width = WINDOW_SIZE[1], WINDOW_SIZE[0]
+        frame = self._background_arr.copy()  # H x W x 3
+
+        # observation windows are cell aligned: copy the pre-blended background
+        # over them, and blend what is drawn inside them with the fill color too
+        n = 2 * obs_radius + 1
+        covered = np.zeros((-(-height // cell), -(-width // cell)), dtype=bool)
+        windows = []
+        for pos in agent_positions:
+            top, left = (pos[0] - obs_radius) * cell, (pos[1] - obs_radius) * cell
+            rows = _clip_slice(top, top + n * cell, height)
+            cols = _clip_slice(left, left + n * cell, width)
+            frame[rows, cols] = self._filled_background_arr[rows, cols]
+            covered[
+                max(pos[0] - obs_radius, 0) : pos[0] + obs_radius + 1,
+                max(pos[1] - obs_radius, 0) : pos[1] + obs_radius + 1,
+            ] = True
+            windows.append((top, left, rows, cols))
+
+        radius = int(cell * 0.35)
+        disc = self._disc(radius)
+        for pos, level, removed in zip(crop_positions, crop_levels, crop_removed):
+            if removed:
+                continue
+            filled = covered[pos]
+            center_x = int((pos[1] + 0.5) * cell)
+            center_y = int((pos[0] + 0.5) * cell)
+            region = frame[
+                center_y - radius : center_y + radius + 1,
+                center_x - radius : center_x + radius + 1,
+            ]
+            region[disc] = _fill_blend(CROP_COLOR) if filled else CROP_COLOR
+            text_color = _fill_blend(TEXT_DARK_COLOR) if filled else TEXT_DARK_COLOR
+            self._blend_glyph(
+                frame, str(level), TEXT_DARK_COLOR, (center_x, center_y), text_color
+            )
+
+        # borders are opaque and drawn over all windows
+        size, w = n * cell, OBS_BORDER_WIDTH
+        for top, left, rows, cols in windows:
+            frame[_clip_slice(top, top + w, height), cols] = OBS_BORDER_COLOR
+            frame[_clip_slice(top + size - w, top + size, height), cols] = (
+                OBS_BORDER_COLOR
+            )
+            frame[rows, _clip_slice(left, left + w, width)] = OBS_BORDER_COLOR
+            frame[rows, _clip_slice(left + size - w, left + size, width)] = (
+                OBS_BORDER_COLOR
+            )
+
+        square_size = int(cell * 0.7)
+        offset = int((cell - square_size) / 2)
+        for pos, levels in zip(agent_positions, agent_levels):
+            top, left = pos[0] * cell + offset, pos[1] * cell + offset
+            frame[top : top + square_size, left : left + square_size] = AGENT_COLOR
+            center = (left + square_size // 2, top + square_size // 2)
+            self._blend_glyph(frame, str(levels), TEXT_LIGHT_COLOR, center)
+        return frame
 
     def close(self) -> None:
         if self.pygame_viewer is not None:
             pygame.quit()
             self.pygame_viewer = None
-            self._is_initialized = False
+        self._is_initialized = False
@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Layout(NamedTuple):
+    """Start state of an episode"""
+
+    x_size: int
+    y_size: int
+    agent_positions: np.ndarray  # n_foragers x 2
+    agent_levels: np.ndarray  # n_foragers
+    crop_positions: np.ndarray  # n_crops x 2
+    crop_levels: np.ndarray  # n_crops
+
+
+def _draw_levels(
+    rng: np.random.Generator,
+    shape: tuple[int, int],
+    max_level: int,
+    levels: list[int] | None,
+    level_probs: list[float] | None,
+) -> np.ndarray:
+    # fixed levels, a distribution over 0..len(level_probs) - 1 or uniform over
+    # 0..max_level like RawEnv.reset
+    if levels is not None:
+        assert len(levels) == shape[1], f"expected {shape[1]} levels"
+        return np.broadcast_to(np.asarray(levels, dtype=np.int8), shape).copy()
+    if level_probs is not None:
+        probs = np.asarray(level_probs, dtype=np.float64)
+        return rng.choice(len(probs), size=shape, p=probs / probs.sum()).astype(np.int8)
+    return rng.integers(0, max_level + 1, size=shape, dtype=np.int8)
+
+
+class LayoutBank:
+    """
+    Pre-generated layouts of one grid size / forager / crop count, drawn by
+    RawEnv.reset in O(1) instead of placing entities by rejection sampling.
+    Arrays are stored compactly (int16 positions, int8 levels), see save / load.
+    """
+
+    def __init__(
+        self,
+        x_size: int,
+        y_size: int,
+        agent_positions: np.ndarray,
+        agent_levels: np.ndarray,
+        crop_positions: np.ndarray,
+        crop_levels: np.ndarray,
+    ) -> None:
+        self.x_size: int = int(x_size)
+        self.y_size: int = int(y_size)
+        self.agent_positions: np.ndarray = agent_positions  # N x n_foragers x 2
+        self.agent_levels: np.ndarray = agent_levels  # N x n_foragers
+        self.crop_positions: np.ndarray = crop_positions  # N x n_crops x 2
+        self.crop_levels: np.ndarray = crop_levels  # N x n_crops
+
+    @property
+    def n_foragers(self) -> int:
+        return self.agent_levels.shape[1]
+
+    @property
+    def n_crops(self) -> int:
+        return self.crop_levels.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.agent_levels)
+
+    @classmethod
+    def generate(
+        cls,
+        n_layouts: int,
+        x_size: int = 10,
+        y_size: int = 8,
+        n_foragers: int = 3,
+        n_crops: int = 10,
+        forager_levels: list[int] | None = None,
+        crop_levels: list[int] | None = None,
+        forager_level_probs: list[float] | None = None,
+        crop_level_probs: list[float] | None = None,
+        max_level: int = 3,
+        seed: int | np.random.Generator | None = None,
+    ) -> "LayoutBank":
+        """
+        n_layouts layouts at once: every layout takes n_foragers + n_crops distinct
+        cells, sampled without replacement as the k smallest of one uniform key per
+        cell. Levels as in RawEnv (foragers 0..max_level, crops 0..max_level + 1)
+        unless fixed or given as a distribution.
+        """
+        n_cells = x_size * y_size
+        k = n_foragers + n_crops
+        assert k <= n_cells, f"{k} entities do not fit a {x_size} x {y_size} grid"
+        rng = np.random.default_rng(seed)
+
+        keys = rng.random((n_layouts, n_cells))  # N x cells
+        if k < n_cells:
+            cells = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        else:
+            cells = np.broadcast_to(np.arange(n_cells), keys.shape)
+        # shuffle within the chosen cells, by their keys
+        order = np.take_along_axis(keys, cells, axis=1).argsort(axis=1)
+        cells = np.take_along_axis(cells, order, axis=1)  # N x k
+        positions = np.stack([cells // y_size, cells % y_size], axis=2).astype(
+            np.int16
+        )  # N x k x 2
+        return cls(
+            x_size,
+            y_size,
+            agent_positions=positions[:, :n_foragers],
+            agent_levels=_draw_levels(
+                rng,
+                (n_layouts, n_foragers),
+                max_level,
+                forager_levels,
+                forager_level_probs,
+            ),
+            crop_positions=positions[:, n_foragers:],
+            crop_levels=_draw_levels(
+                rng, (n_layouts, n_crops), max_level + 1, crop_levels, crop_level_probs
+            ),
+        )
+
+    def layout(self, index: int) -> Layout:
+        return Layout(
+            self.x_size,
+            self.y_size,
+            self.agent_positions[index],
+            self.agent_levels[index],
+            self.crop_positions[index],
+            self.crop_levels[index],
+        )
+
+    def draw(self, rng: np.random.Generator, n_resets: int = 0) -> Layout:
+        """A uniformly drawn layout; n_resets is unused, see Curriculum.draw"""
+        return self.layout(int(rng.integers(len(self))))
+
+    def save(self, path: str) -> None:
+        """One .npz array file"""
+        np.savez(
+            path,
+            size=np.array([self.x_size, self.y_size]),
+            agent_positions=self.agent_positions,
+            agent_levels=self.agent_levels,
+            crop_positions=self.crop_positions,
+            crop_levels=self.crop_levels,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LayoutBank":
+        with np.load(path) as data:
+            x_size, y_size = data["size"].tolist()
+            return cls(
+                x_size,
+                y_size,
+                agent_positions=data["agent_positions"],
+                agent_levels=data["agent_levels"],
+                crop_positions=data["crop_positions"],
+                crop_levels=data["crop_levels"],
+            )
+
+
+@dataclass
+class CurriculumStage:
+    """Layout parameters of a curriculum stage, used for `resets` env resets"""
+
+    x_size: int
+    y_size: int
+    n_crops: int
+    resets: int = 0
+    forager_levels: list[int] | None = None
+    crop_levels: list[int] | None = None
+    forager_level_probs: list[float] | None = None
+    crop_level_probs: list[float] | None = None
+
+
+class Curriculum:
+    """
+    Layout banks played in order: stage i is drawn from for stage_resets[i] resets
+    of an env, the last stage from then on. The reset count is kept by each env,
+    so one curriculum can be shared by many envs; a seeded reset restarts it.
+    """
+
+    def __init__(self, banks: list[LayoutBank], stage_resets: list[int]) -> None:
+        assert len(stage_resets) >= len(banks) - 1, "set the resets of every stage"
+        n_foragers = {bank.n_foragers for bank in banks}
+        assert len(n_foragers) == 1, "all stages need the same number of foragers"
+        self.banks: list[LayoutBank] = banks
+        # first reset of each stage after the first
+        self.stage_starts: np.ndarray = np.cumsum(stage_resets[: len(banks) - 1])
+
+    @property
+    def n_foragers(self) -> int:
+        return self.banks[0].n_foragers
+
+    @classmethod
+    def generate(
+        cls,
+        stages: list[CurriculumStage],
+        n_foragers: int = 3,
+        n_layouts: int = 1000,
+        max_level: int = 3,
+        seed: int | None = None,
+    ) -> "Curriculum":
+        """A bank of n_layouts per stage, each from its own independent stream"""
+        stage_seeds = np.random.SeedSequence(seed).spawn(len(stages))
+        banks = [
+            LayoutBank.generate(
+                n_layouts,
+                x_size=stage.x_size,
+                y_size=stage.y_size,
+                n_foragers=n_foragers,
+                n_crops=stage.n_crops,
+                forager_levels=stage.forager_levels,
+                crop_levels=stage.crop_levels,
+                forager_level_probs=stage.forager_level_probs,
+                crop_level_probs=stage.crop_level_probs,
+                max_level=max_level,
+                seed=np.random.default_rng(stage_seed),
+            )
+            for stage, stage_seed in zip(stages, stage_seeds)
+        ]
+        return cls(banks, [stage.resets for stage in stages])
+
+    def stage(self, n_resets: int) -> int:
+        return int(np.searchsorted(self.stage_starts, n_resets, side="right"))
+
+    def stage_start(self, stage: int) -> int:
+        """Reset count of the first reset of stage"""
+        assert 0 <= stage < len(self.banks), f"no stage {stage}"
+        return 0 if stage == 0 else int(self.stage_starts[stage - 1])
+
+    def draw(self, rng: np.random.Generator, n_resets: int = 0) -> Layout:
+        return self.banks[self.stage(n_resets)].draw(rng)
@@ -0,0 +1,270 @@
+import numpy as np
+from gymnasium.spaces import Discrete, Box
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .raw_env import (
+    ACTION_DELTAS,
+    ACTION_MAP,
+    AGENT_TYPE,
+    OTHER_AGENT_TYPE,
+    CROP_TYPE,
+    PADDING_TYPE,
+)
+
+
+class VectorForagingEnv:
+    """
+    B foraging worlds stored as stacked arrays and stepped in one batched call.
+
+    World b follows the same dynamics as `RawEnv`: with the same seed and actions,
+    positions, harvests, per-cycle rewards (`RawEnv.rewards`) and observations match.
+
+    state shapes:
+        agent_positions: B x n_foragers x 2
+        agent_levels: B x n_foragers
+        crop_positions: B x n_crops x 2
+        crop_levels / crop_removed: B x n_crops
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        x_size: int = 10,
+        y_size: int = 8,
+        n_foragers: int = 3,
+        n_crops: int = 10,
+        obs_radius: int = 3,
+        forager_levels: list[int] | None = None,
+        crop_levels: list[int] | None = None,
+        max_cycles: int = 100,
+        reward_idx: int = 0,
+        auto_reset: bool = True,
+    ) -> None:
+        if forager_levels is not None and n_foragers != len(forager_levels):
+            forager_levels = None
+        if crop_levels is not None and n_crops != len(crop_levels):
+            crop_levels = None
+
+        self.num_envs = num_envs
+        self.x_size = x_size
+        self.y_size = y_size
+        self.n_foragers = n_foragers
+        self.n_crops = n_crops
+        self.obs_radius = obs_radius
+
+        self.forager_levels_config = forager_levels
+        self.crop_levels_config = crop_levels
+        self.max_level_param: int = 3
+
+        self.max_cycles = max_cycles
+        self.reward_idx = reward_idx
+        self.auto_reset = auto_reset
+
+        self.possible_agents = [f"forager_{i}" for i in range(n_foragers)]
+
+        b, n, c = num_envs, n_foragers, n_crops
+        self.agent_positions: np.ndarray = np.zeros((b, n, 2), dtype=np.int64)
+        self.agent_levels: np.ndarray = np.zeros((b, n), dtype=np.int64)
+        self.crop_positions: np.ndarray = np.zeros((b, c, 2), dtype=np.int64)
+        self.crop_levels: np.ndarray = np.zeros((b, c), dtype=np.int64)
+        self.crop_removed: np.ndarray = np.zeros((b, c), dtype=bool)
+        self.current_step: np.ndarray = np.zeros(b, dtype=np.int64)
+
+        # one legacy RandomState per world, same stream as `np.random.seed(seed)`
+        self._rngs: list[np.random.RandomState] = [
+            np.random.RandomState() for _ in range(b)
+        ]
+        # padded type/level grids, re-painted on every observation
+        r = self.obs_radius
+        self._grids: np.ndarray = np.empty(
+            (b, 2, x_size + 2 * r, y_size + 2 * r), dtype=np.int8
+        )
+
+    @property
+    def single_observation_space(self) -> Box:
+        local_dim = 2 * self.obs_radius + 1
+        return Box(low=0, high=10, shape=(2, local_dim, local_dim), dtype=np.int8)
+
+    @property
+    def single_action_space(self) -> Discrete:
+        return Discrete(len(ACTION_MAP))
+
+    def reset(self, seed: int | list[int] | None = None) -> np.ndarray:
+        """
+        seed: int => world b uses seed + b; list => one seed per world.
+        output shape: B x n_foragers x 2 x local_dim x local_dim
+        """
+        if seed is not None:
+            seeds = (
+                [seed + i for i in range(self.num_envs)]
+                if isinstance(seed, int)
+                else list(seed)
+            )
+            assert len(seeds) == self.num_envs, "one seed per world is required"
+            self._rngs = [np.random.RandomState(s) for s in seeds]
+        for world_idx in range(self.num_envs):
+            self._reset_world(world_idx)
+        return self.observe()
+
+    def _reset_world(self, world_idx: int) -> None:
+        # same draw order as RawEnv.reset: forager levels, forager cells,
+        # crop levels, crop cells
+        rng = self._rngs[world_idx]
+        occupied_cells = set()
+
+        def _get_random_level(num: int, max_level: int = 4) -> list[int]:
+            max_level = 4 if max_level <= 0 else max_level
+            return rng.randint(0, max_level + 1, size=num).astype(np.int8).tolist()
+
+        def _get_valid_pos() -> tuple[int, int]:
+            while True:
+                pos_i = (rng.randint(self.x_size), rng.randint(self.y_size))
+                if pos_i not in occupied_cells:
+                    occupied_cells.add(pos_i)
+                    return pos_i
+
+        f_levels = (
+            _get_random_level(self.n_foragers, self.max_level_param)
+            if self.forager_levels_config is None
+            else self.forager_levels_config
+        )
+        self.agent_positions[world_idx] = [
+            _get_valid_pos() for _ in range(self.n_foragers)
+        ]
+        self.agent_levels[world_idx] = f_levels
+
+        c_levels = (
+            _get_random_level(self.n_crops, self.max_level_param + 1)
+            if self.crop_levels_config is None
+            else self.crop_levels_config
+        )
+        self.crop_positions[world_idx] = [_get_valid_pos() for _ in range(self.n_crops)]
+        self.crop_levels[world_idx] = c_levels
+        self.crop_removed[world_idx] = False
+        self.current_step[world_idx] = 0
+
+    def _move_all_agents(self, actions: np.ndarray) -> None:
+        new_pos = self.agent_positions + ACTION_DELTAS[actions]  # B x n x 2
+        in_bounds = (
+            (new_pos[..., 0] >= 0)
+            & (new_pos[..., 0] < self.x_size)
+            & (new_pos[..., 1] >= 0)
+            & (new_pos[..., 1] < self.y_size)
+        )
+        # B x n x c: target cell holds a live crop
+        on_crop = (new_pos[:, :, None, :] == self.crop_positions[:, None, :, :]).all(-1)
+        blocked = (on_crop & ~self.crop_removed[:, None, :]).any(-1)
+        move = in_bounds & ~blocked
+        self.agent_positions = np.where(move[..., None], new_pos, self.agent_positions)
+
+    def _harvest(self) -> np.ndarray:
+        """
+        Harvest every live crop whose adjacent forager levels sum up to its level.
+        output shape: B x n_foragers (per-cycle rewards)
+        """
+        dist = np.abs(
+            self.agent_positions[:, :, None, :] - self.crop_positions[:, None, :, :]
+        ).sum(-1)
+        adj = dist == 1  # B x n x c
+        level_sum = (adj * self.agent_levels[:, :, None]).sum(1)  # B x c
+        harvest = (
+            ~self.crop_removed
+            & (level_sum >= self.crop_levels)
+            & (self.crop_levels >= 0)
+        )
+
+        if self.reward_idx == 0:
+            total_crop_reward = np.full(self.crop_levels.shape, 6.0)
+        else:
+            total_crop_reward = 2 * self.crop_levels.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = total_crop_reward[:, None, :] * (
+                self.agent_levels[:, :, None] / level_sum[:, None, :]
+            )
+        share = np.where(adj & harvest[:, None, :], share, 0.0)  # B x n x c
+        bonus = np.broadcast_to(
+            np.where(harvest, 0.5 if self.reward_idx == 1 else 0.0, 0.0)[:, None, :],
+            share.shape,
+        )
+
+        # RawEnv adds (share, bonus) crop by crop, cumsum keeps that float order
+        b, n, c = share.shape
+        contributions = np.concatenate(
+            [
+                np.full((b, n, 1), -0.1),
+                np.stack([share, bonus], axis=-1).reshape(b, n, 2 * c),
+            ],
+            axis=-1,
+        )
+        self.crop_removed |= harvest
+        return np.cumsum(contributions, axis=-1)[..., -1]
+
+    def step(
+        self, actions: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """
+        input shape: B x n_foragers (int actions)
+        output: observations (B x n x 2 x local_dim x local_dim),
+            rewards, terminations, truncations (B x n), infos
+        Finished worlds are reset when auto_reset is set, their last observations
+        are kept in infos["final_observation"].
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(
+            self.num_envs, self.n_foragers
+        )
+        self._move_all_agents(actions)
+        rewards = self._harvest()
+        self.current_step += 1
+
+        terminated = self.crop_removed.all(1)  # B
+        rewards[terminated] += 10.0
+        truncated = ~terminated & (self.current_step >= self.max_cycles)
+
+        observations = self.observe()
+        terminations = np.repeat(terminated[:, None], self.n_foragers, axis=1)
+        truncations = np.repeat(truncated[:, None], self.n_foragers, axis=1)
+        infos = {}
+
+        done = terminated | truncated
+        if self.auto_reset and done.any():
+            infos["final_observation"] = observations.copy()
+            done_idx = np.flatnonzero(done)
+            for world_idx in done_idx:
+                self._reset_world(world_idx)
+            observations[done_idx] = self.observe()[done_idx]
+        return observations, rewards, terminations, truncations, infos
+
+    def observe(self) -> np.ndarray:
+        """
+        Local views of all foragers in all worlds, gathered from padded grids.
+        output shape: B x n_foragers x 2 x local_dim x local_dim
+        """
+        r = self.obs_radius
+        b_idx = np.arange(self.num_envs)[:, None]
+
+        grids = self._grids
+        grids.fill(PADDING_TYPE)
+        grids[:, :, r : r + self.x_size, r : r + self.y_size] = 0
+
+        live_b, live_c = np.nonzero(~self.crop_removed)
+        crop_x, crop_y = self.crop_positions[live_b, live_c].T + r
+        grids[live_b, 0, crop_x, crop_y] = CROP_TYPE
+        grids[live_b, 1, crop_x, crop_y] = self.crop_levels[live_b, live_c]
+
+        # stacked foragers: the one with the largest index is painted on top
+        same_cell = (
+            self.agent_positions[:, :, None, :] == self.agent_positions[:, None, :, :]
+        ).all(-1)
+        shadowed = np.triu(same_cell, k=1).any(-1)  # B x n
+        top_b, top_a = np.nonzero(~shadowed)
+        agent_x, agent_y = self.agent_positions[top_b, top_a].T + r
+        grids[top_b, 0, agent_x, agent_y] = OTHER_AGENT_TYPE
+        grids[top_b, 1, agent_x, agent_y] = self.agent_levels[top_b, top_a]
+
+        local_dim = 2 * r + 1
+        windows = sliding_window_view(grids, (local_dim, local_dim), axis=(2, 3))
+        pos_x = self.agent_positions[..., 0]
+        pos_y = self.agent_positions[..., 1]
+        observations = windows[b_idx, :, pos_x, pos_y]  # B x n x 2 x ld x ld
+        observations[..., 0, r, r] = np.where(shadowed, OTHER_AGENT_TYPE, AGENT_TYPE)
+        return observations
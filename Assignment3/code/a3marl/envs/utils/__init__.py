@@ -1,5 +1,9 @@
 from ._config import EnvConfig
+from ._spec import EnvSpec
+from ._pool import EnvPool
 
 __all__ = [
     "EnvConfig",
+    "EnvSpec",
+    "EnvPool",
 ]
@@ -1,7 +1,10 @@
-from dataclasses import dataclass
-from copy import deepcopy
+from dataclasses import dataclass, field
+
 from pettingzoo import ParallelEnv
 
+from ._pool import EnvPool
+from ._spec import EnvSpec
+
 
 @dataclass
 class EnvConfig:
@@ -9,10 +12,38 @@ class EnvConfig:
     env_creator: callable
     env_kwargs: dict[str, object]
 
+    # built on first use, see spec and pool
+    _spec: EnvSpec | None = field(default=None, init=False, repr=False, compare=False)
+    _pool: EnvPool | None = field(default=None, init=False, repr=False, compare=False)
+
     def get_env(self, **override_kwargs) -> ParallelEnv:
-        if override_kwargs is not None:
-            final_kwargs = deepcopy(self.env_kwargs)
-            final_kwargs.update(override_kwargs)
-            return self.env_creator(**final_kwargs)
-        else:
-            return self.env_creator(**self.env_kwargs)
+        """A new env; env creators copy the kwargs they modify"""
+        if override_kwargs:
+            return self.env_creator(**{**self.env_kwargs, **override_kwargs})
+        return self.env_creator(**self.env_kwargs)
+
+    @property
+    def pool(self) -> EnvPool:
+        """Envs of this config, recycled by reset"""
+        if self._pool is None:
+            self._pool = EnvPool(self)
+        return self._pool
+
+    def spec(self, env: ParallelEnv | None = None) -> EnvSpec:
+        """
+        Agent ids, observation shapes and action sizes, read once from env (or a
+        pooled env) and cached; render_mode / max_cycles overrides do not change it.
+        """
+        if self._spec is None:
+            if env is not None:
+                self._spec = EnvSpec.from_env(env)
+            else:
+                with self.pool.env(render_mode=None) as pooled_env:
+                    self._spec = EnvSpec.from_env(pooled_env)
+        return self._spec
+
+    def __getstate__(self) -> dict[str, object]:
+        # the spec goes along to worker processes, the pooled envs stay here
+        state = dict(self.__dict__)
+        state["_pool"] = None
+        return state
@@ -0,0 +1,82 @@
+import threading
+from contextlib import contextmanager
+
+from pettingzoo import ParallelEnv
+
+
+class EnvPool:
+    """
+    Constructed envs of an EnvConfig, recycled by reset instead of rebuilt.
+    Envs are pooled per set of override kwargs; an acquired env belongs to the
+    caller until it is released. Thread-safe.
+    """
+
+    def __init__(self, env_config) -> None:
+        self.env_config = env_config
+        # overrides key => free envs
+        self._free: dict[str, list[ParallelEnv]] = {}
+        # id(env) => overrides key, of acquired envs
+        self._keys: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.n_built: int = 0
+
+    @staticmethod
+    def _key(override_kwargs: dict[str, object]) -> str:
+        return repr(sorted(override_kwargs.items()))
+
+    def acquire(self, **override_kwargs) -> ParallelEnv:
+        """A free env built with these overrides, or a new one; reset it before use"""
+        key = self._key(override_kwargs)
+        with self._lock:
+            free = self._free.get(key)
+            env = free.pop() if free else None
+        if env is None:
+            env = self.env_config.get_env(**override_kwargs)
+            with self._lock:
+                self.n_built += 1
+        with self._lock:
+            self._keys[id(env)] = key
+        return env
+
+    def clone(self, seed: int, **override_kwargs) -> tuple[ParallelEnv, dict, dict]:
+        """
+        An env in the state of a freshly built one reset with seed: a recycled env
+        reset with that seed, its action spaces seeded with it as well (as the
+        trainers seed theirs). output: env, observations, infos
+        """
+        env = self.acquire(**override_kwargs)
+        observations, infos = env.reset(seed=seed)
+        for agent in env.possible_agents:
+            env.action_space(agent).seed(seed)
+        return env, observations, infos
+
+    def release(self, env: ParallelEnv) -> None:
+        """Return an acquired env, envs not from this pool are closed"""
+        with self._lock:
+            key = self._keys.pop(id(env), None)
+            if key is not None:
+                self._free.setdefault(key, []).append(env)
+                return
+        env.close()
+
+    @contextmanager
+    def env(self, **override_kwargs):
+        env = self.acquire(**override_kwargs)
+        try:
+            yield env
+        finally:
+            self.release(env)
+
+    def __len__(self) -> int:
+        """Number of free envs"""
+        with self._lock:
+            return sum(len(free) for free in self._free.values())
+
+    def close(self) -> None:
+        """Close the free envs, acquired ones are closed on release"""
+        with self._lock:
+            free_envs = [env for free in self._free.values() for env in free]
+            self._free = {}
+            self._keys = {}
+        for env in free_envs:
+            env.close()
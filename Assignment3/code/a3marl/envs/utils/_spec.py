@@ -0,0 +1,36 @@
+import math
+from dataclasses import dataclass
+
+from pettingzoo import ParallelEnv
+
+
+@dataclass(frozen=True)
+class EnvSpec:
+    """Agent ids, observation shapes and action sizes of an env"""
+
+    agent_keys: tuple[str, ...]
+    obs_shapes: dict[str, tuple[int, ...]]
+    act_dims: dict[str, int]
+
+    @classmethod
+    def from_env(cls, env: ParallelEnv) -> "EnvSpec":
+        """Read from the spaces, no reset needed"""
+        agent_keys = tuple(env.possible_agents)
+        return cls(
+            agent_keys=agent_keys,
+            obs_shapes={
+                agent_key: tuple(env.observation_space(agent_key).shape)
+                for agent_key in agent_keys
+            },
+            act_dims={
+                agent_key: int(env.action_space(agent_key).n)
+                for agent_key in agent_keys
+            },
+        )
+
+    @property
+    def obs_dims(self) -> dict[str, int]:
+        """agent_key => flattened observation size"""
+        return {
+            agent_key: math.prod(shape) for agent_key, shape in self.obs_shapes.items()
+        }
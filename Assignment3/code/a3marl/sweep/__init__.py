@@ -0,0 +1,14 @@
+from ._space import SearchSpace, grid_search, random_search, split_params
+from ._runner import SweepSpec, Trial, run_sweep, run_trial, load_sweep_spec
+
+__all__ = [
+    "SearchSpace",
+    "grid_search",
+    "random_search",
+    "split_params",
+    "SweepSpec",
+    "Trial",
+    "run_sweep",
+    "run_trial",
+    "load_sweep_spec",
+]
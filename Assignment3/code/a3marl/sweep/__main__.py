@@ -0,0 +1,54 @@
+"""
+Usage:
+    python -m a3marl.sweep sweep.json --out ./data/sweeps --threads 1
+    python -m a3marl.sweep sweep.json --workers 16 --threads 4 --no-pin
+
+sweep.json holds the SweepSpec fields, e.g.
+    {
+        "name": "fo", "algo": "iql",
+        "env_creator": "a3marl.envs.foraging:parallel_env",
+        "env_kwargs": {"n_crops": 12, "max_cycles": 100, "reward_idx": 1},
+        "agent_kwargs": {"hidden_dims": [100, 50, 25], "batch_size": 128},
+        "trainer_kwargs": {"num_episodes": 100, "max_episode_lengths": 100},
+        "grid": {
+            "env.n_foragers,env.forager_levels": [[3, [1, 2, 3]], [5, [1, 2, 2, 3, 3]]],
+            "trainer.dqn_update_freq": [10, 25]
+        },
+        "random": {"agent.lr": {"loguniform": [1e-4, 1e-2]}},
+        "n_random": 4,
+        "seeds": [0, 1, 2]
+    }
+"""
+
+import argparse
+import sys
+
+from . import load_sweep_spec, run_sweep
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m a3marl.sweep")
+    parser.add_argument("spec", help="sweep spec json")
+    parser.add_argument("--out", default="./data/sweeps")
+    parser.add_argument("--workers", type=int, help="default: cpus // threads")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per run")
+    parser.add_argument("--no-pin", action="store_true", help="do not pin runs to cpus")
+    parser.add_argument(
+        "--start-method", default="spawn", choices=["spawn", "forkserver", "fork"]
+    )
+    args = parser.parse_args()
+
+    table = run_sweep(
+        load_sweep_spec(args.spec),
+        out_dir=args.out,
+        n_workers=args.workers,
+        threads_per_run=args.threads,
+        pin_cpus=not args.no_pin,
+        start_method=args.start_method,
+    )
+    print(table.to_string(), file=sys.stderr)
+    return 0 if (table["status"] == "ok").all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+import contextlib
+import importlib
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import torch
+
+from a3marl.agents import (
+    CqlAgent,
+    CqlAgentConfig,
+    FactoredCqlAgent,
+    FactoredCqlAgentConfig,
+    IqlAgent,
+    IqlAgentConfig,
+    IqlAgentGroup,
+)
+from a3marl.envs.utils import EnvConfig, EnvSpec
+from a3marl.utils import EpisodeLogWriter
+from ._space import SearchSpace, grid_search, random_search, split_params
+
+SWEEP_ALGOS: tuple[str, ...] = ("iql", "iql_group", "cql", "fcql")
+RESULTS_FILE = "results.csv"
+RESULTS_LOG_FILE = "results.jsonl"
+
+
+@dataclass
+class SweepSpec:
+    """
+    A sweep: base env / agent / trainer kwargs, a grid and / or random search over
+    dotted keys (see grid_search), crossed with seeds.
+    env_creator may be an import path "module:attr", e.g. for json specs
+    "a3marl.envs.foraging:parallel_env".
+    """
+
+    name: str
+    algo: str
+    env_creator: Callable | str
+    env_kwargs: dict[str, object] = field(default_factory=dict)
+    agent_kwargs: dict[str, object] = field(default_factory=dict)
+    trainer_kwargs: dict[str, object] = field(default_factory=dict)
+    grid: SearchSpace = field(default_factory=dict)
+    random: SearchSpace = field(default_factory=dict)
+    n_random: int = 0
+    random_seed: int = 0
+    seeds: list[int] = field(default_factory=lambda: [0])
+    device: str = "cpu"
+
+    def validate(self) -> None:
+        assert self.algo in SWEEP_ALGOS, f"unsupported sweep algo: {self.algo}"
+        assert not self.random or self.n_random > 0, "set n_random for random search"
+
+    def points(self) -> list[dict[str, object]]:
+        """Grid points crossed with the random draws (either may be empty)"""
+        grid_points = grid_search(self.grid)
+        random_points = (
+            random_search(self.random, self.n_random, self.random_seed)
+            if self.random
+            else [{}]
+        )
+        return [{**g, **r} for g in grid_points for r in random_points]
+
+    def trials(self) -> list["Trial"]:
+        self.validate()
+        return [
+            Trial(run_id=f"run_{i:04d}_s{seed}", point=point, seed=seed)
+            for i, point in enumerate(self.points())
+            for seed in self.seeds
+        ]
+
+
+@dataclass
+class Trial:
+    run_id: str
+    point: dict[str, object]
+    seed: int
+
+
+def _resolve_creator(env_creator: Callable | str) -> callable:
+    if callable(env_creator):
+        return env_creator
+    module, attr = env_creator.split(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _build_agents(
+    algo: str, env, spec: EnvSpec, agent_kwargs: dict[str, object], device: str
+):
+    obs_dims = spec.obs_dims
+    act_dims = spec.act_dims
+    if algo == "iql":
+        return {
+            agent_key: IqlAgent(
+                agent_key,
+                IqlAgentConfig(
+                    obs_dim=obs_dims[agent_key],
+                    act_dim=act_dims[agent_key],
+                    **agent_kwargs,
+                ),
+                act_sampler=env.action_space(agent_key).sample,
+                device=device,
+            )
+            for agent_key in obs_dims
+        }
+    if algo == "iql_group":
+        first_key = next(iter(obs_dims))
+        return IqlAgentGroup(
+            "agent_group",
+            IqlAgentConfig(
+                obs_dim=obs_dims[first_key],
+                act_dim=act_dims[first_key],
+                **agent_kwargs,
+            ),
+            list(obs_dims),
+            device=device,
+        )
+    agent_cls, config_cls = (
+        (FactoredCqlAgent, FactoredCqlAgentConfig)
+        if algo == "fcql"
+        else (CqlAgent, CqlAgentConfig)
+    )
+    return agent_cls(
+        "central_agent",
+        config_cls(
+            obs_dims=obs_dims, act_dims=act_dims, **agent_kwargs
+        ).infer_joint_space(),
+        act_sampler=lambda: {
+            agent_key: int(env.action_space(agent_key).sample())
+            for agent_key in act_dims
+        },
+        device=device,
+    )
+
+
+def _trainer_fn(algo: str) -> callable:
+    from a3marl.trainer import cql_trainer, iql_group_trainer, iql_trainer
+
+    return {
+        "iql": iql_trainer,
+        "iql_group": iql_group_trainer,
+        "cql": cql_trainer,
+        "fcql": cql_trainer,
+    }[algo]
+
+
+def _trainer_kwargs(trainer_kwargs: dict[str, object]) -> dict[str, object]:
+    from a3marl.trainer import UtdScheduler
+
+    trainer_kwargs = dict(trainer_kwargs)
+    if isinstance(trainer_kwargs.get("utd"), dict):
+        trainer_kwargs["utd"] = UtdScheduler(**trainer_kwargs["utd"])
+    return trainer_kwargs
+
+
+def _run_metrics(summaries: list[dict[str, object]], last_k: int) -> dict:
+    returns = [summary["avg_return"] for summary in summaries]
+    final = summaries[-1] if summaries else {}
+    return {
+        "episodes": len(returns),
+        "final_return": returns[-1] if returns else float("nan"),
+        "best_return": max(returns) if returns else float("nan"),
+        f"mean_return_last{last_k}": (
+            float(np.mean(returns[-last_k:])) if returns else float("nan")
+        ),
+        "env_steps_per_s": final.get("env_steps_per_s", float("nan")),
+        "updates_per_s": final.get("updates_per_s", float("nan")),
+        "eval_overhead": final.get("eval_overhead", float("nan")),
+    }
+
+
+def run_trial(
+    spec: SweepSpec, trial: Trial, run_dir: str, last_k: int = 10
+) -> dict[str, object]:
+    """
+    One training run in run_dir (its working directory: the trainer's episode log,
+    plots and stdout.log land there). output: a results row
+    """
+    from a3marl.trainer import TrainerMetrics
+
+    env_kwargs, agent_kwargs, trainer_kwargs = split_params(trial.point)
+    env_config = EnvConfig(
+        name_abbr=spec.name,
+        env_creator=_resolve_creator(spec.env_creator),
+        env_kwargs={**spec.env_kwargs, **env_kwargs},
+    )
+    random.seed(trial.seed)
+    np.random.seed(trial.seed)
+    torch.manual_seed(trial.seed)
+
+    os.makedirs(run_dir, exist_ok=True)
+    cwd = os.getcwd()
+    start = time.perf_counter()
+    try:
+        os.chdir(run_dir)
+        with open("stdout.log", "w") as log, contextlib.redirect_stdout(log):
+            env = env_config.get_env(render_mode=None)
+            env.reset(seed=trial.seed)
+            env_spec = env_config.spec(env)
+            for agent_key in env_spec.agent_keys:
+                env.action_space(agent_key).seed(trial.seed)
+            agents = _build_agents(
+                spec.algo,
+                env,
+                env_spec,
+                {**spec.agent_kwargs, **agent_kwargs},
+                spec.device,
+            )
+            metrics = TrainerMetrics()
+            _trainer_fn(spec.algo)(
+                env,
+                env_config,
+                agents,
+                metrics=metrics,
+                **_trainer_kwargs({**spec.trainer_kwargs, **trainer_kwargs}),
+            )
+        row = {"status": "ok", **_run_metrics(metrics.summaries, last_k)}
+    except Exception:
+        row = {"status": "error", "error": traceback.format_exc(limit=5)}
+    finally:
+        os.chdir(cwd)
+    return {"wall_s": time.perf_counter() - start, **row}
+
+
+# cpu slots of the pool (worker processes), set by _init_worker
+_slots = None
+_threads_per_run: int = 1
+
+_THREAD_ENV_VARS: tuple[str, ...] = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+)
+
+
+@contextlib.contextmanager
+def _worker_thread_env(threads_per_run: int):
+    """
+    Thread limits in the environment pool workers are started with: the OpenMP /
+    MKL / OpenBLAS runtimes read them once, when numpy and torch are imported, so
+    setting them in the worker itself is too late. Forked workers keep the
+    runtimes of the parent instead, only their torch threads are limited.
+    """
+    saved = {var: os.environ.get(var) for var in _THREAD_ENV_VARS}
+    os.environ.update({var: str(threads_per_run) for var in _THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(slots, threads_per_run: int) -> None:
+    global _slots, _threads_per_run
+    _slots = slots
+    _threads_per_run = threads_per_run
+
+
+def _pool_run(
+    spec: SweepSpec, trial: Trial, run_dir: str, last_k: int
+) -> dict[str, object]:
+    # a free slot per running trial: pin to its cpus for the run
+    cpus = _slots.get()
+    try:
+        if cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(_threads_per_run)
+        return {
+            "cpus": " ".join(map(str, cpus)),
+            **run_trial(spec, trial, run_dir, last_k),
+        }
+    finally:
+        _slots.put(cpus)
+
+
+def _available_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _param_columns(point: dict[str, object]) -> dict[str, object]:
+    # lists (e.g. forager_levels) as json, so every column is a scalar
+    return {
+        name: json.dumps(value) if isinstance(value, (list, tuple, dict)) else value
+        for name, value in point.items()
+    }
+
+
+def run_sweep(
+    spec: SweepSpec,
+    out_dir: str = "./data/sweeps",
+    n_workers: int | None = None,
+    threads_per_run: int = 1,
+    pin_cpus: bool = True,
+    start_method: str = "spawn",
+    max_tasks_per_child: int | None = 1,
+    last_k: int = 10,
+) -> pd.DataFrame:
+    """
+    Run all trials of spec in a process pool, n_workers at a time (default: as many
+    as fit the available cpus with threads_per_run each). Each running trial is
+    pinned to its own threads_per_run cpus and limited to that many torch threads;
+    with max_tasks_per_child=1 every trial gets a fresh process.
+
+    Rows are appended to out_dir/<name>/results.jsonl as trials finish, the full
+    table (one row per trial: params, seed, metrics) goes to results.csv and is
+    returned. A failing trial is recorded with status "error", the sweep goes on.
+    """
+    trials = spec.trials()
+    sweep_dir = os.path.abspath(os.path.join(out_dir, spec.name))
+    cpus = _available_cpus()
+    n_workers = n_workers or max(len(cpus) // threads_per_run, 1)
+    n_workers = min(n_workers, len(trials))
+    pin_cpus = pin_cpus and n_workers * threads_per_run <= len(cpus)
+
+    ctx = mp.get_context(start_method)
+    slots = ctx.Queue()
+    for i in range(n_workers):
+        slots.put(
+            cpus[i * threads_per_run : (i + 1) * threads_per_run] if pin_cpus else []
+        )
+    # forked workers cannot be replaced per task, they run trials back to back
+    pool_kwargs = (
+        {"max_tasks_per_child": max_tasks_per_child}
+        if max_tasks_per_child is not None and start_method != "fork"
+        else {}
+    )
+
+    results_log = EpisodeLogWriter(
+        os.path.join(sweep_dir, RESULTS_LOG_FILE), flush_every=1, episode_key="run_id"
+    )
+    rows = []
+    # workers are (re)started while the pool runs, keep the limits set until the end
+    with _worker_thread_env(threads_per_run), ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(slots, threads_per_run),
+        **pool_kwargs,
+    ) as pool:
+        futures = {
+            pool.submit(
+                _pool_run,
+                spec,
+                trial,
+                os.path.join(sweep_dir, trial.run_id),
+                last_k,
+            ): trial
+            for trial in trials
+        }
+        for future in as_completed(futures):
+            trial = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process died
+                result = {"status": "error", "error": repr(e)}
+            row = {
+                "run_id": trial.run_id,
+                "seed": trial.seed,
+                **_param_columns(trial.point),
+                **result,
+            }
+            rows.append(row)
+            results_log.write(row)
+            print(
+                f"[{len(rows)}/{len(trials)}] {trial.run_id}: {row['status']}"
+                + (
+                    f", final return = {row['final_return']:.4f}"
+                    if row["status"] == "ok"
+                    else ""
+                )
+            )
+    results_log.close()
+
+    table = pd.DataFrame(rows).sort_values("run_id", ignore_index=True)
+    table.to_csv(os.path.join(sweep_dir, RESULTS_FILE), index=False)
+    return table
+
+
+def load_sweep_spec(path: str) -> SweepSpec:
+    """
+    A json spec of SweepSpec fields. Tied keys are written "key_a,key_b", random
+    distributions as {"loguniform": [low, high]}.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    for space in ("grid", "random"):
+        spec[space] = {
+            tuple(key.split(",")) if "," in key else key: value
+            for key, value in spec.get(space, {}).items()
+        }
+    return SweepSpec(**spec)
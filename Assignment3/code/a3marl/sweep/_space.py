@@ -0,0 +1,85 @@
+import itertools
+import math
+import random
+
+# a search space maps a dotted key ("env.n_crops", "agent.lr", "trainer.dqn_update_freq")
+# to its values; a tuple of keys ties parameters that change together, e.g.
+# ("env.n_foragers", "env.forager_levels"): [(3, [1, 2, 3]), (5, [1, 2, 2, 3, 3])]
+SearchSpace = dict[str | tuple[str, ...], object]
+
+PARAM_SCOPES: tuple[str, ...] = ("env", "agent", "trainer")
+
+
+def _check_keys(space: SearchSpace) -> None:
+    for key in space:
+        for name in key if isinstance(key, tuple) else (key,):
+            scope = name.split(".", 1)[0]
+            assert (
+                "." in name and scope in PARAM_SCOPES
+            ), f"sweep keys are <{'|'.join(PARAM_SCOPES)}>.<param>, got {name}"
+
+
+def _assign(point: dict[str, object], key: str | tuple[str, ...], value) -> None:
+    if isinstance(key, tuple):
+        assert len(key) == len(value), f"{key}: expected {len(key)} tied values"
+        point.update(zip(key, value))
+    else:
+        point[key] = value
+
+
+def grid_search(space: SearchSpace) -> list[dict[str, object]]:
+    """Every combination of the listed values, output: dotted key => value per point"""
+    _check_keys(space)
+    keys = list(space)
+    points = []
+    for values in itertools.product(*(space[key] for key in keys)):
+        point = {}
+        for key, value in zip(keys, values):
+            _assign(point, key, value)
+        points.append(point)
+    return points
+
+
+def _draw(rng: random.Random, dist) -> object:
+    # a list is a uniform choice, a tuple a distribution:
+    # ("uniform", low, high), ("loguniform", low, high), ("int", low, high) inclusive
+    # or the same as a dict {"loguniform": [low, high]} (json specs)
+    if isinstance(dist, list):
+        return rng.choice(dist)
+    if isinstance(dist, dict):
+        ((kind, (low, high)),) = dist.items()
+    else:
+        kind, low, high = dist
+    if kind == "uniform":
+        return rng.uniform(low, high)
+    if kind == "loguniform":
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    if kind == "int":
+        return rng.randint(low, high)
+    raise ValueError(f"unknown distribution {kind}")
+
+
+def random_search(
+    space: SearchSpace, n_points: int, seed: int = 0
+) -> list[dict[str, object]]:
+    """n_points independent draws, reproducible by seed"""
+    _check_keys(space)
+    rng = random.Random(seed)
+    points = []
+    for _ in range(n_points):
+        point = {}
+        for key, dist in space.items():
+            _assign(point, key, _draw(rng, dist))
+        points.append(point)
+    return points
+
+
+def split_params(
+    point: dict[str, object],
+) -> tuple[dict[str, object], dict[str, object], dict[str, object]]:
+    """output: env, agent and trainer kwargs of a point"""
+    scoped = {scope: {} for scope in PARAM_SCOPES}
+    for name, value in point.items():
+        scope, param = name.split(".", 1)
+        scoped[scope][param] = value
+    return scoped["env"], scoped["agent"], scoped["trainer"]
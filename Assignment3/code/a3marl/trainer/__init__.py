@@ -1,8 +1,47 @@
 from ._cql import trainer as cql_trainer
 from ._iql import trainer as iql_trainer
+from ._iql_group import trainer as iql_group_trainer
+from ._eval import (
+    EvalEngine,
+    EvalPolicy,
+    IqlEvalPolicy,
+    GroupEvalPolicy,
+    CqlEvalPolicy,
+    get_eval_engine,
+    close_eval_engines,
+)
+from ._target import (
+    TargetUpdate,
+    HardTargetUpdate,
+    SoftTargetUpdate,
+    EvalGatedTargetUpdate,
+)
+from ._utils import TrainerMetrics, Checkpointer, load_checkpoint, UtdScheduler
+from ._async import (
+    cql_trainer as async_cql_trainer,
+    iql_trainer as async_iql_trainer,
+)
 
 __version__ = "0.1.0"
 __all__ = [
     "cql_trainer",
     "iql_trainer",
+    "iql_group_trainer",
+    "async_cql_trainer",
+    "async_iql_trainer",
+    "EvalEngine",
+    "EvalPolicy",
+    "IqlEvalPolicy",
+    "GroupEvalPolicy",
+    "CqlEvalPolicy",
+    "get_eval_engine",
+    "close_eval_engines",
+    "TargetUpdate",
+    "HardTargetUpdate",
+    "SoftTargetUpdate",
+    "EvalGatedTargetUpdate",
+    "TrainerMetrics",
+    "Checkpointer",
+    "load_checkpoint",
+    "UtdScheduler",
 ]
@@ -0,0 +1,460 @@
+import copy
+import queue
+import random
+import time
+from itertools import count
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from torch import nn
+
+from a3marl.agents import BaseAgent, CqlAgent, IqlAgent
+from a3marl.envs.utils import EnvConfig
+from . import _cql, _iql
+from ._eval import EvalEngine
+from ._utils import (
+    SharedTransitionRing,
+    RingFields,
+    get_agent_wise_cumulative_rewards,
+)
+
+from a3marl.utils import (
+    plot_episodes,
+    episode_log_path,
+    EpisodeLogWriter,
+)
+
+
+class _WeightBoard:
+    """Policy weights published by the learner, read by actors (shared memory)"""
+
+    def __init__(self, agents: dict[str, BaseAgent], mp_context) -> None:
+        self.nets: dict[str, nn.Module] = {
+            sid: copy.deepcopy(agent.policy_net).cpu().share_memory()
+            for sid, agent in agents.items()
+        }
+        self.version = mp_context.Value("q", 0)
+
+    def publish(self, agents: dict[str, BaseAgent]) -> None:
+        with self.version.get_lock():
+            for sid, agent in agents.items():
+                self.nets[sid].load_state_dict(agent.policy_net.state_dict())
+            self.version.value += 1
+
+    def pull(self, local_nets: dict[str, nn.Module], local_version: int) -> int:
+        """Copy the published weights if newer, returns the local version"""
+        if self.version.value == local_version:
+            return local_version
+        with self.version.get_lock():
+            for sid, net in local_nets.items():
+                net.load_state_dict(self.nets[sid].state_dict())
+            return self.version.value
+
+
+def _ring_fields(agent: BaseAgent) -> RingFields:
+    memory = agent.replay_memory
+    return {
+        "state": ((agent.config.obs_dim,), torch.float32),
+        "action": ((memory.actions.shape[1],), torch.long),
+        "next_state": ((agent.config.obs_dim,), torch.float32),
+        "reward": ((memory.rewards.shape[1],), torch.float32),
+        "done": ((memory.dones.shape[1],), torch.bool),
+    }
+
+
+def _prepare_actor(
+    seed: int, agents: dict[str, BaseAgent], board: _WeightBoard
+) -> dict[str, nn.Module]:
+    # runs in the forked actor: private CPU policy copies, own random streams
+    torch.set_num_threads(1)
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    local_nets = {}
+    for sid, agent in agents.items():
+        agent.policy_net = copy.deepcopy(board.nets[sid])
+        agent.device = torch.device("cpu")
+        local_nets[sid] = agent.policy_net
+    return local_nets
+
+
+def _iql_actor(
+    seed: int,
+    env_config: EnvConfig,
+    cur_agents: dict[str, IqlAgent],
+    board: _WeightBoard,
+    rings: dict[str, SharedTransitionRing],
+    episode_queue,
+    stop_event,
+    max_episode_lengths: int,
+) -> None:
+    local_nets = _prepare_actor(seed, cur_agents, board)
+    env = env_config.get_env(render_mode=None)
+    for agent_key, cur_agent in cur_agents.items():
+        env.action_space(agent_key).seed(seed)
+        cur_agent.act_sampler = env.action_space(agent_key).sample
+    version = -1
+    while not stop_event.is_set():
+        states, infos = env.reset()
+        dones = {agent_key: False for agent_key in cur_agents.keys()}
+        states = {
+            agent_key: torch.tensor(state, dtype=torch.float32).reshape(1, -1)
+            for agent_key, state in states.items()
+        }
+        for t in count():
+            version = board.pull(local_nets, version)
+            actions = {}
+            for cur_agent in cur_agents.values():
+                if dones[cur_agent.sid]:
+                    continue
+                actions[cur_agent.sid] = cur_agent.select_action(states[cur_agent.sid])
+            observations, rewards, terminations, truncations, infos = env.step(
+                {agent_key: action.item() for agent_key, action in actions.items()}
+            )
+            dones = {
+                agent_key: (terminated or truncations[agent_key])
+                for agent_key, terminated in terminations.items()
+            }
+            if all(dones.values()) or (t >= max_episode_lengths - 1):
+                break
+            # same transitions as the IQL trainer memorizes
+            for agent_key, action in actions.items():
+                next_state = (
+                    None
+                    if terminations[agent_key]
+                    else torch.tensor(
+                        observations[agent_key], dtype=torch.float32
+                    ).reshape(1, -1)
+                )
+                rings[agent_key].put(
+                    {
+                        "state": states[agent_key],
+                        "action": action,
+                        "next_state": (
+                            torch.zeros_like(states[agent_key])
+                            if next_state is None
+                            else next_state
+                        ),
+                        "reward": rewards[agent_key],
+                        "done": next_state is None,
+                    },
+                    stop_event,
+                )
+                states[agent_key] = next_state
+            for cur_agent in cur_agents.values():
+                cur_agent.update_eps()
+        episode_queue.put(t + 1)
+    env.close()
+
+
+def _cql_actor(
+    seed: int,
+    env_config: EnvConfig,
+    agents: dict[str, CqlAgent],
+    board: _WeightBoard,
+    rings: dict[str, SharedTransitionRing],
+    episode_queue,
+    stop_event,
+    max_episode_lengths: int,
+) -> None:
+    local_nets = _prepare_actor(seed, agents, board)
+    central_agent = next(iter(agents.values()))
+    ring = rings[central_agent.sid]
+    env = env_config.get_env(render_mode=None)
+    for agent_key in central_agent.agent_keys():
+        env.action_space(agent_key).seed(seed)
+
+    def group_sample() -> dict[str, int]:
+        return {
+            agent_key: int(env.action_space(agent_key).sample())
+            for agent_key in central_agent.agent_keys()
+        }
+
+    central_agent.act_sampler = group_sample
+    version = -1
+    while not stop_event.is_set():
+        states, infos = env.reset()
+        dones = {agent_key: False for agent_key in central_agent.agent_keys()}
+        states = central_agent.get_masked_joint_obs(
+            observations=states, done_agents=dones
+        )  # 1 x (n_agents*obs_dim)
+        for t in count():
+            version = board.pull(local_nets, version)
+            actions = central_agent.select_action(states, done_agents=dones)
+            observations, rewards, terminations, truncations, infos = env.step(actions)
+            dones = {
+                agent_key: (terminated or truncations[agent_key])
+                for agent_key, terminated in terminations.items()
+            }
+            done = all(dones.values()) or (t >= max_episode_lengths - 1)
+            aggr_reward = sum(
+                [reward for reward in rewards.values() if reward is not None]
+            )
+            # same transitions as the CQL trainer memorizes
+            if all(terminations.values()):
+                next_states = None
+            else:
+                next_states = central_agent.get_masked_joint_obs(
+                    observations=observations, done_agents=dones
+                )
+            ring.put(
+                {
+                    "state": states,
+                    "action": central_agent.actions_to_row(actions, dones),
+                    "next_state": (
+                        torch.zeros_like(states) if next_states is None else next_states
+                    ),
+                    "reward": aggr_reward,
+                    "done": next_states is None,
+                },
+                stop_event,
+            )
+            states = next_states
+            central_agent.update_eps()
+            if done:
+                break
+        episode_queue.put(t + 1)
+    env.close()
+
+
+def _actor_learner_loop(
+    env_config: EnvConfig,
+    agents: dict[str, BaseAgent],
+    actor_fn: callable,
+    update_target_fn: callable,
+    eval_fn: callable,
+    csv_name: str,
+    num_episodes: int,
+    max_episode_lengths: int,
+    dqn_update_freq: int,
+    n_actors: int,
+    weight_sync_interval: int,
+    ring_capacity: int,
+    seed: int,
+    show_plot: bool,
+) -> None:
+    for agent in agents.values():
+        assert agent.device.type == "cpu", "actor processes are forked, use CPU agents"
+    ctx = mp.get_context("fork")
+    board = _WeightBoard(agents, ctx)
+    rings = [
+        {
+            sid: SharedTransitionRing(ring_capacity, _ring_fields(agent), ctx)
+            for sid, agent in agents.items()
+        }
+        for _ in range(n_actors)
+    ]
+    episode_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    actors = [
+        ctx.Process(
+            target=actor_fn,
+            args=(
+                seed + i,
+                env_config,
+                agents,
+                board,
+                rings[i],
+                episode_queue,
+                stop_event,
+                max_episode_lengths,
+            ),
+            daemon=True,
+        )
+        for i in range(n_actors)
+    ]
+    for actor in actors:
+        actor.start()
+
+    n_updates: int = 0
+    best_mean: float = float("-inf")
+    episode_means: list[float] = []
+    episode_log = EpisodeLogWriter(episode_log_path(csv_name))
+    start_time = time.perf_counter()
+    try:
+        while len(episode_means) < num_episodes:
+            # actors only stop on stop_event, a dead one would stall or skew training
+            for i, actor in enumerate(actors):
+                if not actor.is_alive():
+                    raise RuntimeError(
+                        f"actor {i} died with exit code {actor.exitcode}"
+                    )
+            # collect everything the actors produced so far
+            for actor_rings in rings:
+                for sid, ring in actor_rings.items():
+                    rows = ring.drain()
+                    if rows is not None:
+                        agents[sid].replay_memory.extend(
+                            rows["state"],
+                            rows["action"],
+                            rows["next_state"],
+                            rows["reward"],
+                            rows["done"],
+                        )
+            # learn continuously
+            trained = False
+            for agent in agents.values():
+                if len(agent.replay_memory) >= agent.config.batch_size:
+                    agent.train()
+                    trained = True
+            if trained:
+                n_updates += 1
+                if n_updates % weight_sync_interval == 0:
+                    board.publish(agents)
+                if n_updates % dqn_update_freq == 0:
+                    best_mean = update_target_fn(best_mean)
+            else:
+                time.sleep(1e-3)
+            # evaluate after every finished actor episode, as the serial trainers
+            try:
+                episode_queue.get_nowait()
+            except queue.Empty:
+                continue
+            best_mean = update_target_fn(best_mean)
+            cur_policy_agent_wise_mean = get_agent_wise_cumulative_rewards(eval_fn())
+            cur_policy_mean = sum(cur_policy_agent_wise_mean.values()) / len(
+                cur_policy_agent_wise_mean
+            )
+            episode = len(episode_means)
+            episode_means.append(cur_policy_mean)
+            episode_log.write(
+                {
+                    "Episode": episode,
+                    "Mean Return": cur_policy_mean,
+                    **{
+                        f"return/{key}": value
+                        for key, value in cur_policy_agent_wise_mean.items()
+                    },
+                    **{
+                        f"loss/{sid}": agent.pop_mean_loss()
+                        for sid, agent in agents.items()
+                    },
+                    "n_updates": n_updates,
+                    "wall_s": time.perf_counter() - start_time,
+                }
+            )
+            if episode % 10 == 0 or episode == num_episodes - 1:
+                print(
+                    f"Episode {episode}: Avg return = {cur_policy_mean:.4f}; "
+                    f"updates = {n_updates}"
+                )
+            if show_plot:
+                plot_episodes(episode_means)
+    finally:
+        episode_log.close()
+        stop_event.set()
+        for actor in actors:
+            actor.join(timeout=10)
+            if actor.is_alive():
+                actor.terminate()
+
+
+def iql_trainer(
+    env_config: EnvConfig,
+    cur_agents: dict[str, IqlAgent],
+    num_episodes: int = 100,
+    max_episode_lengths: int = 100,
+    dqn_update_freq: int = 25,
+    n_actors: int = 2,
+    weight_sync_interval: int = 50,
+    ring_capacity: int = 4096,
+    seed: int = 0,
+    show_plot: bool = False,
+) -> None:
+    """
+    IQL trainer with n_actors env-stepping processes and a learner in this process.
+    Actors feed shared-memory rings, the learner trains continuously and publishes
+    policy weights every weight_sync_interval updates.
+    dqn_update_freq counts learner updates here instead of env steps.
+    """
+
+    engine = EvalEngine(env_config)
+
+    def update_target_fn(best_mean: float) -> float:
+        return _iql.update_agent_dqns(env_config, cur_agents, best_mean, engine=engine)
+
+    def eval_fn() -> dict[str, list[float]]:
+        with torch.no_grad():
+            return _iql.eval_agent(
+                env_config=env_config,
+                dqn_agents=cur_agents,
+                dqns={
+                    cur_agent.sid: cur_agent.policy_net
+                    for cur_agent in cur_agents.values()
+                },
+                n_episodes=10,
+                engine=engine,
+            )
+
+    try:
+        _actor_learner_loop(
+            env_config=env_config,
+            agents=cur_agents,
+            actor_fn=_iql_actor,
+            update_target_fn=update_target_fn,
+            eval_fn=eval_fn,
+            csv_name=f"{env_config.name_abbr}_iql",
+            num_episodes=num_episodes,
+            max_episode_lengths=max_episode_lengths,
+            dqn_update_freq=dqn_update_freq,
+            n_actors=n_actors,
+            weight_sync_interval=weight_sync_interval,
+            ring_capacity=ring_capacity,
+            seed=seed,
+            show_plot=show_plot,
+        )
+    finally:
+        engine.close()
+
+
+def cql_trainer(
+    env_config: EnvConfig,
+    central_agent: CqlAgent,
+    num_episodes: int = 100,
+    max_episode_lengths: int = 50,
+    dqn_update_freq: int = 50,
+    n_actors: int = 2,
+    weight_sync_interval: int = 50,
+    ring_capacity: int = 4096,
+    seed: int = 0,
+    show_plot: bool = False,
+) -> None:
+    """CQL counterpart of the actor-learner iql_trainer"""
+
+    engine = EvalEngine(env_config)
+
+    def update_target_fn(best_mean: float) -> float:
+        return _cql.update_agent_dqns(
+            env_config, central_agent, best_mean, engine=engine
+        )
+
+    def eval_fn() -> dict[str, list[float]]:
+        with torch.no_grad():
+            return _cql.eval_agent(
+                env_config=env_config,
+                cql_agent=central_agent,
+                dqn=central_agent.policy_net,
+                n_episodes=10,
+                engine=engine,
+            )
+
+    try:
+        _actor_learner_loop(
+            env_config=env_config,
+            agents={central_agent.sid: central_agent},
+            actor_fn=_cql_actor,
+            update_target_fn=update_target_fn,
+            eval_fn=eval_fn,
+            csv_name=f"{env_config.name_abbr}_cql",
+            num_episodes=num_episodes,
+            max_episode_lengths=max_episode_lengths,
+            dqn_update_freq=dqn_update_freq,
+            n_actors=n_actors,
+            weight_sync_interval=weight_sync_interval,
+            ring_capacity=ring_capacity,
+            seed=seed,
+            show_plot=show_plot,
+        )
+    finally:
+        engine.close()
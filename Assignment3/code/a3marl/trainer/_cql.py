@@ -1,3 +1,4 @@
+import time
 from itertools import count
 
 import torch
@@ -6,30 +7,49 @@ from pettingzoo import ParallelEnv
 
 from a3marl.agents import CqlAgent, DQN
 from a3marl.envs.utils import EnvConfig
-from ._utils import get_agent_wise_cumulative_rewards
+from ._eval import CqlEvalPolicy, EvalEngine, get_eval_engine
+from ._target import TargetUpdate, EvalGatedTargetUpdate
+from ._utils import (
+    get_agent_wise_cumulative_rewards,
+    TrainerMetrics,
+    NULL_METRICS,
+    Checkpointer,
+    load_checkpoint,
+    UtdScheduler,
+)
 
 from a3marl.utils import (
     plot_episodes,
-    save_episode_ret_to_csv,
+    episode_log_path,
+    EpisodeLogWriter,
 )
 
 
 def update_agent_dqns(
-    env_config: EnvConfig, central_agent: CqlAgent, best_mean: float
+    env_config: EnvConfig,
+    central_agent: CqlAgent,
+    best_mean: float,
+    metrics: TrainerMetrics = NULL_METRICS,
+    engine: EvalEngine | None = None,
 ) -> float:
+    t0 = metrics.tic()
     with torch.no_grad():
         cur_eval_res = eval_agent(
             env_config=env_config,
             cql_agent=central_agent,
             dqn=central_agent.policy_net,
             n_episodes=10,
+            engine=engine,
         )
+    metrics.toc("eval", t0)
     avg_eval_res = get_agent_wise_cumulative_rewards(cur_eval_res)
     all_avg_eval_res = sum(avg_eval_res.values()) / len(avg_eval_res)
     if all_avg_eval_res > best_mean:
         print(f"{all_avg_eval_res:.4f} vs. best: {best_mean:.4f}, update TarNet")
         best_mean = all_avg_eval_res
+        t0 = metrics.tic()
         central_agent.update_target_network()
+        metrics.toc("target_sync", t0)
 
     return best_mean
 
@@ -40,51 +60,13 @@ def eval_agent(
     dqn: DQN,
     n_episodes: int = 1,
     max_cycles: int = 50,
+    engine: EvalEngine | None = None,
 ) -> dict[str, list[float]]:
-    cumulative_rewards = dict([(agent_key, []) for agent_key in cql_agent.agent_keys()])
-    for _ in range(n_episodes):
-        eval_env = env_config.get_env(
-            max_cycles=max_cycles,
-            render_mode=None,
-        )
-        states, info = eval_env.reset()
-        dones = {agent_key: False for agent_key in cql_agent.agent_keys()}
-        states = cql_agent.get_masked_joint_obs(
-            observations=states, done_agents=dones
-        )  # 1 x (n_agents*obs_dim)
-        rewards = {agent_key: 0.0 for agent_key in cql_agent.agent_keys()}
-        cur_cumulative_rewards = {
-            agent_key: 0.0 for agent_key in cql_agent.agent_keys()
-        }
-        for t in count():
-            actions = cql_agent.select_action_greedy(
-                states, dqn, done_agents=dones
-            )  # agent_key => int | None
-            observations, rewards, terminations, truncations, infos = eval_env.step(
-                actions
-            )
-            # update rewards
-            for agent_key in cql_agent.agent_keys():
-                if dones[agent_key]:
-                    continue
-                cur_cumulative_rewards[agent_key] += rewards[agent_key]
-            dones = {
-                agent_key: (terminated or truncations[agent_key])
-                for agent_key, terminated in terminations.items()
-            }
-            done = all(dones.values())
-            if done:
-                eval_env.close()
-                break
-            else:
-                next_states = cql_agent.get_masked_joint_obs(
-                    observations=observations, done_agents=dones
-                )  # 1 x (n_agents*obs_dim)
-            states = next_states
-        # append the cumulative rewards for this round
-        for agent_key in cql_agent.agent_keys():
-            cumulative_rewards[agent_key].append(cur_cumulative_rewards[agent_key])
-    return cumulative_rewards
+    # episodes run in lockstep on the persistent envs of engine, by default the
+    # shared engine of the config
+    return (engine or get_eval_engine(env_config, max_cycles)).evaluate(
+        CqlEvalPolicy(cql_agent, dqn), n_episodes
+    )
 
 
 def trainer(
@@ -95,31 +77,77 @@ def trainer(
     max_episode_lengths: int = 50,
     dqn_update_freq: int = 50,
     show_plot: bool = False,
+    metrics: TrainerMetrics | None = None,
+    checkpointer: Checkpointer | None = None,
+    resume_from: str | None = None,
+    utd: UtdScheduler | None = None,
+    target_update: TargetUpdate | None = None,
+    eval_engine: EvalEngine | None = None,
 ) -> None:
+    """
+    target_update: when the target networks follow the policy networks, by default
+        an evaluation-gated copy every dqn_update_freq steps and after each episode
+    eval_engine: runs the evaluations (e.g. with n_workers), by default an engine of
+        the trainer's own, closed at the end
+    """
+    metrics = metrics or NULL_METRICS
+    utd = utd or UtdScheduler()
+    engine = eval_engine or EvalEngine(env_config)
+    target_update = (target_update or EvalGatedTargetUpdate(dqn_update_freq)).bind(
+        {central_agent.sid: central_agent},
+        env_config,
+        lambda nets: CqlEvalPolicy(central_agent, nets[central_agent.sid]),
+        metrics,
+        engine,
+    )
     total_steps: int = 0
-    best_mean: float = float("-inf")
     episode_means: list[float] = []
     episode_avg_returns_per_agent: dict[str, list[float]] = {
         agent_key: [] for agent_key in central_agent.agent_keys()
     }
     device = central_agent.device
-    for episode in range(num_episodes):
+    start_episode: int = 0
+    if resume_from is not None:
+        resumed = load_checkpoint(
+            resume_from, {central_agent.sid: central_agent}, env=env
+        )
+        start_episode = resumed["episode"] + 1
+        total_steps = resumed["total_steps"]
+        target_update.best_mean = resumed["best_mean"]
+        episode_means = resumed["episode_means"]
+        episode_avg_returns_per_agent = resumed["episode_avg_returns_per_agent"]
+        print(f"Resumed after episode {resumed['episode']} from {resume_from}")
+    episode_log = EpisodeLogWriter(
+        episode_log_path(f"{env_config.name_abbr}_cql"),
+        resume_after=start_episode - 1 if resume_from is not None else None,
+    )
+    start_time = time.perf_counter()
+    for episode in range(start_episode, num_episodes):
         # re-initialize the environment
+        t0 = metrics.tic()
         states, infos = env.reset()
+        metrics.toc("env.reset", t0)
         dones: dict[str, bool] = {
             agent_key: False for agent_key in central_agent.agent_keys()
         }
+        t0 = metrics.tic()
         states = central_agent.get_masked_joint_obs(
             observations=states, done_agents=dones
         )  # 1 x (n_agents*obs_dim)
+        metrics.toc("obs_to_tensor", t0)
         if episode > 0:
             for t in count():
+                t0 = metrics.tic()
                 actions = central_agent.select_action(
                     states, done_agents=dones
                 )  # agent_key => int | None
+                metrics.toc("act", t0)
+                t0 = metrics.tic()
                 observations, rewards, terminations, truncations, infos = env.step(
                     actions
                 )
+                metrics.toc("env.step", t0)
+                metrics.count("env_steps")
                 dones = {
                     agent_key: (terminated or truncations[agent_key])
                     for agent_key, terminated in terminations.items()
@@ -131,24 +159,29 @@ def trainer(
                 )
                 aggr_reward_t = torch.tensor([[aggr_reward]], device=device)  # 1 x 1
                 # update memory per agent
+                t0 = metrics.tic()
                 if all(terminations.values()):
                     next_states = None
                 else:
                     next_states = central_agent.get_masked_joint_obs(
                         observations=observations, done_agents=dones
                     )
-                central_agent.memorize(states, actions, next_states, aggr_reward_t)
+                metrics.toc("obs_to_tensor", t0)
+                t0 = metrics.tic()
+                central_agent.memorize(
+                    states, actions, next_states, aggr_reward_t, next_dones=dones
+                )
+                metrics.toc("memorize", t0)
                 # enter next state
                 states = next_states
                 # optimize model
-                central_agent.train()
-                # update target dqn if better results
-                if total_steps % dqn_update_freq == 0:
-                    best_mean = update_agent_dqns(
-                        env_config=env_config,
-                        central_agent=central_agent,
-                        best_mean=best_mean,
-                    )
+                t0 = metrics.tic()
+                metrics.count(
+                    "updates", central_agent.train(utd.n_updates(total_steps))
+                )
+                metrics.toc("train", t0)
+                # update target dqn
+                target_update.on_step(total_steps)
                 # update eps
                 central_agent.update_eps()
                 # increase total number of experienced steps
@@ -157,19 +190,18 @@ def trainer(
                 if done:
                     break
             # post update target network
-            best_mean = update_agent_dqns(
-                env_config=env_config,
-                central_agent=central_agent,
-                best_mean=best_mean,
-            )
+            target_update.on_episode_end()
         # evaluate how well the current policy_net is after this episode
+        t0 = metrics.tic()
         with torch.no_grad():
             cur_policy_eval_res = eval_agent(
                 env_config=env_config,
                 cql_agent=central_agent,
                 dqn=central_agent.policy_net,
                 n_episodes=10,
+                engine=engine,
             )
+        metrics.toc("eval", t0)
         cur_policy_agent_wise_mean = get_agent_wise_cumulative_rewards(
             cur_policy_eval_res
         )
@@ -180,9 +212,53 @@ def trainer(
             episode_avg_returns_per_agent[agent_key].append(
                 cur_policy_agent_wise_mean[agent_key]
             )
+        metrics.gauge(
+            "replay_fill",
+            len(central_agent.replay_memory) / central_agent.replay_memory.capacity,
+        )
+        metrics.gauge("eps", central_agent.eps)
         episode_means.append(cur_policy_mean)
+        episode_log.write(
+            {
+                "Episode": episode,
+                "Mean Return": cur_policy_mean,
+                **{
+                    f"return/{agent_key}": cur_policy_agent_wise_mean[agent_key]
+                    for agent_key in central_agent.agent_keys()
+                },
+                "eps": central_agent.eps,
+                "loss": central_agent.pop_mean_loss(),
+                "total_steps": total_steps,
+                "wall_s": time.perf_counter() - start_time,
+            }
+        )
+        metrics.on_episode_end(episode, avg_return=cur_policy_mean)
+        if checkpointer is not None:
+            t0 = metrics.tic()
+            saved = checkpointer.maybe_save(
+                episode,
+                {central_agent.sid: central_agent},
+                dict(
+                    total_steps=total_steps,
+                    best_mean=target_update.best_mean,
+                    episode_means=episode_means,
+                    episode_avg_returns_per_agent=episode_avg_returns_per_agent,
+                ),
+                last=episode == num_episodes - 1,
+                env=env,
+            )
+            if saved:
+                # the log covers every episode of the checkpoint
+                episode_log.flush()
+            metrics.toc("checkpoint", t0)
         if episode % 10 == 0 or episode == num_episodes - 1:
             print(f"Episode {episode}: Avg return = {cur_policy_mean:.4f};")
-            save_episode_ret_to_csv(episode_means, f"{env_config.name_abbr}_cql")
         if show_plot:
             plot_episodes(episode_means)
+    target_update.close()
+    if eval_engine is None:
+        engine.close()
+    episode_log.close()
+    if checkpointer is not None:
+        checkpointer.close()
+    metrics.close()
@@ -0,0 +1,308 @@
+import atexit
+import copy
+import math
+import multiprocessing as mp
+from abc import ABC, abstractmethod
+
+import numpy as np
+import torch
+from torch import nn
+
+from a3marl.agents import (
+    CqlAgent,
+    DQN,
+    FactoredCqlAgent,
+    GroupDQN,
+    IqlAgent,
+    IqlAgentGroup,
+)
+from a3marl.envs.utils import EnvConfig
+from a3marl.utils import EpisodeRecorder
+
+
+class EvalPolicy(ABC):
+    """
+    Greedy policy over a batch of episodes, holds only networks and metadata so it
+    can be shipped to evaluation workers.
+    """
+
+    def __init__(self, agent_keys: list[str], nets: dict[str, nn.Module]) -> None:
+        self.agent_keys: list[str] = list(agent_keys)
+        self.nets: dict[str, nn.Module] = nets
+
+    @property
+    def device(self) -> torch.device:
+        return next(next(iter(self.nets.values())).parameters()).device
+
+    def cpu(self) -> "EvalPolicy":
+        """A copy with networks on the cpu"""
+        policy = copy.copy(self)
+        policy.nets = {
+            name: copy.deepcopy(net).cpu() for name, net in self.nets.items()
+        }
+        return policy
+
+    @abstractmethod
+    def act(self, obs: dict[str, torch.Tensor]) -> torch.Tensor:
+        """
+        input: agent_key => E x obs_dim (zeros for done agents)
+        output shape: E x n_agents
+        """
+        pass
+
+
+class IqlEvalPolicy(EvalPolicy):
+    def __init__(self, dqn_agents: dict[str, IqlAgent], dqns: dict[str, DQN]) -> None:
+        agent_keys = [dqn_agent.sid for dqn_agent in dqn_agents.values()]
+        super().__init__(agent_keys, {key: dqns[key] for key in agent_keys})
+
+    def act(self, obs: dict[str, torch.Tensor]) -> torch.Tensor:
+        return torch.stack(
+            [self.nets[key](obs[key]).argmax(dim=1) for key in self.agent_keys], dim=1
+        )
+
+
+class GroupEvalPolicy(EvalPolicy):
+    def __init__(self, agent_group: IqlAgentGroup, dqn: GroupDQN) -> None:
+        super().__init__(agent_group.agent_keys(), {"group": dqn})
+
+    def act(self, obs: dict[str, torch.Tensor]) -> torch.Tensor:
+        states = torch.stack([obs[key] for key in self.agent_keys])  # n x E x obs
+        return self.nets["group"](states).argmax(dim=2).T
+
+
+class CqlEvalPolicy(EvalPolicy):
+    def __init__(self, cql_agent: CqlAgent, dqn: nn.Module) -> None:
+        super().__init__(cql_agent.agent_keys(), {"joint": dqn})
+        act_dims = list(cql_agent.config.act_dims.values())
+        self.act_strides: list[int] = [
+            math.prod(act_dims[i + 1 :]) for i in range(len(act_dims))
+        ]
+        self.act_dims: list[int] = act_dims
+        self.factored: bool = isinstance(cql_agent, FactoredCqlAgent)
+
+    def act(self, obs: dict[str, torch.Tensor]) -> torch.Tensor:
+        joint_obs = torch.cat([obs[key] for key in self.agent_keys], dim=1)
+        net = self.nets["joint"]
+        if self.factored:
+            return net.agent_q_values(joint_obs).argmax(dim=2).T
+        joint_actions = net(joint_obs).argmax(dim=1, keepdim=True)  # E x 1
+        strides = torch.tensor(self.act_strides, device=joint_obs.device)
+        dims = torch.tensor(self.act_dims, device=joint_obs.device)
+        return (joint_actions // strides) % dims
+
+
+class EvalEngine:
+    """
+    Evaluates greedy policies on persistent envs from the config's EnvPool, reused
+    by reset and released back to the pool on close.
+    All episodes run in lockstep with one batched forward per step; with
+    n_workers > 0, episodes are split over a pool of forked cpu workers.
+    """
+
+    def __init__(
+        self, env_config: EnvConfig, max_cycles: int = 50, n_workers: int = 0
+    ) -> None:
+        self.env_config: EnvConfig = env_config
+        self.max_cycles: int = max_cycles
+        self.n_workers: int = n_workers
+        self.envs: list = []
+        # rgb_array envs, only built when recording
+        self.record_envs: list = []
+        self._pool = None
+
+    def _get_envs(self, n_envs: int) -> list:
+        while len(self.envs) < n_envs:
+            self.envs.append(
+                self.env_config.pool.acquire(
+                    max_cycles=self.max_cycles, render_mode=None
+                )
+            )
+        return self.envs[:n_envs]
+
+    def evaluate(
+        self, policy: EvalPolicy, n_episodes: int = 10, seed: int | None = None
+    ) -> dict[str, list[float]]:
+        """
+        seed: reset every env with its own seed spawned from it (with n_workers, every
+            worker task), else the envs go on with their current random state
+        output: agent_key => cumulative reward of each episode
+        """
+        if self.n_workers > 0 and n_episodes > 1:
+            return self._evaluate_in_pool(policy, n_episodes, seed)
+        with torch.no_grad():
+            return self._run_lockstep(policy, self._get_envs(n_episodes), seed=seed)
+
+    def record(
+        self, policy: EvalPolicy, recorder: EpisodeRecorder, n_episodes: int = 1
+    ) -> dict[str, list[float]]:
+        """
+        Evaluate in-process on rgb_array envs, every frame goes to the recorder
+        (one recorder episode per env). Call `recorder.save()` to write them.
+        """
+        while len(self.record_envs) < n_episodes:
+            self.record_envs.append(
+                self.env_config.pool.acquire(
+                    max_cycles=self.max_cycles, render_mode="rgb_array"
+                )
+            )
+        with torch.no_grad():
+            return self._run_lockstep(policy, self.record_envs[:n_episodes], recorder)
+
+    def _run_lockstep(
+        self,
+        policy: EvalPolicy,
+        envs: list,
+        recorder: EpisodeRecorder | None = None,
+        seed: int | None = None,
+    ) -> dict[str, list[float]]:
+        agent_keys = policy.agent_keys
+        device = policy.device
+        n_episodes = len(envs)
+
+        if seed is None:
+            observations = [env.reset()[0] for env in envs]
+        else:
+            env_seeds = np.random.SeedSequence(seed).generate_state(n_episodes)
+            observations = [
+                env.reset(seed=int(env_seed))[0]
+                for env, env_seed in zip(envs, env_seeds)
+            ]
+        if recorder is not None:
+            for env_idx, env in enumerate(envs):
+                recorder.add_frame(env.render(), env_idx)
+        obs_dims = {
+            key: int(np.prod(np.shape(observations[0][key]))) for key in agent_keys
+        }
+        dones = [{key: False for key in agent_keys} for _ in envs]
+        returns = np.zeros((n_episodes, len(agent_keys)))
+        active = list(range(n_episodes))
+        while active:
+            # E x obs_dim per agent, zeros for done agents
+            obs = {}
+            for key in agent_keys:
+                batch = np.zeros((len(active), obs_dims[key]), dtype=np.float32)
+                for row, env_idx in enumerate(active):
+                    if not dones[env_idx][key] and key in observations[env_idx]:
+                        batch[row] = np.asarray(observations[env_idx][key]).reshape(-1)
+                obs[key] = torch.from_numpy(batch).to(device)
+            actions = policy.act(obs).tolist()  # E x n_agents
+
+            for row, env_idx in enumerate(active):
+                env_dones = dones[env_idx]
+                observations[env_idx], rewards, terminations, truncations, _ = envs[
+                    env_idx
+                ].step(
+                    {
+                        key: action
+                        for key, action in zip(agent_keys, actions[row])
+                        if not env_dones[key]
+                    }
+                )
+                for i, key in enumerate(agent_keys):
+                    if not env_dones[key]:
+                        returns[env_idx, i] += rewards[key]
+                dones[env_idx] = {
+                    key: (terminated or truncations[key])
+                    for key, terminated in terminations.items()
+                }
+                if recorder is not None:
+                    recorder.add_frame(envs[env_idx].render(), env_idx)
+                    if all(dones[env_idx].values()):
+                        recorder.end_episode(env_idx)
+            active = [env_idx for env_idx in active if not all(dones[env_idx].values())]
+        return {key: returns[:, i].tolist() for i, key in enumerate(agent_keys)}
+
+    def _evaluate_in_pool(
+        self, policy: EvalPolicy, n_episodes: int, seed: int | None = None
+    ) -> dict[str, list[float]]:
+        if self._pool is None:
+            self._pool = mp.get_context("fork").Pool(
+                self.n_workers,
+                initializer=_init_worker,
+                initargs=(self.env_config, self.max_cycles),
+            )
+        n_workers = min(self.n_workers, n_episodes)
+        splits = [
+            n_episodes // n_workers + (i < n_episodes % n_workers)
+            for i in range(n_workers)
+        ]
+        # forked workers share the parent's random state, each task gets its own
+        # seed: spawned from seed, else drawn from the parent's global state (so
+        # runs stay reproducible)
+        if seed is None:
+            task_seeds = np.random.randint(2**31, size=n_workers).tolist()
+        else:
+            task_seeds = [
+                int(task_seed.generate_state(1)[0])
+                for task_seed in np.random.SeedSequence(seed).spawn(n_workers)
+            ]
+        cpu_policy = policy.cpu()
+        cumulative_rewards = {key: [] for key in policy.agent_keys}
+        for worker_res in self._pool.starmap(
+            _worker_evaluate,
+            [(cpu_policy, n, task_seed) for n, task_seed in zip(splits, task_seeds)],
+        ):
+            for key, episode_rets in worker_res.items():
+                cumulative_rewards[key].extend(episode_rets)
+        return cumulative_rewards
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+        for env in self.envs + self.record_envs:
+            self.env_config.pool.release(env)
+        self.envs = []
+        self.record_envs = []
+
+
+# engine of each evaluation worker, built once by the pool initializer
+_worker_engine: EvalEngine | None = None
+
+
+def _init_worker(env_config: EnvConfig, max_cycles: int) -> None:
+    global _worker_engine
+    torch.set_num_threads(1)
+    _worker_engine = EvalEngine(env_config, max_cycles)
+
+
+def _worker_evaluate(
+    policy: EvalPolicy, n_episodes: int, seed: int
+) -> dict[str, list[float]]:
+    np.random.seed(seed)
+    return _worker_engine.evaluate(policy, n_episodes, seed=seed)
+
+
+# (env_config id, max_cycles) => (env_config, engine), the config is kept alive so
+# its id stays unique
+_engines: dict[tuple[int, int], tuple[EnvConfig, EvalEngine]] = {}
+
+
+def get_eval_engine(
+    env_config: EnvConfig, max_cycles: int = 50, n_workers: int | None = None
+) -> EvalEngine:
+    """
+    Shared engine of an env config for evaluations outside the trainers (which own
+    theirs), created on first use and kept until close_eval_engines.
+    Pass n_workers once to evaluate in a process pool.
+    """
+    key = (id(env_config), max_cycles)
+    if key not in _engines:
+        _engines[key] = (env_config, EvalEngine(env_config, max_cycles))
+    engine = _engines[key][1]
+    if n_workers is not None and n_workers != engine.n_workers:
+        if engine._pool is not None:
+            engine._pool.terminate()
+            engine._pool = None
+        engine.n_workers = n_workers
+    return engine
+
+
+@atexit.register
+def close_eval_engines(env_config: EnvConfig | None = None) -> None:
+    """Close and drop the shared engines of env_config (all by default)"""
+    for key, (config, engine) in list(_engines.items()):
+        if env_config is None or config is env_config:
+            engine.close()
+            del _engines[key]
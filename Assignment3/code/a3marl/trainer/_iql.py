@@ -1,15 +1,26 @@
+import time
 from itertools import count
 
 import torch
 from pettingzoo import ParallelEnv
 
-from a3marl.agents import IqlAgent, DQN
+from a3marl.agents import IqlAgent, DQN, ObsCollator
 from a3marl.envs.utils import EnvConfig
-from ._utils import get_agent_wise_cumulative_rewards
+from ._eval import EvalEngine, IqlEvalPolicy, get_eval_engine
+from ._target import TargetUpdate, EvalGatedTargetUpdate
+from ._utils import (
+    get_agent_wise_cumulative_rewards,
+    TrainerMetrics,
+    NULL_METRICS,
+    Checkpointer,
+    load_checkpoint,
+    UtdScheduler,
+)
 
 from a3marl.utils import (
     plot_episodes,
-    save_episode_ret_to_csv,
+    episode_log_path,
+    EpisodeLogWriter,
 )
 
 
@@ -17,7 +28,10 @@ def update_agent_dqns(
     env_config: EnvConfig,
     cur_agents: dict[str, IqlAgent],
     best_mean: float,
+    metrics: TrainerMetrics = NULL_METRICS,
+    engine: EvalEngine | None = None,
 ) -> float:
+    t0 = metrics.tic()
     with torch.no_grad():
         cur_eval_res = eval_agent(
             env_config=env_config,
@@ -26,15 +40,19 @@ def update_agent_dqns(
                 cur_agent.sid: cur_agent.policy_net for cur_agent in cur_agents.values()
             },
             n_episodes=10,
+            engine=engine,
         )
+    metrics.toc("eval", t0)
     avg_eval_res = get_agent_wise_cumulative_rewards(cur_eval_res)
     all_avg_eval_res = sum(avg_eval_res.values()) / len(avg_eval_res)
 
     if all_avg_eval_res > best_mean:
         print(f"{all_avg_eval_res:.4f} vs best: {best_mean:.4f}, update TarNet")
         best_mean = all_avg_eval_res
+        t0 = metrics.tic()
         for cur_agent in cur_agents.values():
             cur_agent.update_target_network()
+        metrics.toc("target_sync", t0)
     return best_mean
 
 
@@ -44,66 +62,13 @@ def eval_agent(
     dqns: dict[str, DQN],
     n_episodes: int = 10,
     max_cycles: int = 50,
+    engine: EvalEngine | None = None,
 ) -> dict[str, list[float]]:
-    cumulative_rewards = {dqn_agent.sid: [] for dqn_agent in dqn_agents.values()}
-    eval_device = list(dqn_agents.values())[0].device
-    for _ in range(n_episodes):
-        eval_env = env_config.get_env(
-            max_cycles=max_cycles,
-            render_mode=None,
-        )
-        states, info = eval_env.reset()
-        dones = {dqn_agent_key: False for dqn_agent_key in dqn_agents.keys()}
-        states = {
-            agent_key: torch.tensor(
-                state, dtype=torch.float32, device=eval_device
-            ).reshape(1, -1)
-            for agent_key, state in states.items()
-        }
-
-        cur_cumulative_rewards = {
-            dqn_agent.sid: 0.0 for dqn_agent in dqn_agents.values()
-        }
-        for t in count():
-            actions = {}
-            for cur_agent in dqn_agents.values():
-                if dones[cur_agent.sid]:
-                    continue
-                action = cur_agent.select_action_greedy(
-                    states[cur_agent.sid], dqns[cur_agent.sid]
-                )  # 1 x 1
-                actions[cur_agent.sid] = action.item()
-            observations, rewards, terminations, truncations, infos = eval_env.step(
-                actions
-            )
-            # update rewards
-            for cur_agent in dqn_agents.values():
-                if dones[cur_agent.sid]:
-                    continue
-                cur_cumulative_rewards[cur_agent.sid] += rewards[cur_agent.sid]
-            dones = {
-                agent_key: (terminated or truncations[agent_key])
-                for agent_key, terminated in terminations.items()
-            }
-            done = all(dones.values())
-            if done:
-                eval_env.close()
-                break
-            else:
-                next_states = {
-                    agent_key: torch.tensor(
-                        observation, dtype=torch.float32, device=eval_device
-                    ).reshape(1, -1)
-                    # 1 x 18
-                    for agent_key, observation in observations.items()
-                }
-            states = next_states
-        # append the cumulative rewards for this round
-        for cur_agent in dqn_agents.values():
-            cumulative_rewards[cur_agent.sid].append(
-                cur_cumulative_rewards[cur_agent.sid]
-            )
-    return cumulative_rewards
+    # episodes run in lockstep on the persistent envs of engine, by default the
+    # shared engine of the config
+    return (engine or get_eval_engine(env_config, max_cycles)).evaluate(
+        IqlEvalPolicy(dqn_agents, dqns), n_episodes
+    )
 
 
 def trainer(
@@ -114,37 +79,87 @@ def trainer(
     max_episode_lengths: int = 100,
     dqn_update_freq: int = 25,
     show_plot: bool = False,
+    metrics: TrainerMetrics | None = None,
+    checkpointer: Checkpointer | None = None,
+    resume_from: str | None = None,
+    utd: UtdScheduler | None = None,
+    target_update: TargetUpdate | None = None,
+    eval_engine: EvalEngine | None = None,
 ) -> None:
+    """
+    target_update: when the target networks follow the policy networks, by default
+        an evaluation-gated copy every dqn_update_freq steps and after each episode
+    eval_engine: runs the evaluations (e.g. with n_workers), by default an engine of
+        the trainer's own, closed at the end
+    """
+    metrics = metrics or NULL_METRICS
+    utd = utd or UtdScheduler()
+    engine = eval_engine or EvalEngine(env_config)
+    target_update = (target_update or EvalGatedTargetUpdate(dqn_update_freq)).bind(
+        cur_agents,
+        env_config,
+        lambda nets: IqlEvalPolicy(cur_agents, nets),
+        metrics,
+        engine,
+    )
     total_steps: int = 0
-    best_mean: float = float("-inf")
     device = list(cur_agents.values())[0].device
     episode_means: list[float] = []
     episode_avg_returns_per_agent: dict[str, list[float]] = {
         cur_agent.sid: [] for cur_agent in cur_agents.values()
     }
-    for episode in range(num_episodes):
+    start_episode: int = 0
+    if resume_from is not None:
+        resumed = load_checkpoint(resume_from, cur_agents, env=env)
+        start_episode = resumed["episode"] + 1
+        total_steps = resumed["total_steps"]
+        target_update.best_mean = resumed["best_mean"]
+        episode_means = resumed["episode_means"]
+        episode_avg_returns_per_agent = resumed["episode_avg_returns_per_agent"]
+        print(f"Resumed after episode {resumed['episode']} from {resume_from}")
+    episode_log = EpisodeLogWriter(
+        episode_log_path(f"{env_config.name_abbr}_iql"),
+        resume_after=start_episode - 1 if resume_from is not None else None,
+    )
+    # all agents' observations / rewards go to the device in one copy per step
+    obs_collator = ObsCollator(
+        {cur_agent.sid: cur_agent.config.obs_dim for cur_agent in cur_agents.values()},
+        device,
+    )
+    start_time = time.perf_counter()
+    for episode in range(start_episode, num_episodes):
         # re-initialize the environment
+        t0 = metrics.tic()
         states, infos = env.reset()
+        metrics.toc("env.reset", t0)
         dones: dict[str, bool] = {
             cur_agent_key: False for cur_agent_key in cur_agents.keys()
         }
-        states = {
-            agent_key: torch.tensor(state, dtype=torch.float32, device=device).reshape(
-                1, -1
-            )
-            for agent_key, state in states.items()
-        }
+        t0 = metrics.tic()
+        states = obs_collator.split(obs_collator.collate(states))
+        metrics.toc("obs_to_tensor", t0)
         if episode > 0:
             for t in count():
                 actions = {}
                 for cur_agent in cur_agents.values():
                     if dones[cur_agent.sid]:
                         continue
+                    t0 = metrics.tic()
                     action = cur_agent.select_action(states[cur_agent.sid])
+                    metrics.toc("act", t0, cur_agent.sid)
                     actions[cur_agent.sid] = action
+                t0 = metrics.tic()
+                # one device-to-host transfer for all actions
                 observations, rewards, terminations, truncations, infos = env.step(
-                    {agent_key: action.item() for agent_key, action in actions.items()}
+                    dict(
+                        zip(
+                            actions,
+                            torch.cat(list(actions.values())).reshape(-1).tolist(),
+                        )
+                    )
                 )
+                metrics.toc("env.step", t0)
+                metrics.count("env_steps")
                 dones = {
                     agent_key: (terminated or truncations[agent_key])
                     for agent_key, terminated in terminations.items()
@@ -152,37 +167,44 @@ def trainer(
                 done = all(dones.values()) or (t >= max_episode_lengths - 1)
                 if done:
                     break
-                rewards_t = {
-                    cur_agent.sid: torch.tensor(
-                        [[rewards[cur_agent.sid]]], device=device
+                rewards_t = dict(
+                    zip(
+                        obs_collator.agent_keys,
+                        obs_collator.collate_values(rewards).reshape(-1, 1, 1),
                     )
-                    for cur_agent in cur_agents.values()
-                }
+                )  # agent_key => 1 x 1
+                t0 = metrics.tic()
+                # terminated agents are zeroed, they get no next state below
+                next_states = obs_collator.split(
+                    obs_collator.collate(observations, terminations)
+                )
+                metrics.toc("obs_to_tensor", t0)
 
+                n_updates = utd.n_updates(total_steps)
                 # update memory per agent
                 for cur_agent in cur_agents.values():
-                    if terminations[cur_agent.sid]:
-                        next_state = None
-                    else:
-                        next_state = torch.tensor(
-                            observations[cur_agent.sid],
-                            dtype=torch.float32,
-                            device=device,
-                        ).reshape(1, -1)
+                    next_state = (
+                        None
+                        if terminations[cur_agent.sid]
+                        else next_states[cur_agent.sid]
+                    )
                     # memorize
+                    t0 = metrics.tic()
                     cur_agent.memorize(
                         states[cur_agent.sid],
                         actions[cur_agent.sid],
                         next_state,
                         rewards_t[cur_agent.sid],
                     )
+                    metrics.toc("memorize", t0, cur_agent.sid)
                     # enter next state
                     states[cur_agent.sid] = next_state
                     # optimize model
-                    cur_agent.train()
-                # update target dqn if better results
-                if total_steps % dqn_update_freq == 0:
-                    best_mean = update_agent_dqns(env_config, cur_agents, best_mean)
+                    t0 = metrics.tic()
+                    metrics.count("updates", cur_agent.train(n_updates))
+                    metrics.toc("train", t0, cur_agent.sid)
+                # update target dqn
+                target_update.on_step(total_steps)
                 # update eps
                 for cur_agent in cur_agents.values():
                     cur_agent.update_eps()
@@ -192,8 +214,9 @@ def trainer(
                 if done:
                     break
             # post update target network
-            best_mean = update_agent_dqns(env_config, cur_agents, best_mean)
+            target_update.on_episode_end()
         # evaluate how well the current policy_net is after this episode
+        t0 = metrics.tic()
         with torch.no_grad():
             cur_policy_eval_res = eval_agent(
                 dqn_agents=cur_agents,
@@ -203,7 +226,9 @@ def trainer(
                 },
                 n_episodes=10,
                 env_config=env_config,
+                engine=engine,
             )
+        metrics.toc("eval", t0)
         cur_policy_agent_wise_mean = get_agent_wise_cumulative_rewards(
             cur_policy_eval_res
         )
@@ -214,10 +239,60 @@ def trainer(
             episode_avg_returns_per_agent[cur_agent.sid].append(
                 cur_policy_agent_wise_mean[cur_agent.sid]
             )
+            metrics.gauge(
+                f"replay_fill/{cur_agent.sid}",
+                len(cur_agent.replay_memory) / cur_agent.replay_memory.capacity,
+            )
+            metrics.gauge(f"eps/{cur_agent.sid}", cur_agent.eps)
         episode_means.append(cur_policy_mean)
+        episode_log.write(
+            {
+                "Episode": episode,
+                "Mean Return": cur_policy_mean,
+                **{
+                    f"return/{cur_agent.sid}": cur_policy_agent_wise_mean[cur_agent.sid]
+                    for cur_agent in cur_agents.values()
+                },
+                **{
+                    f"eps/{cur_agent.sid}": cur_agent.eps
+                    for cur_agent in cur_agents.values()
+                },
+                **{
+                    f"loss/{cur_agent.sid}": cur_agent.pop_mean_loss()
+                    for cur_agent in cur_agents.values()
+                },
+                "total_steps": total_steps,
+                "wall_s": time.perf_counter() - start_time,
+            }
+        )
+        metrics.on_episode_end(episode, avg_return=cur_policy_mean)
+        if checkpointer is not None:
+            t0 = metrics.tic()
+            saved = checkpointer.maybe_save(
+                episode,
+                cur_agents,
+                dict(
+                    total_steps=total_steps,
+                    best_mean=target_update.best_mean,
+                    episode_means=episode_means,
+                    episode_avg_returns_per_agent=episode_avg_returns_per_agent,
+                ),
+                last=episode == num_episodes - 1,
+                env=env,
+            )
+            if saved:
+                # the log covers every episode of the checkpoint
+                episode_log.flush()
+            metrics.toc("checkpoint", t0)
         if episode % 10 == 0 or episode == num_episodes - 1:
             print(f"Episode {episode}: Avg return = {cur_policy_mean:.4f};")
-            save_episode_ret_to_csv(episode_means, f"{env_config.name_abbr}_iql")
 
         if show_plot:
             plot_episodes(episode_means)
+    target_update.close()
+    if eval_engine is None:
+        engine.close()
+    episode_log.close()
+    if checkpointer is not None:
+        checkpointer.close()
+    metrics.close()
@@ -0,0 +1,227 @@
+import time
+from itertools import count
+
+import torch
+from pettingzoo import ParallelEnv
+
+from a3marl.agents import IqlAgentGroup, GroupDQN, ObsCollator
+from a3marl.envs.utils import EnvConfig
+from ._eval import EvalEngine, GroupEvalPolicy, get_eval_engine
+from ._target import TargetUpdate, EvalGatedTargetUpdate
+from ._utils import (
+    get_agent_wise_cumulative_rewards,
+    TrainerMetrics,
+    NULL_METRICS,
+    Checkpointer,
+    load_checkpoint,
+    UtdScheduler,
+)
+
+from a3marl.utils import (
+    plot_episodes,
+    episode_log_path,
+    EpisodeLogWriter,
+)
+
+
+def eval_agent(
+    env_config: EnvConfig,
+    agent_group: IqlAgentGroup,
+    dqn: GroupDQN,
+    n_episodes: int = 10,
+    max_cycles: int = 50,
+    engine: EvalEngine | None = None,
+) -> dict[str, list[float]]:
+    # episodes run in lockstep on the persistent envs of engine, by default the
+    # shared engine of the config
+    return (engine or get_eval_engine(env_config, max_cycles)).evaluate(
+        GroupEvalPolicy(agent_group, dqn), n_episodes
+    )
+
+
+def trainer(
+    env: ParallelEnv,
+    env_config: EnvConfig,
+    agent_group: IqlAgentGroup,
+    num_episodes: int = 100,
+    max_episode_lengths: int = 100,
+    dqn_update_freq: int = 25,
+    show_plot: bool = False,
+    metrics: TrainerMetrics | None = None,
+    checkpointer: Checkpointer | None = None,
+    resume_from: str | None = None,
+    utd: UtdScheduler | None = None,
+    target_update: TargetUpdate | None = None,
+    eval_engine: EvalEngine | None = None,
+) -> None:
+    """Same loop as the IQL trainer, with all agents acting and learning in batch"""
+    metrics = metrics or NULL_METRICS
+    utd = utd or UtdScheduler()
+    engine = eval_engine or EvalEngine(env_config)
+    target_update = (target_update or EvalGatedTargetUpdate(dqn_update_freq)).bind(
+        {agent_group.sid: agent_group},
+        env_config,
+        lambda nets: GroupEvalPolicy(agent_group, nets[agent_group.sid]),
+        metrics,
+        engine,
+    )
+    total_steps: int = 0
+    device = agent_group.device
+    agent_keys = agent_group.agent_keys()
+    obs_dim = agent_group.config.obs_dim
+    episode_means: list[float] = []
+    episode_avg_returns_per_agent: dict[str, list[float]] = {
+        agent_key: [] for agent_key in agent_keys
+    }
+    start_episode: int = 0
+    if resume_from is not None:
+        resumed = load_checkpoint(resume_from, {agent_group.sid: agent_group}, env=env)
+        start_episode = resumed["episode"] + 1
+        total_steps = resumed["total_steps"]
+        target_update.best_mean = resumed["best_mean"]
+        episode_means = resumed["episode_means"]
+        episode_avg_returns_per_agent = resumed["episode_avg_returns_per_agent"]
+        print(f"Resumed after episode {resumed['episode']} from {resume_from}")
+    episode_log = EpisodeLogWriter(
+        episode_log_path(f"{env_config.name_abbr}_iql_group"),
+        resume_after=start_episode - 1 if resume_from is not None else None,
+    )
+    # all agents' observations / rewards go to the device in one copy per step
+    obs_collator = ObsCollator({agent_key: obs_dim for agent_key in agent_keys}, device)
+    start_time = time.perf_counter()
+    for episode in range(start_episode, num_episodes):
+        # re-initialize the environment
+        t0 = metrics.tic()
+        observations, infos = env.reset()
+        metrics.toc("env.reset", t0)
+        dones: dict[str, bool] = {agent_key: False for agent_key in agent_keys}
+        t0 = metrics.tic()
+        states = obs_collator.collate(observations).reshape(len(agent_keys), obs_dim)
+        metrics.toc("obs_to_tensor", t0)
+        if episode > 0:
+            for t in count():
+                t0 = metrics.tic()
+                actions = agent_group.select_action(states)  # n_agents x 1
+                metrics.toc("act", t0)
+                t0 = metrics.tic()
+                observations, rewards, terminations, truncations, infos = env.step(
+                    {
+                        agent_key: action
+                        for agent_key, action in zip(
+                            agent_keys, actions.reshape(-1).tolist()
+                        )
+                        if not dones[agent_key]
+                    }
+                )
+                metrics.toc("env.step", t0)
+                metrics.count("env_steps")
+                dones = {
+                    agent_key: (terminated or truncations[agent_key])
+                    for agent_key, terminated in terminations.items()
+                }
+                done = all(dones.values()) or (t >= max_episode_lengths - 1)
+                if done:
+                    break
+                rewards_t = obs_collator.collate_values(rewards).reshape(-1, 1)
+                t0 = metrics.tic()
+                # n_agents x obs_dim, missing agents are zeros
+                next_states = obs_collator.collate(observations).reshape(
+                    len(agent_keys), obs_dim
+                )
+                metrics.toc("obs_to_tensor", t0)
+                # memorize the joint step, terminated agents have no next state
+                t0 = metrics.tic()
+                agent_group.memorize(
+                    states,
+                    actions,
+                    next_states,
+                    rewards_t,
+                    [terminations[agent_key] for agent_key in agent_keys],
+                )
+                metrics.toc("memorize", t0)
+                # enter next state
+                states = next_states
+                # optimize all agents at once
+                t0 = metrics.tic()
+                metrics.count("updates", agent_group.train(utd.n_updates(total_steps)))
+                metrics.toc("train", t0)
+                # update target dqn
+                target_update.on_step(total_steps)
+                # update eps
+                agent_group.update_eps()
+                # increase total number of experienced steps
+                total_steps += 1
+            # post update target network
+            target_update.on_episode_end()
+        # evaluate how well the current policy_net is after this episode
+        t0 = metrics.tic()
+        with torch.no_grad():
+            cur_policy_eval_res = eval_agent(
+                env_config=env_config,
+                agent_group=agent_group,
+                dqn=agent_group.policy_net,
+                n_episodes=10,
+                engine=engine,
+            )
+        metrics.toc("eval", t0)
+        cur_policy_agent_wise_mean = get_agent_wise_cumulative_rewards(
+            cur_policy_eval_res
+        )
+        cur_policy_mean = sum(cur_policy_agent_wise_mean.values()) / len(
+            cur_policy_agent_wise_mean
+        )
+        for agent_key in agent_keys:
+            episode_avg_returns_per_agent[agent_key].append(
+                cur_policy_agent_wise_mean[agent_key]
+            )
+        metrics.gauge(
+            "replay_fill",
+            len(agent_group.replay_memory) / agent_group.replay_memory.capacity,
+        )
+        metrics.gauge("eps", agent_group.eps)
+        episode_means.append(cur_policy_mean)
+        episode_log.write(
+            {
+                "Episode": episode,
+                "Mean Return": cur_policy_mean,
+                **{
+                    f"return/{agent_key}": cur_policy_agent_wise_mean[agent_key]
+                    for agent_key in agent_keys
+                },
+                "eps": agent_group.eps,
+                "loss": agent_group.pop_mean_loss(),
+                "total_steps": total_steps,
+                "wall_s": time.perf_counter() - start_time,
+            }
+        )
+        metrics.on_episode_end(episode, avg_return=cur_policy_mean)
+        if checkpointer is not None:
+            t0 = metrics.tic()
+            saved = checkpointer.maybe_save(
+                episode,
+                {agent_group.sid: agent_group},
+                dict(
+                    total_steps=total_steps,
+                    best_mean=target_update.best_mean,
+                    episode_means=episode_means,
+                    episode_avg_returns_per_agent=episode_avg_returns_per_agent,
+                ),
+                last=episode == num_episodes - 1,
+                env=env,
+            )
+            if saved:
+                # the log covers every episode of the checkpoint
+                episode_log.flush()
+            metrics.toc("checkpoint", t0)
+        if episode % 10 == 0 or episode == num_episodes - 1:
+            print(f"Episode {episode}: Avg return = {cur_policy_mean:.4f};")
+
+        if show_plot:
+            plot_episodes(episode_means)
+    target_update.close()
+    if eval_engine is None:
+        engine.close()
+    episode_log.close()
+    if checkpointer is not None:
+        checkpointer.close()
+    metrics.close()
@@ -0,0 +1,221 @@
+import copy
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+from torch import nn
+
+from a3marl.agents import BaseAgent
+from a3marl.envs.utils import EnvConfig
+from ._eval import EvalEngine, EvalPolicy
+from ._utils import get_agent_wise_cumulative_rewards, TrainerMetrics, NULL_METRICS
+
+
+def _copy_net(dst: nn.Module, src: nn.Module) -> None:
+    """In-place copy of all weights and buffers, one multi-tensor kernel"""
+    torch._foreach_copy_(
+        list(dst.state_dict().values()), list(src.state_dict().values())
+    )
+
+
+class TargetUpdate:
+    """
+    When and how the target networks of a trainer's agents follow their policy
+    networks. Trainers `bind` it once, call `on_step(total_steps)` after every env
+    step, `on_episode_end()` after every training episode and `close()` at the end.
+    """
+
+    def __init__(self) -> None:
+        # best gating evaluation so far, saved with checkpoints
+        self.best_mean: float = float("-inf")
+        self.agents: dict[str, BaseAgent] = {}
+        self.metrics: TrainerMetrics = NULL_METRICS
+
+    def bind(
+        self,
+        agents: dict[str, BaseAgent],
+        env_config: EnvConfig,
+        make_policy: callable,
+        metrics: TrainerMetrics = NULL_METRICS,
+        eval_engine: EvalEngine | None = None,
+    ) -> "TargetUpdate":
+        """
+        make_policy: agent sid => policy net, to the EvalPolicy of those nets
+        eval_engine: the trainer's engine, evaluations may run on it
+        """
+        self.agents = agents
+        self.metrics = metrics
+        return self
+
+    def on_step(self, step: int) -> None:
+        pass
+
+    def on_episode_end(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class HardTargetUpdate(TargetUpdate):
+    """Copy the policy networks into the targets every `every` env steps"""
+
+    def __init__(self, every: int = 100) -> None:
+        super().__init__()
+        self.every: int = every
+
+    def on_step(self, step: int) -> None:
+        if step % self.every == 0:
+            t0 = self.metrics.tic()
+            for agent in self.agents.values():
+                agent.update_target_network()
+            self.metrics.toc("target_sync", t0)
+
+
+class SoftTargetUpdate(TargetUpdate):
+    """Polyak averaging target <- (1 - tau) * target + tau * policy every `every` steps"""
+
+    def __init__(self, tau: float = 0.005, every: int = 1) -> None:
+        super().__init__()
+        assert 0 < tau <= 1, "tau must be in (0, 1]"
+        self.tau: float = tau
+        self.every: int = every
+
+    def on_step(self, step: int) -> None:
+        if step % self.every == 0:
+            t0 = self.metrics.tic()
+            for agent in self.agents.values():
+                agent.soft_update_target_network(self.tau)
+            self.metrics.toc("target_sync", t0)
+
+
+class EvalGatedTargetUpdate(TargetUpdate):
+    """
+    The targets take the policy weights only when a greedy evaluation of
+    n_episodes beats the best one so far; evaluated every `every` env steps and
+    after every training episode.
+
+    Evaluations run on the trainer's EvalEngine (if its max_cycles match), else on
+    an own one closed by `close`.
+    With async_eval, the evaluation runs on a background thread against a snapshot
+    of the policy weights (an in-place copy into persistent networks) and on its own
+    EvalEngine; training goes on and the snapshot is copied into the targets once
+    its evaluation wins. A new evaluation starts only when the previous one is done.
+    Async results depend on thread timing, so runs are not bitwise reproducible.
+    """
+
+    def __init__(
+        self,
+        every: int = 25,
+        n_episodes: int = 10,
+        max_cycles: int = 50,
+        async_eval: bool = False,
+    ) -> None:
+        super().__init__()
+        self.every: int = every
+        self.n_episodes: int = n_episodes
+        self.max_cycles: int = max_cycles
+        self.async_eval: bool = async_eval
+        self.env_config: EnvConfig | None = None
+        self.make_policy: callable = None
+
+        self._snapshots: dict[str, nn.Module] = {}
+        self._trainer_engine: EvalEngine | None = None
+        self._engine: EvalEngine | None = None  # own engine
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: Future | None = None
+
+    def bind(
+        self,
+        agents: dict[str, BaseAgent],
+        env_config: EnvConfig,
+        make_policy: callable,
+        metrics: TrainerMetrics = NULL_METRICS,
+        eval_engine: EvalEngine | None = None,
+    ) -> "EvalGatedTargetUpdate":
+        super().bind(agents, env_config, make_policy, metrics, eval_engine)
+        self.env_config = env_config
+        self.make_policy = make_policy
+        if eval_engine is not None and eval_engine.max_cycles == self.max_cycles:
+            self._trainer_engine = eval_engine
+        return self
+
+    def _own_engine(self) -> EvalEngine:
+        if self._engine is None:
+            self._engine = EvalEngine(self.env_config, self.max_cycles)
+        return self._engine
+
+    def _evaluate(self, policy: EvalPolicy, engine: EvalEngine) -> float:
+        with torch.no_grad():
+            agent_wise_means = get_agent_wise_cumulative_rewards(
+                engine.evaluate(policy, self.n_episodes)
+            )
+        return sum(agent_wise_means.values()) / len(agent_wise_means)
+
+    def _gate(self, mean: float, sources: dict[str, nn.Module]) -> None:
+        # not "<=": a NaN evaluation never wins (nor disables the gate)
+        if not mean > self.best_mean:
+            return
+        print(f"{mean:.4f} vs best: {self.best_mean:.4f}, update TarNet")
+        self.best_mean = mean
+        t0 = self.metrics.tic()
+        with torch.no_grad():
+            for sid, agent in self.agents.items():
+                if sources[sid] is agent.policy_net:
+                    agent.update_target_network()
+                else:
+                    _copy_net(agent.target_net, sources[sid])
+        self.metrics.toc("target_sync", t0)
+
+    def _run(self) -> None:
+        if not self.async_eval:
+            t0 = self.metrics.tic()
+            nets = {sid: agent.policy_net for sid, agent in self.agents.items()}
+            mean = self._evaluate(
+                self.make_policy(nets), self._trainer_engine or self._own_engine()
+            )
+            self.metrics.toc("eval", t0)
+            self._gate(mean, nets)
+            return
+
+        self._poll()
+        if self._pending is not None:
+            return
+        t0 = self.metrics.tic()
+        with torch.no_grad():
+            for sid, agent in self.agents.items():
+                if sid not in self._snapshots:
+                    self._snapshots[sid] = copy.deepcopy(agent.policy_net).eval()
+                else:
+                    _copy_net(self._snapshots[sid], agent.policy_net)
+        self.metrics.toc("snapshot", t0)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        # own envs, the trainer's engine keeps running episode evaluations
+        self._pending = self._executor.submit(
+            self._evaluate, self.make_policy(self._snapshots), self._own_engine()
+        )
+
+    def _poll(self, wait: bool = False) -> None:
+        """Apply a finished background evaluation"""
+        if self._pending is None or not (wait or self._pending.done()):
+            return
+        pending, self._pending = self._pending, None
+        self._gate(pending.result(), self._snapshots)
+
+    def on_step(self, step: int) -> None:
+        if step % self.every == 0:
+            self._run()
+        elif self.async_eval:
+            self._poll()
+
+    def on_episode_end(self) -> None:
+        self._run()
+
+    def close(self) -> None:
+        self._poll(wait=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._engine is not None:
+            self._engine.close()
+            self._engine = None
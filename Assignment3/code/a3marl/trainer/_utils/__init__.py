@@ -1,5 +1,18 @@
 from ._train import get_agent_wise_cumulative_rewards
+from ._shared import SharedTransitionRing, RingFields
+from ._metrics import TrainerMetrics, NullMetrics, NULL_METRICS
+from ._checkpoint import Checkpointer, find_checkpoint, load_checkpoint
+from ._utd import UtdScheduler
 
 __all__ = [
     "get_agent_wise_cumulative_rewards",
+    "SharedTransitionRing",
+    "RingFields",
+    "TrainerMetrics",
+    "NullMetrics",
+    "NULL_METRICS",
+    "Checkpointer",
+    "find_checkpoint",
+    "load_checkpoint",
+    "UtdScheduler",
 ]
@@ -0,0 +1,333 @@
+import os
+import random
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import torch
+from pettingzoo import ParallelEnv
+
+from a3marl.agents import BaseAgent
+
+STATE_FILE = "state.pt"
+REPLAY_DIR = "replay"
+LATEST_FILE = "LATEST"
+# ring slots per replay chunk file, unchanged chunks are shared between checkpoints
+_REPLAY_CHUNK_ROWS: int = 4_096
+
+
+def _snapshot(obj):
+    """Copy of nested state with every tensor detached and cloned to the cpu"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: _snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(value) for value in obj)
+    return obj
+
+
+def get_rng_state(env: ParallelEnv | None = None) -> dict[str, object]:
+    """Global RNGs, and the action spaces of env (exploration samplers)"""
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "python": random.getstate(),
+        # tensors / plain values only, loadable with weights_only
+        "numpy": (name, torch.from_numpy(keys.copy()), pos, has_gauss, cached_gaussian),
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else [],
+        "action_spaces": (
+            {
+                agent_key: env.action_space(agent_key).np_random.bit_generator.state
+                for agent_key in env.possible_agents
+            }
+            if env is not None
+            else {}
+        ),
+    }
+
+
+def set_rng_state(state: dict[str, object], env: ParallelEnv | None = None) -> None:
+    random.setstate(state["python"])
+    name, keys, pos, has_gauss, cached_gaussian = state["numpy"]
+    np.random.set_state((name, keys.numpy(), pos, has_gauss, cached_gaussian))
+    torch.set_rng_state(state["torch"])
+    if state["cuda"] and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+    if env is not None:
+        for agent_key, space_state in state.get("action_spaces", {}).items():
+            env.action_space(agent_key).np_random.bit_generator.state = space_state
+
+
+class Checkpointer:
+    """
+    Periodic training checkpoints, one directory per saved episode:
+        ckpt_dir/ep_000009/state.pt      networks, optimizers, eps, RNG, trainer state
+        ckpt_dir/ep_000009/replay/<sid>/  replay rows and ring position, with save_replay
+        ckpt_dir/LATEST                  name of the newest complete checkpoint
+
+    State is copied on the training thread and written by a background thread
+    (async_write), the next save waits for the previous write. Replay buffers are
+    saved as .npy chunks of _REPLAY_CHUNK_ROWS slots: a save copies only the rows
+    written since the previous save, rewrites the chunks they fall in and hard-links
+    the others from the previous checkpoint, so every checkpoint keeps its own rows;
+    memory-mapped on load.
+    Directories are renamed into place once complete, so a crash mid-write keeps
+    the previous checkpoint.
+    """
+
+    def __init__(
+        self,
+        ckpt_dir: str,
+        every: int = 10,
+        keep_last: int = 2,
+        save_replay: bool = False,
+        async_write: bool = True,
+    ) -> None:
+        self.ckpt_dir: str = ckpt_dir
+        self.every: int = every
+        self.keep_last: int = keep_last
+        self.save_replay: bool = save_replay
+        self.async_write: bool = async_write
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: Future | None = None
+        # sid => replay writes of the memory at its last written snapshot, and the
+        # replay directory of that checkpoint
+        self._replay_writes: dict[str, int] = {}
+        self._replay_paths: dict[str, str] = {}
+
+    def maybe_save(
+        self,
+        episode: int,
+        agents: dict[str, BaseAgent],
+        trainer_state: dict[str, object],
+        last: bool = False,
+        env: ParallelEnv | None = None,
+    ) -> bool:
+        """Save after every `every`-th episode and after the last one"""
+        if (episode + 1) % self.every != 0 and not last:
+            return False
+        self.save(episode, agents, trainer_state, env)
+        return True
+
+    def save(
+        self,
+        episode: int,
+        agents: dict[str, BaseAgent],
+        trainer_state: dict[str, object],
+        env: ParallelEnv | None = None,
+    ) -> str:
+        """
+        env: the training env, the RNGs of its action spaces (exploration) are saved
+        output: directory of the checkpoint, complete once `wait` returns
+        """
+        self.wait()
+        for sid, replay_path in list(self._replay_paths.items()):
+            if not os.path.isdir(replay_path):
+                # the previous checkpoint was pruned: snapshot all rows again
+                del self._replay_writes[sid], self._replay_paths[sid]
+        state = {
+            "episode": episode,
+            "agents": {
+                agent.sid: _snapshot(agent.state_dict()) for agent in agents.values()
+            },
+            "trainer": _snapshot(trainer_state),
+            "rng": get_rng_state(env),
+        }
+        replay = (
+            {
+                agent.sid: agent.replay_memory.state_dict_since(
+                    self._replay_writes.get(agent.sid)
+                )
+                for agent in agents.values()
+            }
+            if self.save_replay
+            else {}
+        )
+        path = os.path.join(self.ckpt_dir, f"ep_{episode:06d}")
+        if not self.async_write:
+            self._write(path, state, replay)
+            return path
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = self._executor.submit(self._write, path, state, replay)
+        return path
+
+    def _write(
+        self,
+        path: str,
+        state: dict[str, object],
+        replay: dict[str, dict[str, object]],
+    ) -> None:
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        torch.save(state, os.path.join(tmp_path, STATE_FILE))
+        for sid, memory_state in replay.items():
+            replay_path = os.path.join(tmp_path, REPLAY_DIR, sid)
+            os.makedirs(replay_path)
+            self._write_replay(replay_path, self._replay_paths.get(sid), memory_state)
+            torch.save(memory_state["meta"], os.path.join(replay_path, "meta.pt"))
+            torch.save(
+                {"n_rows": memory_state["n_rows"], "chunk_rows": _REPLAY_CHUNK_ROWS},
+                os.path.join(replay_path, "rows.pt"),
+            )
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        for sid, memory_state in replay.items():
+            self._replay_writes[sid] = memory_state["n_writes"]
+            self._replay_paths[sid] = os.path.join(path, REPLAY_DIR, sid)
+        latest_tmp = os.path.join(self.ckpt_dir, f"{LATEST_FILE}.tmp")
+        with open(latest_tmp, "w") as f:
+            f.write(os.path.basename(path))
+        os.replace(latest_tmp, os.path.join(self.ckpt_dir, LATEST_FILE))
+        self._prune()
+
+    @staticmethod
+    def _write_replay(
+        replay_path: str, prev_path: str | None, memory_state: dict[str, object]
+    ) -> None:
+        """
+        Rows 0..n_rows of every buffer as chunk files <buffer>.<k>.npy. Without
+        slots all chunks are written; else chunks without written slots are linked
+        from prev_path and the others are its chunks with the written rows applied.
+        """
+        n_rows = memory_state["n_rows"]
+        slots = memory_state["slots"]
+        chunk_ids = None if slots is None else slots.numpy() // _REPLAY_CHUNK_ROWS
+        for name, rows in memory_state["buffers"].items():
+            rows = rows.numpy()
+            full = slots is None or name in memory_state["dense"]
+            for k, start in enumerate(range(0, n_rows, _REPLAY_CHUNK_ROWS)):
+                file = f"{name}.{k:04d}.npy"
+                end = min(start + _REPLAY_CHUNK_ROWS, n_rows)
+                if full:
+                    np.save(os.path.join(replay_path, file), rows[start:end])
+                    continue
+                prev_file = os.path.join(prev_path, file)
+                in_chunk = chunk_ids == k
+                if not in_chunk.any():
+                    _link_or_copy(prev_file, os.path.join(replay_path, file))
+                    continue
+                chunk = np.zeros((end - start, *rows.shape[1:]), dtype=rows.dtype)
+                if os.path.exists(prev_file):
+                    prev_rows = np.load(prev_file, mmap_mode="r")
+                    chunk[: len(prev_rows)] = prev_rows
+                    del prev_rows
+                chunk[slots.numpy()[in_chunk] - start] = rows[in_chunk]
+                np.save(os.path.join(replay_path, file), chunk)
+
+    def _prune(self) -> None:
+        ckpts = sorted(
+            name
+            for name in os.listdir(self.ckpt_dir)
+            if name.startswith("ep_") and not name.endswith(".tmp")
+        )
+        for name in ckpts[: max(len(ckpts) - self.keep_last, 0)]:
+            shutil.rmtree(os.path.join(self.ckpt_dir, name), ignore_errors=True)
+
+    def wait(self) -> None:
+        """Block until the pending write is done, re-raising its error"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self) -> None:
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:  # no hard links on this file system
+        shutil.copyfile(src, dst)
+
+
+class _ChunkedRows:
+    """Rows 0..n_rows of a buffer saved in chunk files, memory-mapped on access"""
+
+    def __init__(self, files: list[str], n_rows: int, chunk_rows: int) -> None:
+        self.chunks: list[np.ndarray] = [np.load(f, mmap_mode="r") for f in files]
+        self.n_rows: int = n_rows
+        self.chunk_rows: int = chunk_rows
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        start, stop, step = index.indices(self.n_rows)
+        assert step == 1, "contiguous row ranges only"
+        first, last = start // self.chunk_rows, max(stop - 1, start) // self.chunk_rows
+        rows = np.concatenate(self.chunks[first : last + 1])
+        offset = first * self.chunk_rows
+        return rows[start - offset : stop - offset]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        rows = self[:]
+        return rows if dtype is None else rows.astype(dtype)
+
+
+def find_checkpoint(path: str) -> str:
+    """A checkpoint directory, or the latest one of a Checkpointer's ckpt_dir"""
+    latest = os.path.join(path, LATEST_FILE)
+    if os.path.exists(latest):
+        with open(latest) as f:
+            return os.path.join(path, f.read().strip())
+    return path
+
+
+def _load_replay_buffers(path: str, sid: str) -> dict[str, object]:
+    replay_path = os.path.join(path, REPLAY_DIR, sid)
+    rows_file = os.path.join(replay_path, "rows.pt")
+    if not os.path.exists(rows_file):
+        # one .npy per buffer
+        return {
+            name[: -len(".npy")]: np.load(
+                os.path.join(replay_path, name), mmap_mode="r"
+            )
+            for name in os.listdir(replay_path)
+            if name.endswith(".npy")
+        }
+    counts = torch.load(rows_file, weights_only=True)
+    files: dict[str, list[str]] = {}
+    for name in sorted(os.listdir(replay_path)):
+        if name.endswith(".npy"):
+            buffer_name = name[: -len(".npy")].rsplit(".", 1)[0]
+            files.setdefault(buffer_name, []).append(os.path.join(replay_path, name))
+    return {
+        name: _ChunkedRows(chunk_files, counts["n_rows"], counts["chunk_rows"])
+        for name, chunk_files in files.items()
+    }
+
+
+def load_checkpoint(
+    path: str,
+    agents: dict[str, BaseAgent],
+    load_replay: bool = True,
+    env: ParallelEnv | None = None,
+) -> dict[str, object]:
+    """
+    Restore agents (and their replay memories if saved) and the RNG state, with
+    the action space RNGs of env if it was saved with one.
+    output: {"episode": last saved episode, **trainer state}
+    """
+    path = os.path.normpath(find_checkpoint(path))
+    state = torch.load(os.path.join(path, STATE_FILE), weights_only=True)
+    for agent in agents.values():
+        agent.load_state_dict(state["agents"][agent.sid])
+        replay_path = os.path.join(path, REPLAY_DIR, agent.sid)
+        if load_replay and os.path.isdir(replay_path):
+            agent.replay_memory.load_state_dict(
+                {
+                    "buffers": _load_replay_buffers(path, agent.sid),
+                    "meta": torch.load(
+                        os.path.join(replay_path, "meta.pt"), weights_only=True
+                    ),
+                }
+            )
+    set_rng_state(state["rng"], env)
+    return {"episode": state["episode"], **state["trainer"]}
@@ -0,0 +1,166 @@
+import json
+import time
+from collections import defaultdict
+
+
+class TrainerMetrics:
+    """
+    Per-phase timers and counters of a trainer run.
+
+    Time a phase with `t0 = metrics.tic()` ... `metrics.toc("train", t0, agent)`.
+    Every `on_episode_end` builds a summary (phase totals, env steps/s, gradient
+    updates/s, replay fill, eval overhead) and passes it to the callbacks.
+    With trace_path, all timed phases are also written as a Chrome trace
+    (chrome://tracing, Perfetto) on `close`.
+    """
+
+    def __init__(
+        self,
+        callbacks: list[callable] | None = None,
+        trace_path: str | None = None,
+        max_trace_events: int = 1_000_000,
+    ) -> None:
+        self.callbacks: list[callable] = list(callbacks or [])
+        self.trace_path: str | None = trace_path
+        self.max_trace_events: int = max_trace_events
+
+        # (phase, agent) => [total ns, calls], agent is None for global phases
+        self.phases: dict[tuple[str, str | None], list[int]] = defaultdict(
+            lambda: [0, 0]
+        )
+        self.counters: dict[str, int] = defaultdict(int)
+        self.gauges: dict[str, float] = {}
+        # (phase, agent, start ns, duration ns)
+        self.trace_events: list[tuple[str, str | None, int, int]] = []
+        self.dropped_trace_events: int = 0
+        self.summaries: list[dict[str, object]] = []
+        self._start_ns: int = time.perf_counter_ns()
+
+    def tic(self) -> int:
+        return time.perf_counter_ns()
+
+    def toc(self, phase: str, t0: int, agent: str | None = None) -> None:
+        now = time.perf_counter_ns()
+        record = self.phases[(phase, agent)]
+        record[0] += now - t0
+        record[1] += 1
+        if self.trace_path is not None:
+            if len(self.trace_events) < self.max_trace_events:
+                self.trace_events.append((phase, agent, t0, now - t0))
+            else:
+                self.dropped_trace_events += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def summary(self) -> dict[str, object]:
+        wall_s = (time.perf_counter_ns() - self._start_ns) / 1e9
+        phases: dict[str, dict[str, float]] = {}
+        agents: dict[str, dict[str, dict[str, float]]] = defaultdict(dict)
+        for (phase, agent), (total_ns, calls) in self.phases.items():
+            stats = {
+                "total_s": total_ns / 1e9,
+                "calls": calls,
+                "mean_us": total_ns / calls / 1e3,
+                "share": total_ns / 1e9 / wall_s,
+            }
+            if agent is None:
+                phases[phase] = stats
+            else:
+                agents[agent][phase] = stats
+                # per-agent phases are also summed up over agents
+                total = phases.setdefault(
+                    phase, {"total_s": 0.0, "calls": 0, "mean_us": 0.0, "share": 0.0}
+                )
+                total["total_s"] += stats["total_s"]
+                total["calls"] += calls
+                total["share"] += stats["share"]
+                total["mean_us"] = total["total_s"] / total["calls"] * 1e6
+        eval_s = phases.get("eval", {}).get("total_s", 0.0)
+        return {
+            "wall_s": wall_s,
+            "env_steps_per_s": self.counters["env_steps"] / wall_s,
+            "updates_per_s": self.counters["updates"] / wall_s,
+            "eval_overhead": eval_s / wall_s,
+            "phases": phases,
+            "agents": dict(agents),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def on_episode_end(self, episode: int, **values) -> None:
+        """Record end-of-episode values (e.g. avg_return) and notify callbacks"""
+        summary = {"episode": episode, **values, **self.summary()}
+        self.summaries.append(summary)
+        for callback in self.callbacks:
+            callback(summary)
+
+    def dump_trace(self, path: str) -> None:
+        """Chrome trace format: one complete event per timed phase, a row per agent"""
+        tids: dict[str | None, int] = {None: 0}
+        events = []
+        for phase, agent, t0, duration in self.trace_events:
+            tid = tids.setdefault(agent, len(tids))
+            events.append(
+                {
+                    "name": phase,
+                    "ph": "X",
+                    "ts": (t0 - self._start_ns) / 1e3,
+                    "dur": duration / 1e3,
+                    "pid": 0,
+                    "tid": tid,
+                }
+            )
+        for agent, tid in tids.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 0,
+                    "tid": tid,
+                    "args": {"name": "trainer" if agent is None else agent},
+                }
+            )
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "otherData": {"dropped_events": self.dropped_trace_events},
+                },
+                f,
+            )
+
+    def close(self) -> None:
+        if self.trace_path is not None:
+            self.dump_trace(self.trace_path)
+
+
+class NullMetrics(TrainerMetrics):
+    """Disabled metrics, every hook is a no-op"""
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    def tic(self) -> int:
+        return 0
+
+    def toc(self, phase: str, t0: int, agent: str | None = None) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def gauge(self, name: str, value: float) -> None:
+        pass
+
+    def on_episode_end(self, episode: int, **values) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_METRICS: NullMetrics = NullMetrics()
@@ -0,0 +1,52 @@
+import time
+
+import torch
+
+# field name => (row shape, dtype) of one transition
+RingFields = dict[str, tuple[tuple[int, ...], torch.dtype]]
+
+
+class SharedTransitionRing:
+    """
+    Single-producer / single-consumer ring of transitions in shared memory.
+    Create it before forking; the actor puts rows, the learner drains them.
+    """
+
+    def __init__(self, capacity: int, fields: RingFields, mp_context) -> None:
+        self.capacity: int = capacity
+        self.buffers: dict[str, torch.Tensor] = {
+            name: torch.zeros((capacity, *shape), dtype=dtype).share_memory_()
+            for name, (shape, dtype) in fields.items()
+        }
+        # monotonic counters, the locks act as memory barriers between processes
+        self._written = mp_context.Value("q", 0)
+        self._read = mp_context.Value("q", 0)
+
+    def put(self, row: dict[str, object], stop_event=None) -> bool:
+        """Write one row, waits while the ring is full. False if stopped meanwhile"""
+        written = self._written.value
+        while written - self._read.value >= self.capacity:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            time.sleep(1e-3)
+        idx = written % self.capacity
+        for name, value in row.items():
+            self.buffers[name][idx] = torch.as_tensor(value).reshape(
+                self.buffers[name].shape[1:]
+            )
+        with self._written.get_lock():
+            self._written.value = written + 1
+        return True
+
+    def drain(self) -> dict[str, torch.Tensor] | None:
+        """Copy out all rows written since the last drain"""
+        with self._written.get_lock():
+            written = self._written.value
+        read = self._read.value
+        if written == read:
+            return None
+        indices = torch.arange(read, written) % self.capacity
+        rows = {name: buffer[indices] for name, buffer in self.buffers.items()}
+        with self._read.get_lock():
+            self._read.value = written
+        return rows
@@ -0,0 +1,39 @@
+class UtdScheduler:
+    """
+    Update-to-data schedule of the serial trainers: `updates` gradient updates
+    every `every` env steps, none during the first `warmup` steps.
+    The updates of a step run back to back on minibatches sampled with one replay
+    gather (BaseAgent.train(n_updates)). The default is one update per env step.
+    """
+
+    def __init__(self, updates: int = 1, every: int = 1, warmup: int = 0) -> None:
+        assert updates >= 1, "updates must be positive"
+        assert every >= 1, "every must be positive"
+        assert warmup >= 0, "warmup must be non-negative"
+        self.updates: int = updates
+        self.every: int = every
+        self.warmup: int = warmup
+
+    @classmethod
+    def from_ratio(cls, ratio: float, warmup: int = 0) -> "UtdScheduler":
+        """ratio >= 1: round(ratio) updates per step, else 1 every round(1 / ratio)"""
+        assert ratio > 0, "ratio must be positive"
+        if ratio >= 1:
+            return cls(updates=round(ratio), warmup=warmup)
+        return cls(every=round(1 / ratio), warmup=warmup)
+
+    @property
+    def ratio(self) -> float:
+        return self.updates / self.every
+
+    def n_updates(self, step: int) -> int:
+        """Updates to run at env step `step` (total steps of the run, from 0)"""
+        if step < self.warmup or (step - self.warmup) % self.every != 0:
+            return 0
+        return self.updates
+
+    def __repr__(self) -> str:
+        return (
+            f"UtdScheduler(updates={self.updates}, every={self.every}, "
+            f"warmup={self.warmup})"
+        )
@@ -1,7 +1,10 @@
 from ._plot import plot_episodes
+from ._record import EpisodeRecorder
+from ._log import EpisodeLogWriter, iter_episode_log
 from ._save import (
     save_episode_ret_to_csv,
     load_episode_ret_from_csv,
+    episode_log_path,
     _save_init,
 )
 
@@ -9,6 +12,10 @@ _save_init()
 
 __all__ = [
     "plot_episodes",
+    "EpisodeRecorder",
     "save_episode_ret_to_csv",
     "load_episode_ret_from_csv",
+    "episode_log_path",
+    "EpisodeLogWriter",
+    "iter_episode_log",
 ]
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+from collections.abc import Iterator
+
+LOG_FORMATS: tuple[str, ...] = (".csv", ".jsonl")
+
+
+def _log_format(path: str) -> str:
+    fmt = os.path.splitext(path)[1]
+    assert fmt in LOG_FORMATS, f"unknown episode log format {fmt}"
+    return fmt
+
+
+def _parse_value(value: str) -> int | float | str:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def iter_episode_log(
+    path: str, columns: list[str] | None = None
+) -> Iterator[dict[str, object]]:
+    """Rows of an episode log (.csv or .jsonl) one at a time, optionally only columns"""
+    fmt = _log_format(path)
+    with open(path, newline="") as f:
+        if fmt == ".csv":
+            for row in csv.DictReader(f):
+                yield {
+                    key: _parse_value(value)
+                    for key, value in row.items()
+                    if columns is None or key in columns
+                }
+        else:
+            for line in f:
+                row = json.loads(line)
+                yield row if columns is None else {key: row[key] for key in columns}
+
+
+class EpisodeLogWriter:
+    """
+    Append-only log with one row per episode, .csv or .jsonl by the path extension.
+    Rows are buffered and appended every flush_every rows (and on close), so the
+    cost per episode does not grow with the length of the run.
+
+    CSV columns are fixed by the first row. A new log truncates the file; with
+    resume_after, rows up to that episode are kept and the rest (logged after the
+    checkpoint being resumed) are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_every: int = 10,
+        resume_after: int | None = None,
+        episode_key: str = "Episode",
+    ) -> None:
+        self.path: str = path
+        self.fmt: str = _log_format(path)
+        self.flush_every: int = flush_every
+        self.episode_key: str = episode_key
+        self._rows: list[dict[str, object]] = []
+        self._columns: list[str] | None = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume_after is not None and os.path.exists(path):
+            self._keep_until(resume_after)
+        else:
+            open(path, "w").close()
+
+    def _keep_until(self, episode: int) -> None:
+        kept = [
+            row
+            for row in iter_episode_log(self.path)
+            if row[self.episode_key] <= episode
+        ]
+        open(self.path, "w").close()
+        self._rows = kept
+        self.flush()
+
+    def write(self, row: dict[str, object]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        with open(self.path, "a", newline="") as f:
+            if self.fmt == ".csv":
+                if self._columns is None:
+                    self._columns = list(self._rows[0])
+                    if f.tell() == 0:
+                        csv.writer(f).writerow(self._columns)
+                csv.DictWriter(f, self._columns).writerows(self._rows)
+            else:
+                f.writelines(json.dumps(row) + "\n" for row in self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
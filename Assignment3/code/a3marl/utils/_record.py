@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # optional, only needed for gif output
+    Image = None
+
+try:
+    import imageio.v2 as imageio
+except ImportError:  # optional, only needed for video output
+    imageio = None
+
+RECORD_FORMATS: tuple[str, ...] = ("npz", "gif", "mp4")
+
+
+class EpisodeRecorder:
+    """
+    Buffers rgb frames of several episodes in memory and writes them in bulk on
+    `save`, so rendering is the only per-step cost of recording.
+
+    fmt "npz" writes all saved episodes into one compressed archive (a T x H x W x 3
+    array per episode); "gif" (Pillow) and "mp4" (imageio + ffmpeg) write a file
+    per episode. Every `stride`-th frame is kept, downsampled by `scale`.
+    """
+
+    def __init__(
+        self,
+        out_dir: str = "./data/videos",
+        fmt: str = "gif",
+        fps: int = 10,
+        stride: int = 1,
+        scale: int = 1,
+    ) -> None:
+        assert fmt in RECORD_FORMATS, f"unknown record format {fmt}"
+        if fmt == "gif" and Image is None:
+            raise ImportError("gif recording requires Pillow")
+        if fmt == "mp4" and imageio is None:
+            raise ImportError("mp4 recording requires imageio[ffmpeg]")
+        self.out_dir: str = out_dir
+        self.fmt: str = fmt
+        self.fps: int = fps
+        self.stride: int = stride
+        self.scale: int = scale
+
+        # episode id => frames of the running episode, and the number seen so far
+        self._frames: dict[int, list[np.ndarray]] = {}
+        self._n_seen: dict[int, int] = {}
+        self.episodes: list[np.ndarray] = []  # T x H x W x 3, not yet saved
+        self.n_saved: int = 0
+
+    def add_frame(self, frame: np.ndarray, episode: int = 0) -> None:
+        n_seen = self._n_seen.get(episode, 0)
+        self._n_seen[episode] = n_seen + 1
+        if n_seen % self.stride == 0:
+            self._frames.setdefault(episode, []).append(
+                frame[:: self.scale, :: self.scale]
+            )
+
+    def end_episode(self, episode: int = 0) -> None:
+        frames = self._frames.pop(episode, [])
+        self._n_seen.pop(episode, None)
+        if frames:
+            self.episodes.append(np.stack(frames))
+
+    def save(self, prefix: str = "episode") -> list[str]:
+        """Write all finished episodes, output: written paths"""
+        if not self.episodes:
+            return []
+        os.makedirs(self.out_dir, exist_ok=True)
+        first = self.n_saved
+        paths = []
+        if self.fmt == "npz":
+            path = os.path.join(
+                self.out_dir,
+                f"{prefix}_{first}-{first + len(self.episodes) - 1}.npz",
+            )
+            np.savez_compressed(
+                path,
+                **{
+                    f"episode_{first + i}": frames
+                    for i, frames in enumerate(self.episodes)
+                },
+            )
+            paths.append(path)
+        else:
+            for i, frames in enumerate(self.episodes):
+                path = os.path.join(self.out_dir, f"{prefix}_{first + i}.{self.fmt}")
+                if self.fmt == "gif":
+                    images = [Image.fromarray(frame) for frame in frames]
+                    images[0].save(
+                        path,
+                        save_all=True,
+                        append_images=images[1:],
+                        duration=1000 // self.fps,
+                        loop=0,
+                    )
+                else:
+                    imageio.mimwrite(path, list(frames), fps=self.fps)
+                paths.append(path)
+        self.n_saved += len(self.episodes)
+        self.episodes = []
+        return paths
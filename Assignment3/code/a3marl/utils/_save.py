@@ -1,5 +1,7 @@
 import pandas as pd
 
+from ._log import iter_episode_log
+
 _FOLDER = "./data/temp"
 
 
@@ -27,9 +29,24 @@ def save_episode_ret_to_csv(
     df.to_csv(path, index=False)
 
 
+def episode_log_path(
+    file_name: str = "episode_means",
+    file_folder: str = _FOLDER,
+    fmt: str = "csv",
+) -> str:
+    """Path of a trainer's EpisodeLogWriter, same as the save_episode_ret_to_csv one"""
+    return f"{file_folder}/{file_name}_latest.{fmt}"
+
+
 def load_episode_ret_from_csv(
     file_path: str = "./data/temp/latest.csv",
+    column: str = "Mean Return",
 ) -> list[float]:
-    df = pd.read_csv(file_path)
-    episode_mean_list: list[float] = df["Mean Return"].astype(float).tolist()
+    """One column of an episode log, .csv (only that column is parsed) or .jsonl"""
+    if file_path.endswith(".jsonl"):
+        return [
+            float(row[column]) for row in iter_episode_log(file_path, columns=[column])
+        ]
+    df = pd.read_csv(file_path, usecols=[column])
+    episode_mean_list: list[float] = df[column].astype(float).tolist()
     return episode_mean_list
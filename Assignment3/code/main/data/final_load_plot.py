@@ -10,6 +10,9 @@ def load_data_and_plot(
     plot_title: str = "Episode Means",
 ) -> None:
     file_path = os.path.join(_CSV_FOLDER, f"{file_name}.csv")
+    if not os.path.exists(file_path):
+        # episode logs may also be written as jsonl
+        file_path = os.path.join(_CSV_FOLDER, f"{file_name}.jsonl")
     episode_mean_list = load_episode_ret_from_csv(file_path=file_path)
     plot_episodes(
         episode_mean_list,